@@ -0,0 +1,107 @@
+"""Compare the old list-of-dicts file store with FileIndex on a synthetic file list.
+
+Usage: python benchmarks/bench_file_index.py [--files 1000000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt6.QtCore import QDateTime
+from sortlify_core.common import DAY, MB
+from sortlify_core.filters import DATE_FILTERS, SIZE_FILTERS
+from sortlify_core.index import FileIndex, FilterCache
+
+EXTENSIONS = {
+    ".jpg": "Images", ".png": "Images", ".pdf": "Documents", ".docx": "Documents",
+    ".mp4": "Videos", ".mp3": "Audio", ".zip": "Archives", ".py": "Code", ".bin": "Other",
+}
+
+def synthetic_rows(count, seed=0):
+    rng = random.Random(seed)
+    now = int(time.time())
+    exts = list(EXTENSIONS)
+    rows = []
+    for i in range(count):
+        ext = rng.choice(exts)
+        name = f"file_{i:07d}{ext}"
+        folder = os.path.join("/data", f"dir{i % 500}")
+        size = int(rng.lognormvariate(12, 2.5))
+        mtime = now - rng.randint(0, 400 * DAY)
+        rows.append((folder, name, size, mtime, ext, EXTENSIONS[ext]))
+    return rows
+
+def build_dicts(rows):
+    return [{
+        "name": name,
+        "size": size / MB,
+        "type": category,
+        "ext": ext,
+        "mtime": QDateTime.fromSecsSinceEpoch(mtime),
+        "path": os.path.join(folder, name),
+    } for folder, name, size, mtime, ext, category in rows]
+
+def build_index(rows):
+    index = FileIndex()
+    for start in range(0, len(rows), 1000):
+        index.append_batch(rows[start:start + 1000])
+    return index
+
+def filter_dicts(files):
+    # The loop apply_filters used to run for Type=Images, Size=<10, Modified=Last Month
+    now = QDateTime.currentDateTime()
+    out = []
+    for f in files:
+        if f["type"] != "Images":
+            continue
+        if f["size"] >= 10:
+            continue
+        if f["mtime"].daysTo(now) > 31:
+            continue
+        out.append(f)
+    return out
+
+def filter_index(index):
+    return index.select(category="Images", max_size=10 * MB - 1, min_mtime=int(time.time()) - 31 * DAY)
+
+def filter_changes(index):
+    """Walk the sidebar through every single-combo change; return the slowest in seconds."""
+    cache = FilterCache(index)
+    choice = ["All", "All", "All"]
+    cache.select(*choice)
+    worst = 0.0
+    for position, values in enumerate((["All"] + sorted(set(EXTENSIONS.values())), SIZE_FILTERS, DATE_FILTERS)):
+        for value in values + ["All"]:
+            choice[position] = value
+            t0 = time.perf_counter()
+            cache.select(*choice)
+            worst = max(worst, time.perf_counter() - t0)
+    return worst
+
+def measure(label, build, query, rows):
+    tracemalloc.start()
+    store = build(rows)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    t0 = time.perf_counter()
+    hits = len(query(store))
+    elapsed = time.perf_counter() - t0
+    print(f"{label:<12} {memory / len(rows):8.1f} B/file   filter {elapsed * 1000:9.1f} ms   ({hits} hits)")
+    return memory, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=1_000_000)
+    args = parser.parse_args()
+    rows = synthetic_rows(args.files)
+    dict_mem, dict_time = measure("dicts", build_dicts, filter_dicts, rows)
+    index_mem, index_time = measure("FileIndex", build_index, filter_index, rows)
+    print(f"memory {dict_mem / index_mem:.1f}x smaller, filtering {dict_time / index_time:.1f}x faster")
+    print(f"FilterCache  slowest single filter change {filter_changes(build_index(rows)) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Time startup, scanning, classification, filtering, sorting and table population on synthetic trees.
+
+Each tree (see make_tree.py) is benchmarked in a fresh process so its peak RSS is its
+own. Stages are timed best-of --repeat; the GUI stages drive a real SortlifyMainWindow
+on the offscreen Qt platform. Results are written as JSON; with --baseline, the run
+exits with status 1 if any stage's throughput fell by more than --max-regression, so
+it can gate a CI job.
+
+Usage: python benchmarks/bench_suite.py [--files 10000 100000] [--shape mixed deep wide]
+       [--output results.json] [--baseline previous.json] [--no-gui]
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from make_tree import SHAPES, generate_tree
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+VERSION = 1
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+class Stages:
+    """Collects {stage: {seconds, items, per_sec, unit, peak_rss_mb}} for one tree."""
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.results = {}
+
+    def time(self, name, run, items, unit="files", setup=None):
+        """Best of repeat timings of run(state), where state = setup() is built untimed each time."""
+        best, value = None, None
+        for _ in range(self.repeat):
+            state = setup() if setup is not None else None
+            t0 = time.perf_counter()
+            value = run(state)
+            elapsed = time.perf_counter() - t0
+            best = elapsed if best is None else min(best, elapsed)
+        self.record(name, best, items(value) if callable(items) else items, unit)
+        return value
+
+    def record(self, name, seconds, items, unit="files"):
+        self.results[name] = {"seconds": round(seconds, 6), "items": items, "unit": unit,
+                              "per_sec": round(items / seconds, 1) if seconds > 0 else None, "peak_rss_mb": peak_rss_mb()}
+        print(f"  {name:<18} {seconds * 1000:10.1f} ms  {items / max(seconds, 1e-9):14,.0f} {unit}/s", file=sys.stderr)
+
+def startup_stage(stages):
+    """Time from launching sortlify.py to its first paint, as the app measures it; best of repeat launches."""
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "sortlify.py")
+    best = None
+    for _ in range(stages.repeat):
+        out = subprocess.run([sys.executable, script, "--startup-time"], check=True, stdout=subprocess.PIPE, text=True).stdout
+        seconds = float(out.split()[-1]) / 1000
+        best = seconds if best is None else min(best, seconds)
+    stages.record("gui_startup", best, 1, unit="launches")
+
+def core_stages(tree, stages):
+    from sortlify_core.classify import DEFAULT_CATEGORY_MAP, Classifier, classify_entries
+    from sortlify_core.filters import DATE_FILTERS, SIZE_FILTERS
+    from sortlify_core.index import FileIndex, FilterCache, SortCache
+    from sortlify_core.scan import ScanCache, scan_tree
+
+    batches = stages.time("scan", lambda _: list(scan_tree(tree)), lambda b: sum(map(len, b)))
+    total = sum(map(len, batches))
+    classifier = Classifier(DEFAULT_CATEGORY_MAP)
+    rows = stages.time("classify", lambda _: [classify_entries(classifier, b) for b in batches], total)
+
+    def build(_=None):
+        index = FileIndex()
+        for batch in rows:
+            index.append_batch(batch)
+        return index
+    stages.time("index", build, total)
+
+    cache_dir = tempfile.mkdtemp(prefix="sortlify-bench-")
+    cache_path = os.path.join(cache_dir, "scan_cache.sqlite3")
+
+    def cold_cache():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(cache_path + suffix):
+                os.remove(cache_path + suffix)
+        return ScanCache(cache_path)
+
+    def cached_scan(cache):
+        try:
+            return sum(len(batch) for batch in cache.scan(tree, classifier))
+        finally:
+            cache.close()
+    stages.time("scan_cache_cold", cached_scan, total, setup=cold_cache)
+    stages.time("scan_cache_warm", cached_scan, total, setup=lambda: ScanCache(cache_path))
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    categories = ["All"] + sorted(set(DEFAULT_CATEGORY_MAP) | {"Other"})
+
+    def walk_filters(cache):
+        # Every single-combo change a user can make in the sidebar, starting from All/All/All
+        choice = ["All", "All", "All"]
+        cache.select(*choice)
+        changes = 0
+        for position, values in enumerate((categories, SIZE_FILTERS, DATE_FILTERS)):
+            for value in values + ["All"]:
+                choice[position] = value
+                cache.select(*choice)
+                changes += 1
+        return changes
+    index = build()
+    stages.time("filter", walk_filters, lambda changes: changes * total, setup=lambda: FilterCache(index))
+
+    def sort_all(index):
+        # First sorts build the per-column permutations; the repeats and reversals reuse them
+        cache = SortCache(index)
+        rows = index.select()
+        for spec in ([("name", False)], [("size", False)], [("type", False), ("name", False)], [("mtime", False)],
+                     [("name", True)], [("mtime", True)]):
+            cache.sort(rows, spec)
+    stages.time("sort", sort_all, 6 * total, setup=build)
+    return index
+
+def gui_stages(tree, stages, total):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    import sortlify
+
+    app = QApplication.instance() or QApplication([])
+    window = sortlify.SortlifyMainWindow()
+    # The previous tree's window saved its folder; don't let this one start scanning it
+    window.settings.reopen_last_folder = False
+    window.resize(1280, 800)
+    window.show()
+    app.processEvents()
+
+    def idle():
+        # A finished scan starts document indexing and metadata reading; keep them out of the timings
+        window.cancel_indexing()
+        window.cancel_metadata()
+
+    def load(_):
+        # Scan, classify and stream batches into the table through the event loop. After the
+        # first repeat the scan cache is warm, so the best time is that of reopening a folder.
+        window.load_files(tree)
+        while window.scan_worker is not None:
+            app.processEvents()
+            time.sleep(0.001)
+        return len(window.file_index)
+    stages.time("gui_load", load, total, setup=idle)
+    idle()
+
+    types = [window.type_filter.itemText(i) for i in range(window.type_filter.count())]
+
+    def filter_types(_):
+        for value in types[1:] + types[:1]:
+            window.type_filter.setCurrentText(value)
+            app.processEvents()
+    stages.time("gui_filter", filter_types, len(types) * total)
+
+    def sort_columns(_):
+        for col in (0, 1, 2, 3, 0):
+            window.sort_by_column(col)
+            app.processEvents()
+    stages.time("gui_sort", sort_columns, 5 * total)
+
+    frames = 20
+    table = window.file_table
+    scrollbar = table.verticalScrollBar()
+
+    def render(_):
+        # Paint a screenful at evenly spaced scroll positions, as dragging the scrollbar would
+        for k in range(frames):
+            scrollbar.setValue(scrollbar.maximum() * k // (frames - 1))
+            table.viewport().grab()
+    stages.time("gui_render", render, frames, unit="frames")
+    window.close()
+    app.processEvents()
+
+def run_tree(tree, repeat, gui):
+    """Benchmark one tree in this process and return its stage results."""
+    stages = Stages(repeat)
+    index = core_stages(tree, stages)
+    if gui:
+        startup_stage(stages)
+        gui_stages(tree, stages, len(index))
+    return stages.results
+
+def benchmark(args, files, shape):
+    """Generate the tree if needed and benchmark it in a child process."""
+    dest = os.path.join(args.tree_dir, f"{shape}-{files}")
+    t0 = time.perf_counter()
+    tree = generate_tree(dest, files, shape, args.seed)
+    print(f"{shape} tree, {files} files (ready in {time.perf_counter() - t0:.1f} s)", file=sys.stderr)
+    env = dict(os.environ)
+    # Keep the GUI's caches and settings out of the user's own
+    cache_home = os.path.join(args.tree_dir, "cache")
+    env.update(XDG_CACHE_HOME=cache_home, LOCALAPPDATA=cache_home, XDG_CONFIG_HOME=cache_home, APPDATA=cache_home)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    command = [sys.executable, os.path.abspath(__file__), "--run-tree", tree, "--repeat", str(args.repeat)]
+    if args.no_gui:
+        command.append("--no-gui")
+    out = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE, text=True).stdout
+    return {"files": files, "shape": shape, "stages": json.loads(out)}
+
+def regressions(results, baseline, max_regression):
+    """(files, shape, stage, baseline per_sec, per_sec) for every stage slower than allowed."""
+    before = {(r["files"], r["shape"], name): stage["per_sec"]
+              for r in baseline.get("results", []) for name, stage in r["stages"].items()}
+    slower = []
+    for r in results:
+        for name, stage in r["stages"].items():
+            old = before.get((r["files"], r["shape"], name))
+            if old and stage["per_sec"] is not None and stage["per_sec"] < old * (1 - max_regression):
+                slower.append((r["files"], r["shape"], name, old, stage["per_sec"]))
+    return slower
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, nargs="+", default=[10_000, 100_000], help="tree sizes to run")
+    parser.add_argument("--shape", nargs="+", default=["mixed"], choices=sorted(SHAPES), help="tree shapes to run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="timings per stage; the best is reported")
+    parser.add_argument("--tree-dir", default=os.path.join(tempfile.gettempdir(), "sortlify-bench"),
+                        help="where generated trees are kept between runs")
+    parser.add_argument("--no-gui", action="store_true", help="skip the Qt stages")
+    parser.add_argument("--output", help="write JSON results here instead of stdout")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed throughput drop per stage before failing (default 0.25 = 25%%)")
+    parser.add_argument("--run-tree", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_tree:
+        json.dump(run_tree(args.run_tree, args.repeat, not args.no_gui), sys.stdout)
+        return 0
+
+    results = [benchmark(args, files, shape) for shape in args.shape for files in args.files]
+    report = {"version": VERSION, "created": int(time.time()), "python": platform.python_version(),
+              "platform": platform.platform(), "machine": platform.machine(), "cpus": os.cpu_count(),
+              "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            slower = regressions(results, json.load(f), args.max_regression)
+        for files, shape, name, old, new in slower:
+            print(f"REGRESSION {shape}-{files} {name}: {old:,.0f} -> {new:,.0f} per second", file=sys.stderr)
+        if slower:
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
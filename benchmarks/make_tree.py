@@ -0,0 +1,152 @@
+"""Generate a synthetic folder tree for benchmarking scans.
+
+Trees mix file types in proportions typical of a personal drive, with camera, scanner,
+download and project style names, log-normal sizes and modification times skewed
+towards the recent past. Files are created sparse (truncated to their size), so even a
+million-file tree takes little disk space on filesystems that support sparse files.
+A manifest next to the tree records how it was made, so an identical request reuses it.
+
+Usage: python benchmarks/make_tree.py DEST [--files 100000] [--shape wide|deep|mixed] [--seed 0]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+
+DAY = 86400
+VERSION = 1
+# (files per directory, subdirectories per directory, maximum depth, expand deepest first)
+SHAPES = {
+    "wide": (2000, 40, 2, False),
+    "deep": (10, 3, 24, True),
+    "mixed": (60, 6, 8, False),
+}
+FOLDER_WORDS = ["Documents", "Photos", "Music", "Videos", "Downloads", "Projects", "Archive", "Scans",
+                "Invoices", "Backup", "Camera Uploads", "src", "assets", "Holiday", "Work", "Old Stuff"]
+WORDS = ["acme", "globex", "initech", "summer", "budget", "draft", "final", "notes", "family", "trip",
+         "meeting", "contract", "design", "report", "data", "export", "client", "q3", "review", "misc"]
+
+def _date(rng):
+    return f"{rng.randint(2012, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+
+# (weight, extensions, name patterns, log-normal size mu, sigma)
+KINDS = [
+    (30, [".jpg", ".jpeg", ".png", ".heic"], [
+        lambda r: f"IMG_{r.randint(0, 9999):04d}",
+        lambda r: f"DSC{r.randint(0, 99999):05d}",
+        lambda r: f"Screenshot {_date(r)} at {r.randint(0, 23)}.{r.randint(0, 59):02d}.{r.randint(0, 59):02d}",
+        lambda r: f"photo ({r.randint(1, 300)})",
+    ], 14.0, 1.0),
+    (25, [".pdf", ".docx", ".txt", ".xlsx", ".pptx"], [
+        lambda r: f"Invoice_{_date(r)[:7]}_{r.choice(WORDS)}",
+        lambda r: f"{r.choice(WORDS)} {r.choice(WORDS)} v{r.randint(1, 9)}",
+        lambda r: f"scan{r.randint(0, 9999):04d}",
+        lambda r: f"{r.choice(WORDS).title()} Meeting Minutes {_date(r)}",
+    ], 11.5, 1.8),
+    (10, [".mp3", ".flac", ".m4a", ".wav"], [
+        lambda r: f"{r.randint(1, 20):02d} - {r.choice(WORDS).title()} {r.choice(WORDS).title()}",
+        lambda r: f"track{r.randint(1, 30)}",
+    ], 15.0, 0.7),
+    (5, [".mp4", ".mov", ".mkv", ".avi"], [
+        lambda r: f"VID_{_date(r).replace('-', '')}_{r.randint(0, 235959):06d}",
+        lambda r: f"{r.choice(WORDS)}.{r.randint(1990, 2025)}.1080p",
+    ], 18.5, 1.2),
+    (5, [".zip", ".rar", ".7z", ".gz"], [
+        lambda r: f"backup-{_date(r)}",
+        lambda r: f"{r.choice(WORDS)}_export_{r.randint(1, 99)}",
+    ], 16.0, 2.0),
+    (15, [".py", ".js", ".html", ".css", ".java", ".cpp"], [
+        lambda r: f"{r.choice(WORDS)}_{r.choice(WORDS)}",
+        lambda r: r.choice(["index", "main", "utils", "config", "test_api", "__init__"]),
+    ], 8.5, 1.5),
+    (10, [".bin", ".dat", ".log", ".tmp", ""], [
+        lambda r: f"data_{r.randint(0, 99999)}",
+        lambda r: r.choice(["Thumbs", "desktop", "cache", "README", "LICENSE"]),
+    ], 10.0, 2.5),
+]
+
+def _directories(count, shape, rng):
+    """Relative paths of count directories laid out according to shape."""
+    _, fanout, max_depth, deepest_first = SHAPES[shape]
+    dirs = [""]
+    frontier = [("", 0)]
+    while len(dirs) < count and frontier:
+        parent, depth = frontier.pop() if deepest_first else frontier.pop(0)
+        if depth >= max_depth:
+            continue
+        children = fanout if shape != "mixed" else rng.randint(0, 2 * fanout)
+        for k in range(children):
+            if len(dirs) >= count:
+                break
+            word = rng.choice(FOLDER_WORDS)
+            path = os.path.join(parent, f"{word} {k}" if k else word)
+            dirs.append(path)
+            frontier.append((path, depth + 1))
+        if not frontier and len(dirs) < count:
+            # A mixed tree can run out of branches; keep growing from the root
+            frontier.append(("", 0))
+    return dirs
+
+def generate_tree(dest, files=100_000, shape="mixed", seed=0):
+    """Create (or reuse) a synthetic tree under dest/tree; returns the tree's path."""
+    if shape not in SHAPES:
+        raise ValueError(f"unknown shape {shape!r}; expected one of {', '.join(SHAPES)}")
+    manifest_path = os.path.join(dest, "manifest.json")
+    wanted = {"version": VERSION, "files": files, "shape": shape, "seed": seed}
+    tree = os.path.join(dest, "tree")
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f) == wanted and os.path.isdir(tree):
+                return tree
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(tree, ignore_errors=True)
+    rng = random.Random(seed)
+    per_dir = SHAPES[shape][0]
+    dirs = _directories(max(1, -(-files // per_dir)), shape, rng)
+    weights = [kind[0] for kind in KINDS]
+    now = int(time.time())
+    made = 0
+    for i, rel in enumerate(dirs):
+        folder = os.path.join(tree, rel)
+        os.makedirs(folder, exist_ok=True)
+        # Spread the remainder evenly so every directory gets its share
+        quota = files * (i + 1) // len(dirs) - made
+        used = set()
+        for _ in range(quota):
+            _, exts, patterns, mu, sigma = rng.choices(KINDS, weights)[0]
+            ext = rng.choice(exts)
+            if rng.random() < 0.05:
+                ext = ext.upper()
+            name = rng.choice(patterns)(rng) + ext
+            stem = name[:len(name) - len(ext)]
+            copy = 1
+            while name.lower() in used:
+                copy += 1
+                name = f"{stem} ({copy}){ext}"
+            used.add(name.lower())
+            path = os.path.join(folder, name)
+            with open(path, "wb") as f:
+                f.truncate(min(int(rng.lognormvariate(mu, sigma)), 8 << 30))
+            mtime = now - min(int(rng.expovariate(1 / (200 * DAY))), 10 * 365 * DAY)
+            os.utime(path, (mtime, mtime))
+        made += quota
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(wanted, f)
+    return tree
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dest")
+    parser.add_argument("--files", type=int, default=100_000)
+    parser.add_argument("--shape", default="mixed", choices=sorted(SHAPES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    t0 = time.perf_counter()
+    tree = generate_tree(args.dest, args.files, args.shape, args.seed)
+    print(f"{tree}: {args.files} files ({args.shape}) in {time.perf_counter() - t0:.1f} s")
+
+if __name__ == "__main__":
+    main()
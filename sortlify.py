@@ -1,565 +1,2288 @@
-import sys
-import os
-import shutil
-from PyQt6.QtWidgets import (
-    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
-    QCheckBox, QFrame, QSizePolicy, QSpacerItem, QFileDialog, QDialog, QTabWidget, QComboBox, QLineEdit, QListWidget, QListWidgetItem, QMessageBox,
-    QTableWidget, QTableWidgetItem, QAbstractItemView, QHeaderView, QSlider, QGridLayout, QListView, QStyle, QStyledItemDelegate, QStyleOptionViewItem, QStyleOptionButton
-)
-from PyQt6.QtGui import QFont, QPixmap, QIcon, QBrush, QColor
-from PyQt6.QtCore import Qt, pyqtSignal, QSize, QDateTime
-
-class ClickableLabel(QLabel):
-    clicked = pyqtSignal()
-    def mousePressEvent(self, ev):
-        self.clicked.emit()
-        super().mousePressEvent(ev)
-
-class SortlifyMainWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setObjectName("MainWindow")
-        self.theme_mode = "dark"
-        self.accent_color = "blue"
-        self.custom_rules = []  # Each rule: (contains_text, target_category)
-        # User-editable category-extension mapping
-        self.builtin_categories = [
-            "Documents", "Images", "Videos", "Audio", "Archives", "Code", "Other"
-        ]
-        self.category_map = {
-            "Documents": [".pdf", ".doc", ".docx", ".txt", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".rtf"],
-            "Images": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".svg", ".webp", ".heic"],
-            "Videos": [".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv", ".webm", ".mpeg"],
-            "Audio": [".mp3", ".wav", ".aac", ".flac", ".ogg", ".m4a", ".wma"],
-            "Archives": [".zip", ".rar", ".7z", ".tar", ".gz", ".bz2", ".xz"],
-            "Code": [".py", ".js", ".ts", ".java", ".cpp", ".c", ".cs", ".html", ".css", ".json", ".xml", ".sh", ".bat", ".php", ".rb", ".go", ".rs", ".swift", ".kt", ".m", ".pl", ".lua", ".sql"],
-            "Other": []
-        }
-        self.setWindowTitle("Sortlify")
-        self.setMinimumSize(900, 700)
-        self.setStyleSheet(self.get_stylesheet())
-        self.init_ui()
-
-    def init_ui(self):
-        # Central widget and main layout
-        central = QWidget()
-        central.setObjectName("CentralWidget")
-        main_layout = QHBoxLayout(central)
-        main_layout.setContentsMargins(0, 0, 0, 0)
-        main_layout.setSpacing(0)
-
-        # Sidebar with filters
-        sidebar = QWidget()
-        sidebar.setObjectName("Sidebar")
-        sidebar_layout = QVBoxLayout(sidebar)
-        sidebar_layout.setContentsMargins(24, 24, 24, 24)
-        sidebar_layout.setSpacing(16)
-        logo = QLabel("\u25A0  Sortlify")
-        logo.setObjectName("Logo")
-        sidebar_layout.addWidget(logo)
-        sidebar_layout.addSpacing(16)
-        sidebar_layout.addWidget(QLabel("<b>Filters</b>"))
-        # File type filter
-        sidebar_layout.addWidget(QLabel("Type:"))
-        self.type_filter = QComboBox()
-        self.type_filter.addItem("All")
-        for cat in self.category_map:
-            self.type_filter.addItem(cat)
-        self.type_filter.currentTextChanged.connect(self.apply_filters)
-        sidebar_layout.addWidget(self.type_filter)
-        # Size filter
-        sidebar_layout.addWidget(QLabel("Size (MB):"))
-        self.size_filter = QComboBox()
-        self.size_filter.addItems(["All", "<10", "10-100", ">100"])
-        self.size_filter.currentTextChanged.connect(self.apply_filters)
-        sidebar_layout.addWidget(self.size_filter)
-        # Date modified filter
-        sidebar_layout.addWidget(QLabel("Modified:"))
-        self.date_filter = QComboBox()
-        self.date_filter.addItems(["All", "Today", "Last 7 Days", "Last Month", "Older"])
-        self.date_filter.currentTextChanged.connect(self.apply_filters)
-        sidebar_layout.addWidget(self.date_filter)
-        sidebar_layout.addStretch()
-        sidebar.setFixedWidth(180)
-
-        # Main content area
-        content = QWidget()
-        content_layout = QVBoxLayout(content)
-        content_layout.setContentsMargins(0, 0, 0, 0)
-        content_layout.setSpacing(0)
-
-        # Top bar
-        topbar = QWidget()
-        topbar.setObjectName("TopBar")
-        topbar_layout = QHBoxLayout(topbar)
-        topbar_layout.setContentsMargins(32, 16, 32, 16)
-        topbar_layout.setSpacing(16)
-        title = QLabel("Dashboard")
-        title.setObjectName("TopBarTitle")
-        topbar_layout.addWidget(title)
-        topbar_layout.addStretch()
-        settings_btn = QPushButton("⚙️")
-        settings_btn.setObjectName("SettingsButton")
-        settings_btn.setFixedSize(32, 32)
-        settings_btn.clicked.connect(self.open_settings_dialog)
-        topbar_layout.addWidget(settings_btn)
-
-        # View toggle
-        self.view_toggle = QPushButton()
-        self.view_toggle.setObjectName("ViewToggleButton")
-        self.view_toggle.setCheckable(True)
-        self.view_toggle.setChecked(False)
-        self.view_toggle.setFixedSize(32, 32)
-        style = self.style()
-        if style:
-            self.list_icon = style.standardIcon(QStyle.StandardPixmap.SP_FileDialogListView)
-            self.grid_icon = style.standardIcon(QStyle.StandardPixmap.SP_FileDialogContentsView)
-            self.view_toggle.setIcon(self.grid_icon)
-        self.view_toggle.setIconSize(QSize(20, 20))
-        self.view_toggle.setToolTip("Switch to Grid View")
-        self.view_toggle.clicked.connect(self.toggle_view)
-        topbar_layout.addWidget(self.view_toggle)
-
-        # Main dashboard area
-        dashboard = QWidget()
-        dashboard_layout = QVBoxLayout(dashboard)
-        dashboard_layout.setContentsMargins(24, 16, 24, 16)
-        dashboard_layout.setSpacing(12)
-        # Browse button
-        browse_btn = QPushButton("Browse")
-        browse_btn.setObjectName("StartButton")
-        browse_btn.clicked.connect(self.browse_folder)
-        dashboard_layout.addWidget(browse_btn)
-        # File explorer view
-        self.file_table = QTableWidget()
-        self.file_table.setColumnCount(4)
-        self.file_table.setHorizontalHeaderLabels(["Name", "Size", "Type", "Modified Date"])
-        self.file_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
-        self.file_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
-        self.file_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
-        header = self.file_table.horizontalHeader()
-        if header is not None:
-            header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-            header.sectionClicked.connect(self.sort_by_column)
-        dashboard_layout.addWidget(self.file_table)
-        # Placeholder for grid view
-        self.grid_view = QListWidget()
-        self.grid_view.setViewMode(QListView.ViewMode.IconMode)
-        self.grid_view.setIconSize(QSize(96, 96))
-        self.grid_view.setResizeMode(QListView.ResizeMode.Adjust)
-        self.grid_view.setSpacing(16)
-        self.grid_view.setVisible(False)
-        dashboard_layout.addWidget(self.grid_view)
-        # Results Summary
-        summary_heading = QLabel("Results Summary")
-        summary_heading.setObjectName("Subheading")
-        dashboard_layout.addWidget(summary_heading)
-        summary_desc = QLabel("After organizing, Sortlify will display the number of files moved and any errors encountered.")
-        summary_desc.setWordWrap(True)
-        dashboard_layout.addWidget(summary_desc)
-        summary_box = QFrame()
-        summary_box.setObjectName("SummaryBox")
-        summary_box.setMinimumHeight(120)
-        summary_box_layout = QVBoxLayout(summary_box)
-        summary_box_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.summary_label = QLabel("<b>No files organized yet</b>\nStart organizing your files to see the results summary here.")
-        self.summary_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        summary_box_layout.addWidget(self.summary_label)
-        dashboard_layout.addWidget(summary_box)
-        note = QLabel("<span style='color:#888'>Note: Sortlify moves files to their respective categories, ensuring a safe and organized file system.</span>")
-        note.setWordWrap(True)
-        dashboard_layout.addWidget(note)
-        dashboard_layout.addStretch()
-        # Assemble layouts
-        content_layout.addWidget(topbar)
-        content_layout.addWidget(dashboard)
-        main_layout.addWidget(sidebar)
-        main_layout.addWidget(content)
-        self.setCentralWidget(central)
-        # Load files for explorer
-        self.current_folder = None
-        self.file_data = []
-
-    def get_stylesheet(self):
-        accent = {
-            "blue": "#2563eb",
-            "green": "#22c55e",
-            "orange": "#f59e42",
-            "purple": "#a259ec",
-            "red": "#ef4444"
-        }.get(self.accent_color, "#2563eb")
-        if self.theme_mode == "light":
-            bg = "#f5f6fa"
-            fg = "#181e25"
-            sidebar_bg = "#e9eaf0"
-            border = "#d1d5db"
-            summary_bg = "#fff"
-            help_bg = "#e0e7ef"
-        else:
-            bg = "#181e25"
-            fg = "#f5f6fa"
-            sidebar_bg = "#14181f"
-            border = "#232a34"
-            summary_bg = "#181e25"
-            help_bg = "#232a34"
-        return f"""
-        #MainWindow, #CentralWidget {{
-            background: {bg};
-        }}
-        QWidget {{
-            background: transparent;
-            color: {fg};
-            font-family: 'Be Vietnam Pro', Arial, sans-serif;
-            font-size: 15px;
-        }}
-        #Sidebar {{
-            background: {sidebar_bg};
-            border-right: 1px solid {border};
-        }}
-        #Logo {{
-            font-size: 20px;
-            font-weight: bold;
-            color: {fg};
-        }}
-        #TopBar {{
-            background: transparent;
-        }}
-        #TopBarTitle {{
-            font-size: 18px;
-            font-weight: 600;
-        }}
-        #SettingsButton {{
-            font-size: 20px;
-            border: none;
-            background: transparent;
-        }}
-        #SettingsButton:hover {{
-            background: #2a313c;
-            border-radius: 4px;
-        }}
-        #ViewToggleButton {{
-            border: none;
-            background: transparent;
-        }}
-        #ViewToggleButton:hover {{
-            background: #2a313c;
-            border-radius: 4px;
-        }}
-        #Heading {{
-            font-size: 32px;
-            font-weight: bold;
-            margin-bottom: 8px;
-        }}
-        #Subheading {{
-            font-size: 20px;
-            font-weight: 600;
-            margin-top: 16px;
-            margin-bottom: 4px;
-        }}
-        #CategoryCheckBox {{
-            spacing: 12px;
-            font-size: 16px;
-            margin-left: 8px;
-        }}
-        #StartButton {{
-            background: {accent};
-            color: #fff;
-            border-radius: 8px;
-            padding: 10px 24px;
-            font-size: 16px;
-            font-weight: 600;
-            margin-top: 16px;
-            margin-bottom: 16px;
-        }}
-        #StartButton:hover {{
-            background: #1e40af;
-        }}
-        #SummaryBox {{
-            border: 2px dashed {border};
-            border-radius: 12px;
-            background: {summary_bg};
-            margin-top: 8px;
-            margin-bottom: 8px;
-        }}
-        """
-
-    def browse_folder(self):
-        folder = QFileDialog.getExistingDirectory(self, "Select Folder to Organize")
-        if folder:
-            self.current_folder = folder
-            self.load_files(folder)
-            self.apply_filters()
-
-    def load_files(self, folder):
-        self.file_data = []
-        for file in os.listdir(folder):
-            path = os.path.join(folder, file)
-            if os.path.isfile(path):
-                stat = os.stat(path)
-                size_mb = stat.st_size / (1024 * 1024)
-                mtime = QDateTime.fromSecsSinceEpoch(int(stat.st_mtime))
-                ext = os.path.splitext(file)[1].lower()
-                # Find category
-                category = None
-                for cat, exts in self.category_map.items():
-                    if ext in exts:
-                        category = cat
-                        break
-                if not category:
-                    category = "Other"
-                self.file_data.append({
-                    "name": file,
-                    "size": size_mb,
-                    "type": category,
-                    "ext": ext,
-                    "mtime": mtime,
-                    "path": path
-                })
-
-    def apply_filters(self):
-        # Filter by type
-        type_val = self.type_filter.currentText() if hasattr(self, 'type_filter') else "All"
-        size_val = self.size_filter.currentText() if hasattr(self, 'size_filter') else "All"
-        date_val = self.date_filter.currentText() if hasattr(self, 'date_filter') else "All"
-        filtered = []
-        now = QDateTime.currentDateTime()
-        for f in self.file_data:
-            # Type
-            if type_val != "All" and f["type"] != type_val:
-                continue
-            # Size
-            if size_val == "<10" and f["size"] >= 10:
-                continue
-            if size_val == "10-100" and (f["size"] < 10 or f["size"] > 100):
-                continue
-            if size_val == ">100" and f["size"] <= 100:
-                continue
-            # Date
-            days_ago = f["mtime"].daysTo(now)
-            if date_val == "Today" and days_ago > 0:
-                continue
-            if date_val == "Last 7 Days" and days_ago > 7:
-                continue
-            if date_val == "Last Month" and days_ago > 31:
-                continue
-            if date_val == "Older" and days_ago <= 31:
-                continue
-            filtered.append(f)
-        self.show_files(filtered)
-
-    def show_files(self, files):
-        if not self.view_toggle.isChecked():
-            # List view
-            self.file_table.setVisible(True)
-            self.grid_view.setVisible(False)
-            self.file_table.setRowCount(len(files))
-            for row, f in enumerate(files):
-                self.file_table.setItem(row, 0, QTableWidgetItem(f["name"]))
-                self.file_table.setItem(row, 1, QTableWidgetItem(f"{f['size']:.2f} MB"))
-                self.file_table.setItem(row, 2, QTableWidgetItem(f["type"]))
-                self.file_table.setItem(row, 3, QTableWidgetItem(f["mtime"].toString("yyyy-MM-dd HH:mm")))
-        else:
-            # Grid/thumbnail view
-            self.file_table.setVisible(False)
-            self.grid_view.setVisible(True)
-            self.grid_view.clear()
-            for f in files:
-                item = QListWidgetItem()
-                item.setText(f["name"])
-                if f["type"] in ["Images", "Videos"] and os.path.splitext(f["name"])[1].lower() in [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".svg", ".webp", ".heic"]:
-                    pixmap = QPixmap(f["path"])
-                    if not pixmap.isNull():
-                        item.setIcon(QIcon(pixmap.scaled(96, 96, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)))
-                else:
-                    style = self.style() if hasattr(self, 'style') else None
-                    if style is not None:
-                        item.setIcon(style.standardIcon(QStyle.StandardPixmap.SP_FileIcon))
-                item.setToolTip(f"Size: {f['size']:.2f} MB\nType: {f['type']}\nModified: {f['mtime'].toString('yyyy-MM-dd HH:mm')}")
-                self.grid_view.addItem(item)
-
-    def sort_by_column(self, col):
-        if not hasattr(self, 'file_data') or not self.file_data:
-            return
-        key_map = {0: "name", 1: "size", 2: "type", 3: "mtime"}
-        key = key_map.get(col, "name")
-        reverse = getattr(self, '_sort_reverse', False)
-        self.file_data.sort(key=lambda f: f[key], reverse=reverse)
-        self._sort_reverse = not reverse
-        self.apply_filters()
-
-    def toggle_view(self):
-        style = self.style()
-        if not style:
-            return
-        if self.view_toggle.isChecked():
-            self.view_toggle.setIcon(self.list_icon)
-            self.view_toggle.setToolTip("Switch to List View")
-        else:
-            self.view_toggle.setIcon(self.grid_icon)
-            self.view_toggle.setToolTip("Switch to Grid View")
-        self.apply_filters()
-
-    def open_settings_dialog(self, event=None):
-        dialog = QDialog(self)
-        dialog.setWindowTitle("Settings")
-        dialog.setModal(True)
-        dialog.setMinimumSize(500, 400)
-        layout = QVBoxLayout(dialog)
-        tabs = QTabWidget()
-        # Theme & Color Tab
-        theme_tab = QWidget()
-        theme_layout = QVBoxLayout(theme_tab)
-        theme_layout.addWidget(QLabel("Theme:"))
-        theme_combo = QComboBox()
-        theme_combo.addItems(["Light", "Dark"])
-        theme_combo.setCurrentText(self.theme_mode.capitalize())
-        theme_layout.addWidget(theme_combo)
-        theme_layout.addWidget(QLabel("Accent Color:"))
-        color_combo = QComboBox()
-        color_combo.addItems(["Blue", "Green", "Orange", "Purple", "Red"])
-        color_combo.setCurrentText(self.accent_color.capitalize())
-        theme_layout.addWidget(color_combo)
-        theme_layout.addStretch()
-        def apply_theme():
-            self.theme_mode = theme_combo.currentText().lower()
-            self.accent_color = color_combo.currentText().lower()
-            self.setStyleSheet(self.get_stylesheet())
-        theme_combo.currentTextChanged.connect(apply_theme)
-        color_combo.currentTextChanged.connect(apply_theme)
-        tabs.addTab(theme_tab, "Theme & Color")
-        # Custom Rules Tab
-        rules_tab = QWidget()
-        rules_layout = QVBoxLayout(rules_tab)
-        rules_layout.addWidget(QLabel("Add a custom rule:"))
-        rule_input_layout = QHBoxLayout()
-        contains_edit = QLineEdit()
-        contains_edit.setPlaceholderText("If filename contains...")
-        target_edit = QLineEdit()
-        target_edit.setPlaceholderText("Move to category...")
-        add_rule_btn = QPushButton("Add Rule")
-        rule_input_layout.addWidget(contains_edit)
-        rule_input_layout.addWidget(target_edit)
-        rule_input_layout.addWidget(add_rule_btn)
-        rules_layout.addLayout(rule_input_layout)
-        rules_list = QListWidget()
-        for contains, target in self.custom_rules:
-            rules_list.addItem(f"If filename contains '{contains}', move to '{target}'")
-        rules_layout.addWidget(rules_list)
-        def add_rule():
-            contains = contains_edit.text().strip()
-            target = target_edit.text().strip()
-            if contains and target:
-                self.custom_rules.append((contains, target))
-                rules_list.addItem(f"If filename contains '{contains}', move to '{target}'")
-                contains_edit.clear()
-                target_edit.clear()
-            else:
-                QMessageBox.warning(dialog, "Input Error", "Both fields are required.")
-        add_rule_btn.clicked.connect(add_rule)
-        def remove_rule():
-            row = rules_list.currentRow()
-            if row >= 0:
-                rules_list.takeItem(row)
-                del self.custom_rules[row]
-        rules_list.itemDoubleClicked.connect(lambda _: remove_rule())
-        rules_layout.addWidget(QLabel("(Double-click a rule to delete it.)"))
-        rules_layout.addStretch()
-        tabs.addTab(rules_tab, "Custom Rules")
-        # Category Extensions Tab
-        cat_tab = QWidget()
-        cat_layout = QVBoxLayout(cat_tab)
-        cat_layout.addWidget(QLabel("Edit category extensions:"))
-        cat_list = QListWidget()
-        for cat in self.category_map:
-            cat_list.addItem(cat)
-        cat_layout.addWidget(cat_list)
-        ext_list = QListWidget()
-        cat_layout.addWidget(QLabel("Extensions for selected category:"))
-        cat_layout.addWidget(ext_list)
-        ext_input_layout = QHBoxLayout()
-        ext_edit = QLineEdit()
-        ext_edit.setPlaceholderText("Add extension (e.g. .exe)")
-        add_ext_btn = QPushButton("Add Extension")
-        ext_input_layout.addWidget(ext_edit)
-        ext_input_layout.addWidget(add_ext_btn)
-        cat_layout.addLayout(ext_input_layout)
-        del_ext_btn = QPushButton("Remove Selected Extension")
-        cat_layout.addWidget(del_ext_btn)
-        # Add/remove category
-        cat_input_layout = QHBoxLayout()
-        cat_name_edit = QLineEdit()
-        cat_name_edit.setPlaceholderText("New category name")
-        add_cat_btn = QPushButton("Add Category")
-        del_cat_btn = QPushButton("Remove Selected Category")
-        cat_input_layout.addWidget(cat_name_edit)
-        cat_input_layout.addWidget(add_cat_btn)
-        cat_input_layout.addWidget(del_cat_btn)
-        cat_layout.addLayout(cat_input_layout)
-        cat_layout.addStretch()
-        tabs.addTab(cat_tab, "Category Extensions")
-        # Logic for category/extensions editing
-        def refresh_ext_list():
-            ext_list.clear()
-            cat_item = cat_list.currentItem()
-            cat = cat_item.text() if cat_item is not None else None
-            if cat and cat in self.category_map:
-                for ext in self.category_map[cat]:
-                    ext_list.addItem(ext)
-        def on_cat_selected():
-            refresh_ext_list()
-        cat_list.currentItemChanged.connect(lambda *_: on_cat_selected())
-        def add_extension():
-            cat_item = cat_list.currentItem()
-            cat = cat_item.text() if cat_item is not None else None
-            ext = ext_edit.text().strip()
-            if cat and ext and ext.startswith('.') and ext not in self.category_map[cat]:
-                self.category_map[cat].append(ext)
-                refresh_ext_list()
-                ext_edit.clear()
-        add_ext_btn.clicked.connect(add_extension)
-        def remove_extension():
-            cat_item = cat_list.currentItem()
-            cat = cat_item.text() if cat_item is not None else None
-            ext_item = ext_list.currentItem()
-            if cat and ext_item:
-                ext = ext_item.text()
-                if ext in self.category_map[cat]:
-                    self.category_map[cat].remove(ext)
-                    refresh_ext_list()
-        del_ext_btn.clicked.connect(remove_extension)
-        def add_category():
-            name = cat_name_edit.text().strip()
-            if name and name not in self.category_map:
-                self.category_map[name] = []
-                cat_list.addItem(name)
-                cat_name_edit.clear()
-        add_cat_btn.clicked.connect(add_category)
-        def remove_category():
-            cat_item = cat_list.currentItem()
-            cat = cat_item.text() if cat_item is not None else None
-            if cat and cat not in self.builtin_categories:
-                idx = cat_list.currentRow()
-                cat_list.takeItem(idx)
-                del self.category_map[cat]
-                ext_list.clear()
-        del_cat_btn.clicked.connect(remove_category)
-        # Select first category by default
-        if cat_list.count() > 0:
-            cat_list.setCurrentRow(0)
-        layout.addWidget(tabs)
-        btns = QHBoxLayout()
-        close_btn = QPushButton("Close")
-        close_btn.clicked.connect(dialog.accept)
-        btns.addStretch()
-        btns.addWidget(close_btn)
-        layout.addLayout(btns)
-        dialog.exec()
-
-def main():
-    app = QApplication(sys.argv)
-    window = SortlifyMainWindow()
-    window.show()
-    sys.exit(app.exec())
-
-if __name__ == "__main__":
-    main() 
+import time
+LAUNCHED = time.perf_counter()  # startup is measured from here to the main window's first paint
+import sys
+import os
+import hashlib
+import html
+import sqlite3
+from functools import lru_cache
+from PyQt6.QtWidgets import (
+    QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+    QCheckBox, QFrame, QSizePolicy, QSpacerItem, QFileDialog, QDialog, QTabWidget, QComboBox, QLineEdit, QPlainTextEdit, QSpinBox, QListWidget, QMessageBox, QInputDialog,
+    QTableView, QAbstractItemView, QHeaderView, QSlider, QGridLayout, QListView, QStyle, QStyledItemDelegate, QStyleOptionViewItem, QStyleOptionButton
+)
+from PyQt6.QtGui import QFont, QPixmap, QIcon, QBrush, QColor, QImage, QImageReader
+from PyQt6.QtCore import (
+    Qt, pyqtSignal, QSize, QDateTime, QThread, QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, QTimer
+)
+from collections import OrderedDict
+from sortlify_core.classify import BUILTIN_CATEGORIES, Classifier, classify_entries
+from sortlify_core.common import MB, app_cache_dir
+from sortlify_core.duplicates import find_duplicates
+from sortlify_core.filters import DATE_FILTERS, SIZE_FILTERS
+from sortlify_core.metadata import EXTRACTORS, MetadataCache
+from sortlify_core.organize import Organizer, plan_moves
+from sortlify_core.profiling import PROFILER
+from sortlify_core.rules import RuleProgram, parse_rules
+from sortlify_core.scan import ScanCache, scan_tree
+from sortlify_core.search import SearchIndex
+from sortlify_core.settings import Settings
+from sortlify_core.text import CONTENT_EXTS
+
+def load_engine():
+    """Import NumPy and the modules built on it, which take longer than the rest of start-up
+    together; the main window calls this once its first frame is on screen."""
+    global np, FileIndex, FilterCache, SortCache, DEFAULT_TEMPLATE, INVALID, RENUMBERED, STATUS_TEXT, UNCHANGED
+    global Renamer, plan_renames, HASH_EXTS, HashCache, group_similar, SizeTree
+    import numpy as np
+    from sortlify_core.index import FileIndex, FilterCache, SortCache
+    from sortlify_core.rename import DEFAULT_TEMPLATE, INVALID, RENUMBERED, STATUS_TEXT, UNCHANGED, Renamer, plan_renames
+    from sortlify_core.similar import HASH_EXTS, HashCache, group_similar
+    from sortlify_core.sizes import SizeTree
+
+class ClickableLabel(QLabel):
+    clicked = pyqtSignal()
+    def mousePressEvent(self, ev):
+        self.clicked.emit()
+        super().mousePressEvent(ev)
+
+STARTUP_BUDGET_MS = 300
+RULE_FIELDS = {"name": "Filename contains", "year": "Year taken is", "creator": "Camera / artist contains"}
+
+def describe_rule(rule):
+    text, target, field = rule
+    return f"If {RULE_FIELDS[field].lower()} '{text}', move to '{target}'"
+
+class ScanWorker(QThread):
+    """Scans a folder tree off the GUI thread and emits FileIndex fragments in batches."""
+    batch_ready = pyqtSignal(object)
+    progress = pyqtSignal(int)
+    scan_finished = pyqtSignal(int, bool)  # total files, cancelled
+
+    def __init__(self, folder, classifier, batch_size=1000, use_cache=True, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self.classifier = classifier
+        self.batch_size = batch_size
+        self.use_cache = use_cache
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def batches(self):
+        if self.use_cache:
+            # The connection has to be opened on the thread that uses it
+            try:
+                cache = ScanCache()
+            except (OSError, sqlite3.Error):
+                cache = None
+            if cache is not None:
+                try:
+                    yield from cache.scan(self.folder, self.classifier, self.batch_size, self.is_cancelled)
+                finally:
+                    cache.close()
+                return
+        for entries in scan_tree(self.folder, self.batch_size, self.is_cancelled):
+            yield classify_entries(self.classifier, entries)
+
+    def run(self):
+        total = 0
+        with PROFILER.thread_profile(), PROFILER.span("scan", folder=self.folder):
+            batches = self.batches()
+            while True:
+                # Listing and stat'ing, or reading unchanged directories back from the cache
+                with PROFILER.span("stat"):
+                    rows = next(batches, None)
+                if rows is None:
+                    break
+                fragment = FileIndex()
+                fragment.append_batch(rows)
+                if self.classifier.program:
+                    fragment.reclassify(self.classifier)
+                # Natural name keys are the costly part of sorting; work them out here, not on the GUI thread
+                fragment.prepare_sort_keys()
+                total += len(rows)
+                PROFILER.count("files", len(rows))
+                self.batch_ready.emit(fragment)
+                self.progress.emit(total)
+        self.scan_finished.emit(total, self._cancelled)
+
+class OrganizeWorker(QThread):
+    """Runs (or rolls back) an Organizer off the GUI thread."""
+    progress = pyqtSignal(int, int, int)  # completed, total, errors
+    organize_finished = pyqtSignal(int, list, bool)  # completed, error messages, cancelled
+
+    def __init__(self, organizer, rollback=False, parent=None):
+        super().__init__(parent)
+        self.organizer = organizer
+        self.rollback = rollback
+        self._cancelled = False
+        self._last_report = 0.0
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def report(self, completed, total, errors):
+        # Throttle so 100k tiny moves don't flood the event loop
+        now = time.monotonic()
+        if now - self._last_report >= 0.1 or completed + errors >= total:
+            self._last_report = now
+            self.progress.emit(completed, total, errors)
+
+    def run(self):
+        action = self.organizer.rollback if self.rollback else self.organizer.run
+        with PROFILER.thread_profile(), PROFILER.span("organize", moves=len(self.organizer.moves)):
+            completed, errors = action(self.report, self.is_cancelled)
+        self.organize_finished.emit(completed, errors, self._cancelled)
+
+class DuplicateWorker(QThread):
+    """Runs the staged duplicate search off the GUI thread."""
+    progress = pyqtSignal(str, int, int)  # stage, done, total
+    duplicates_found = pyqtSignal(list, bool)  # [(size, paths)], cancelled
+
+    def __init__(self, files, parent=None):
+        super().__init__(parent)
+        self.files = files
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        with PROFILER.thread_profile(), PROFILER.span("duplicates", files=len(self.files)):
+            groups = find_duplicates(self.files, progress=self.progress.emit, is_cancelled=self.is_cancelled)
+        self.duplicates_found.emit(groups, self._cancelled)
+
+class SimilarWorker(QThread):
+    """Perceptually hashes images (cached, in a process pool) and groups near-duplicates."""
+    progress = pyqtSignal(int, int)  # images done, total
+    similar_found = pyqtSignal(object, object, bool)  # index rows, group id per row (-1 for none), cancelled
+
+    def __init__(self, rows, files, parent=None):
+        super().__init__(parent)
+        self.rows = rows
+        self.files = files
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        rows, groups = self.rows[:0], np.empty(0, np.int64)
+        hashes = np.zeros(len(self.files), np.int64)
+        decoded = np.zeros(len(self.files), np.bool_)
+        cache = HashCache()
+        try:
+            with PROFILER.thread_profile(), PROFILER.span("similar", files=len(self.files)):
+                for start, batch in cache.hashes(self.files, is_cancelled=self.is_cancelled):
+                    for i, pair in enumerate(batch, start):
+                        if pair is not None:
+                            hashes[i] = pair[1]
+                            decoded[i] = True
+                    self.progress.emit(start + len(batch), len(self.files))
+                if not self._cancelled:
+                    rows, groups = self.rows[decoded], group_similar(hashes[decoded].view(np.uint64))
+        finally:
+            cache.close()
+            self.similar_found.emit(rows, groups, self._cancelled)
+
+class SuggestWorker(QThread):
+    """Learns from finished organize runs, then suggests categories for a batch of files."""
+    suggestions_ready = pyqtSignal(object, list)  # index rows, [(category, confidence)]
+    suggest_finished = pyqtSignal(bool, bool)  # trained, cancelled
+
+    def __init__(self, rows, files, parent=None):
+        super().__init__(parent)
+        self.rows = rows
+        self.files = files
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        from sortlify_core.suggest import Suggester
+        suggester = Suggester()
+        try:
+            with PROFILER.thread_profile(), PROFILER.span("suggest", files=len(self.files)):
+                suggester.learn(is_cancelled=self.is_cancelled)
+                for start, suggestions in suggester.suggest(self.files, is_cancelled=self.is_cancelled):
+                    self.suggestions_ready.emit(self.rows[start:start + len(suggestions)], suggestions)
+        finally:
+            suggester.close()
+            self.suggest_finished.emit(suggester.trained, self._cancelled)
+
+class IndexWorker(QThread):
+    """Brings the full-text search index up to date with a freshly scanned folder."""
+    progress = pyqtSignal(int, int)  # documents indexed, documents to index
+    index_finished = pyqtSignal(int, bool)  # documents indexed, cancelled
+
+    def __init__(self, root, files, parent=None):
+        super().__init__(parent)
+        self.root = root
+        self.files = files
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        index = SearchIndex()
+        indexed = 0
+        try:
+            with PROFILER.thread_profile(), PROFILER.span("index_documents", files=len(self.files)):
+                indexed = index.update(self.root, self.files, progress=self.progress.emit,
+                                       is_cancelled=self.is_cancelled)
+        finally:
+            index.close()
+            self.index_finished.emit(indexed, self._cancelled)
+
+class MetadataWorker(QThread):
+    """Reads EXIF/ID3/MP4 metadata for scanned files, streaming results back in batches."""
+    batch_ready = pyqtSignal(object, list)  # index rows, [meta dict]
+    progress = pyqtSignal(int, int)  # files done, total
+    metadata_finished = pyqtSignal(bool)  # cancelled
+
+    def __init__(self, rows, files, parent=None):
+        super().__init__(parent)
+        self.rows = rows
+        self.files = files
+        self._cancelled = False
+
+    def cancel(self):
+        self._cancelled = True
+
+    def is_cancelled(self):
+        return self._cancelled
+
+    def run(self):
+        cache = MetadataCache()
+        try:
+            with PROFILER.thread_profile(), PROFILER.span("metadata", files=len(self.files)):
+                for start, metas in cache.extract(self.files, is_cancelled=self.is_cancelled):
+                    self.batch_ready.emit(self.rows[start:start + len(metas)], metas)
+                    self.progress.emit(start + len(metas), len(self.files))
+        finally:
+            cache.close()
+            self.metadata_finished.emit(self._cancelled)
+
+THUMBNAIL_EXTS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".svg", ".webp", ".heic"}
+
+def decode_thumbnail(path, size):
+    """Decode an image straight to thumbnail size, returning a QImage (null on failure).
+
+    Pillow's draft mode lets the JPEG decoder skip to a 1/2, 1/4 or 1/8 scale decode, so
+    a camera photo never has to be inflated to full resolution; formats Pillow can't read
+    fall back to QImageReader with a scaled size.
+    """
+    try:
+        from PIL import Image
+        with Image.open(path) as im:
+            im.draft("RGB", (size, size))
+            im.thumbnail((size, size))
+            im = im.convert("RGBA")
+            data = im.tobytes("raw", "RGBA")
+            return QImage(data, im.width, im.height, QImage.Format.Format_RGBA8888).copy()
+    except Exception:
+        pass
+    reader = QImageReader(path)
+    full = reader.size()
+    if full.isValid():
+        reader.setScaledSize(full.scaled(size, size, Qt.AspectRatioMode.KeepAspectRatio))
+    return reader.read()
+
+class PixmapCache:
+    """LRU cache of pixmaps bounded by their decoded size in bytes."""
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._items = OrderedDict()
+
+    def get(self, key):
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.used -= old.width() * old.height() * 4
+        self._items[key] = pixmap
+        self.used += pixmap.width() * pixmap.height() * 4
+        while self.used > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self.used -= evicted.width() * evicted.height() * 4
+
+class _ThumbnailSignals(QObject):
+    loaded = pyqtSignal(str, QImage)
+
+class ThumbnailJob(QRunnable):
+    def __init__(self, key, path, disk_path, size, signals):
+        super().__init__()
+        self.key = key
+        self.path = path
+        self.disk_path = disk_path
+        self.size = size
+        self.signals = signals
+
+    def run(self):
+        image = QImage()
+        if self.disk_path and os.path.exists(self.disk_path):
+            image.load(self.disk_path)
+        if not image.isNull():
+            PROFILER.count("thumbnail.disk_hits")
+        else:
+            with PROFILER.span("thumbnail", path=self.path):
+                image = decode_thumbnail(self.path, self.size)
+            if not image.isNull() and self.disk_path:
+                try:
+                    os.makedirs(os.path.dirname(self.disk_path), exist_ok=True)
+                    image.save(self.disk_path, "PNG")
+                except OSError:
+                    pass
+        self.signals.loaded.emit(self.key, image)
+
+class ThumbnailService(QObject):
+    """Decodes thumbnails on a thread pool, backed by an in-memory LRU and an on-disk cache.
+
+    pixmap() never blocks: it returns a cached pixmap or None after queueing a decode, and
+    thumbnail_ready fires with the key once the pixmap is available.
+    """
+    thumbnail_ready = pyqtSignal(str)
+
+    def __init__(self, size=96, max_bytes=64 * MB, cache_dir=None, parent=None):
+        super().__init__(parent)
+        self.size = size
+        self.cache_dir = cache_dir if cache_dir is not None else os.path.join(app_cache_dir(), "thumbnails")
+        self.memory = PixmapCache(max_bytes)
+        self.pending = set()
+        self.failed = set()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max(2, QThread.idealThreadCount() - 1))
+        self._signals = _ThumbnailSignals()
+        self._signals.loaded.connect(self._on_loaded)
+
+    def key(self, path, mtime, size):
+        return hashlib.sha1(f"{path}\0{mtime}\0{size}\0{self.size}".encode("utf-8", "surrogateescape")).hexdigest()
+
+    def pixmap(self, path, mtime, size):
+        key = self.key(path, mtime, size)
+        pixmap = self.memory.get(key)
+        if pixmap is not None:
+            PROFILER.count("thumbnail.memory_hits")
+        elif key not in self.pending and key not in self.failed:
+            self.pending.add(key)
+            disk_path = os.path.join(self.cache_dir, key[:2], key + ".png") if self.cache_dir else None
+            self.pool.start(ThumbnailJob(key, path, disk_path, self.size, self._signals))
+            PROFILER.gauge("thumbnail.queued", len(self.pending))
+        return key, pixmap
+
+    def cancel_pending(self):
+        """Drop queued decodes that haven't started, e.g. when the visible rows change."""
+        self.pool.clear()
+        self.pending.clear()
+
+    def shutdown(self):
+        self.cancel_pending()
+        self.pool.waitForDone()
+
+    def _on_loaded(self, key, image):
+        self.pending.discard(key)
+        PROFILER.gauge("thumbnail.queued", len(self.pending))
+        if image.isNull():
+            self.failed.add(key)
+        else:
+            self.memory.put(key, QPixmap.fromImage(image))
+            self.thumbnail_ready.emit(key)
+
+class FileTableModel(QAbstractTableModel):
+    """Table model over an array of FileIndex rows; cells are only formatted when a view asks for them.
+
+    Given a ThumbnailService, column 0 also serves icons for the grid view; thumbnails are
+    only requested for rows the view actually paints.
+    """
+    headers = ["Name", "Size", "Type", "Modified Date", "Suggested"]
+
+    def __init__(self, parent=None, thumbnails=None, file_icon=None, suggestions=None):
+        super().__init__(parent)
+        self._index = None  # set with the first rows, once NumPy has been loaded
+        self._rows = ()
+        self.suggestions = suggestions if suggestions is not None else {}
+        self.thumbnails = thumbnails
+        self.file_icon = file_icon if file_icon is not None else QIcon()
+        self._waiting = {}
+        self.sort_marks = {}  # column -> text shown after its header
+        self.groups = None  # group id per index row; while set, grouped names get a "#n" prefix
+        if thumbnails is not None:
+            thumbnails.thumbnail_ready.connect(self._on_thumbnail_ready)
+
+    def set_rows(self, index, rows):
+        self.beginResetModel()
+        self._index = index
+        self._rows = rows
+        if self._waiting and self.thumbnails is not None:
+            self.thumbnails.cancel_pending()
+        self._waiting = {}
+        self.endResetModel()
+
+    def append_rows(self, rows):
+        if not len(rows):
+            return
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(rows) - 1)
+        self._rows = np.concatenate((self._rows, rows))
+        self.endInsertRows()
+
+    def index_row(self, row):
+        return int(self._rows[row])
+
+    def rows(self):
+        """The index rows shown, in display order."""
+        return self._rows
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = int(self._rows[index.row()])
+        col = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                if self.groups is not None and self.groups[row] >= 0:
+                    return f"#{self.groups[row] + 1} {self._index.name(row)}"
+                return self._index.name(row)
+            if col == 1:
+                return f"{self._index.size[row] / MB:.2f} MB"
+            if col == 2:
+                return self._index.category_name(row)
+            if col == 3:
+                return QDateTime.fromSecsSinceEpoch(int(self._index.mtime[row])).toString("yyyy-MM-dd HH:mm")
+            if col == 4:
+                suggestion = self.suggestions.get(row)
+                return f"{suggestion[0]} ({suggestion[1]:.0%})" if suggestion else ""
+        elif role == Qt.ItemDataRole.ToolTipRole and col == 0:
+            if self.thumbnails is None:
+                return self._index.path(row)
+            modified = QDateTime.fromSecsSinceEpoch(int(self._index.mtime[row])).toString("yyyy-MM-dd HH:mm")
+            return f"Size: {self._index.size[row] / MB:.2f} MB\nType: {self._index.category_name(row)}\nModified: {modified}"
+        elif role == Qt.ItemDataRole.DecorationRole and col == 0 and self.thumbnails is not None:
+            return self.icon(index.row(), row)
+        return None
+
+    def icon(self, view_row, row):
+        if self._index.category_name(row) not in ("Images", "Videos") or self._index.ext_name(row) not in THUMBNAIL_EXTS:
+            return self.file_icon
+        key, pixmap = self.thumbnails.pixmap(self._index.path(row), int(self._index.mtime[row]), int(self._index.size[row]))
+        if pixmap is None:
+            self._waiting[key] = view_row
+            return self.file_icon
+        return QIcon(pixmap)
+
+    def _on_thumbnail_ready(self, key):
+        view_row = self._waiting.pop(key, None)
+        if view_row is not None and view_row < len(self._rows):
+            index = self.index(view_row, 0)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def refresh_column(self, col):
+        if len(self._rows):
+            self.dataChanged.emit(self.index(0, col), self.index(len(self._rows) - 1, col), [Qt.ItemDataRole.DisplayRole])
+
+    def set_sort_marks(self, marks):
+        """Show sort direction (and position, for multi-column sorts) next to column headers."""
+        self.sort_marks = marks
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(self.headers) - 1)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            mark = self.sort_marks.get(section)
+            return f"{self.headers[section]} {mark}" if mark else self.headers[section]
+        return None
+
+class PaintTimer:
+    """Mixin recording a view's paintEvent as a "paint" span while profiling."""
+    def paintEvent(self, event):
+        with PROFILER.span("paint", view=type(self).__name__):
+            super().paintEvent(event)
+
+class FileTableView(PaintTimer, QTableView):
+    pass
+
+class FileGridView(PaintTimer, QListView):
+    pass
+
+class StallDetector(QObject):
+    """Notices GUI-thread blocks: a short timer that fires late means the event loop was busy.
+
+    Every tick that arrives more than threshold_ms after it was due is recorded as a
+    stall spanning the time since the previous tick.
+    """
+    def __init__(self, threshold_ms=50, interval_ms=10, parent=None):
+        super().__init__(parent)
+        self.threshold_ms = threshold_ms
+        self._last = None
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self._tick)
+
+    def start(self):
+        self._last = time.perf_counter_ns()
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def _tick(self):
+        now = time.perf_counter_ns()
+        late = now - self._last - self._timer.interval() * 1_000_000
+        if late >= self.threshold_ms * 1_000_000:
+            PROFILER.stall(self._last, now - self._last)
+            PROFILER.count("gui.stalls")
+        self._last = now
+
+class SizeChartDialog(QDialog):
+    """Where the bytes are: a pie of categories and bars of the largest folders, drawn with matplotlib.
+
+    matplotlib is imported when the dialog is first opened, so it costs nothing at
+    startup. Charts are only drawn while the dialog is visible; changes that arrive
+    while it is hidden just mark it stale. Clicking a bar drills into that folder.
+    """
+    def __init__(self, window, top=15):
+        super().__init__(window)
+        from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg
+        from matplotlib.figure import Figure
+        self.main_window = window
+        self.top = top
+        self.folder = None
+        self.stale = True
+        self._bars = {}
+        self.setWindowTitle("File Sizes")
+        self.setMinimumSize(900, 520)
+        layout = QVBoxLayout(self)
+        nav = QHBoxLayout()
+        self.up_btn = QPushButton("Up")
+        self.up_btn.clicked.connect(self.go_up)
+        nav.addWidget(self.up_btn)
+        self.path_label = QLabel("")
+        nav.addWidget(self.path_label, 1)
+        layout.addLayout(nav)
+        self.figure = Figure(figsize=(9, 5), layout="constrained")
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.canvas.mpl_connect("pick_event", self.on_pick)
+        layout.addWidget(self.canvas)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.stale:
+            self.refresh()
+
+    def refresh(self):
+        """Redraw now if visible, otherwise on the next show."""
+        self.stale = True
+        tree = self.main_window.size_tree
+        if not self.isVisible() or tree is None:
+            return
+        self.stale = False
+        if self.folder is None or tree.total(self.folder)[1] == 0:
+            self.folder = tree.root
+        with PROFILER.span("size_chart"):
+            self._draw(tree)
+
+    def _draw(self, tree):
+        total, files = tree.total(self.folder)
+        self.path_label.setText(f"{self.folder}  ({total / MB:,.1f} MB in {files:,} files)")
+        self.up_btn.setEnabled(self.folder != tree.root)
+        self.figure.clear()
+        pie, bars = self.figure.subplots(1, 2, width_ratios=[2, 3])
+        categories = sorted(tree.categories.items(), key=lambda item: -item[1][0])
+        shown = [(name, b) for name, (b, _) in categories[:7]]
+        rest = sum(b for _, (b, _) in categories[7:])
+        if rest:
+            shown.append(("Other categories", rest))
+        if any(b for _, b in shown):
+            # Small slices get no percentage, so their labels don't pile up; the legend names them all
+            wedges, _, _ = pie.pie([b for _, b in shown], autopct=lambda pct: f"{pct:.0f}%" if pct >= 4 else "",
+                                   startangle=90, counterclock=False, textprops={"fontsize": 8})
+            pie.legend(wedges, [name for name, _ in shown], fontsize=8, loc="upper center",
+                       bbox_to_anchor=(0.5, 0), ncols=2, frameon=False)
+        pie.set_title("All files by category", fontsize=10)
+        largest = tree.top(self.top, self.folder)
+        self._bars = {}
+        if largest:
+            labels = [os.path.relpath(path, self.folder) for path, _, _ in largest]
+            drawn = bars.barh(range(len(largest)), [b / MB for _, b, _ in largest], picker=True)
+            for bar, (path, _, _) in zip(drawn, largest):
+                self._bars[bar] = path
+            bars.set_yticks(range(len(largest)), labels, fontsize=8)
+            bars.invert_yaxis()
+        bars.set_xlabel("MB")
+        bars.set_title("Largest folders (click to open)", fontsize=10)
+        self.canvas.draw_idle()
+
+    def on_pick(self, event):
+        path = self._bars.get(event.artist)
+        if path is not None:
+            self.folder = path
+            self.refresh()
+
+    def go_up(self):
+        tree = self.main_window.size_tree
+        if tree is not None and self.folder != tree.root:
+            self.folder = os.path.dirname(self.folder)
+            self.refresh()
+
+class RenamePreviewModel(QAbstractTableModel):
+    """Current and new names of a RenamePlan; cells are formatted only when painted."""
+    headers = ["Current Name", "New Name", "Status"]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.plan = None
+        self.colors = {UNCHANGED: "#9ca3af", RENUMBERED: "#f59e0b", INVALID: "#ef4444"}
+
+    def set_plan(self, plan):
+        self.beginResetModel()
+        self.plan = plan
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() or self.plan is None else len(self.plan)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or self.plan is None:
+            return None
+        row, col = index.row(), index.column()
+        status = int(self.plan.status[row])
+        if role == Qt.ItemDataRole.DisplayRole:
+            if col == 0:
+                return self.plan.names[row]
+            if col == 1:
+                return self.plan.targets[row]
+            return STATUS_TEXT[status]
+        if role == Qt.ItemDataRole.ForegroundRole and col > 0 and status in self.colors:
+            return QBrush(QColor(self.colors[status]))
+        if role == Qt.ItemDataRole.ToolTipRole and col == 0:
+            return self.plan.folders[row]
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+class RenameDialog(QDialog):
+    """Batch rename of the shown files by template, previewed live.
+
+    The whole selection is re-planned (see sortlify_core.rename) shortly after each edit;
+    folder listings are kept between plans, so a preview costs no filesystem calls once
+    the first one is done. Renames run on the main window's organize worker.
+    """
+    def __init__(self, window):
+        super().__init__(window)
+        self.main_window = window
+        self.index = None
+        self.rows = np.empty(0, np.int64)
+        self.listings = {}
+        self.plan = None
+        self.setWindowTitle("Batch Rename")
+        self.setMinimumSize(760, 520)
+        layout = QVBoxLayout(self)
+        form = QHBoxLayout()
+        form.addWidget(QLabel("Template:"))
+        self.template_edit = QLineEdit(DEFAULT_TEMPLATE)
+        self.template_edit.setToolTip("Fields: {name} {ext} {date:%Y-%m-%d} {counter:04} {category} {folder} {size}\n"
+                                      "Text fields also take :lower, :upper or :title")
+        self.template_edit.textChanged.connect(self.schedule_preview)
+        form.addWidget(self.template_edit, 1)
+        form.addWidget(QLabel("Start at:"))
+        self.start_spin = QSpinBox()
+        self.start_spin.setRange(0, 10 ** 9)
+        self.start_spin.setValue(1)
+        self.start_spin.valueChanged.connect(self.schedule_preview)
+        form.addWidget(self.start_spin)
+        layout.addLayout(form)
+        self.status_label = QLabel("")
+        layout.addWidget(self.status_label)
+        self.model = RenamePreviewModel(self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+        self.table.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.table.verticalHeader().setVisible(False)
+        self.table.verticalHeader().setDefaultSectionSize(22)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.setColumnWidth(0, 280)
+        self.table.setColumnWidth(1, 280)
+        layout.addWidget(self.table, 1)
+        buttons = QHBoxLayout()
+        self.undo_btn = QPushButton("Undo Last Rename")
+        self.undo_btn.clicked.connect(self.undo_last)
+        buttons.addWidget(self.undo_btn)
+        buttons.addStretch()
+        self.rename_btn = QPushButton("Rename")
+        self.rename_btn.setObjectName("StartButton")
+        self.rename_btn.clicked.connect(self.run_rename)
+        buttons.addWidget(self.rename_btn)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(150)
+        self.preview_timer.timeout.connect(self.update_preview)
+
+    def root(self):
+        return os.path.abspath(self.main_window.current_folder)
+
+    def set_rows(self, index, rows):
+        """Preview renaming rows of index, numbered in the given order."""
+        self.index = index
+        self.rows = rows
+        # The folder was probably reloaded since the last preview
+        self.listings = {}
+        self.undo_btn.setEnabled(Renamer.last_completed(self.root()) is not None)
+        self.update_preview()
+
+    def schedule_preview(self):
+        self.preview_timer.start()
+
+    def update_preview(self):
+        self.preview_timer.stop()
+        try:
+            with PROFILER.span("rename_plan", rows=len(self.rows)):
+                self.plan = plan_renames(self.index, self.rows, self.template_edit.text(),
+                                         self.start_spin.value(), self.listings)
+        except ValueError as e:
+            self.plan = None
+            self.model.set_plan(None)
+            self.rename_btn.setEnabled(False)
+            self.status_label.setText(f"<span style='color:#ef4444'>{html.escape(str(e))}</span>")
+            return
+        self.model.set_plan(self.plan)
+        counts = self.plan.counts()
+        self.status_label.setText(", ".join(f"{n:,} {label.lower()}" for label, n in counts.items()) or "No files shown")
+        self.rename_btn.setEnabled(len(self.plan.renames()) > 0)
+
+    def run_rename(self):
+        if self.plan is None or self.main_window.organize_worker is not None:
+            return
+        count = len(self.plan.renames())
+        if not count:
+            return
+        answer = QMessageBox.question(self, "Batch Rename", f"Rename {count:,} files?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            renamer = Renamer.create(self.root(), self.plan.steps())
+        except OSError as e:
+            QMessageBox.warning(self, "Rename Error", f"Could not write the rename journal: {e}")
+            return
+        self.hide()
+        self.main_window.start_organize(renamer)
+
+    def undo_last(self):
+        if self.main_window.organize_worker is not None:
+            return
+        path = Renamer.last_completed(self.root())
+        if path is None:
+            self.undo_btn.setEnabled(False)
+            return
+        renamer = Renamer.load(path)
+        answer = QMessageBox.question(self, "Undo Rename", f"Give {len(renamer.done):,} files their previous names back?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        self.hide()
+        self.main_window.start_organize(renamer, rollback=True)
+
+class SettingsDialog(QDialog):
+    """Theme, profiles, rules, category extensions and diagnostics.
+
+    Built the first time it is opened and reused after that; sync() reloads every widget
+    from the main window's current state before each showing.
+    """
+    def __init__(self, window):
+        super().__init__(window)
+        self.main_window = window
+        self.setWindowTitle("Settings")
+        self.setModal(True)
+        self.setMinimumSize(500, 400)
+        layout = QVBoxLayout(self)
+        # Profile selector: rules and category extensions below belong to the chosen profile
+        profile_bar = QHBoxLayout()
+        profile_bar.addWidget(QLabel("Profile:"))
+        self.profile_combo = QComboBox()
+        self.profile_combo.textActivated.connect(self.switch_profile)
+        profile_bar.addWidget(self.profile_combo, 1)
+        new_profile_btn = QPushButton("New...")
+        new_profile_btn.setToolTip("Start a new profile from a copy of this one")
+        new_profile_btn.clicked.connect(self.new_profile)
+        profile_bar.addWidget(new_profile_btn)
+        self.delete_profile_btn = QPushButton("Delete")
+        self.delete_profile_btn.clicked.connect(self.delete_profile)
+        profile_bar.addWidget(self.delete_profile_btn)
+        layout.addLayout(profile_bar)
+        tabs = QTabWidget()
+        tabs.addTab(self._theme_tab(), "Theme & Color")
+        tabs.addTab(self._rules_tab(), "Custom Rules")
+        tabs.addTab(self._advanced_tab(), "Advanced Rules")
+        tabs.addTab(self._categories_tab(), "Category Extensions")
+        tabs.addTab(self._diagnostics_tab(), "Diagnostics")
+        layout.addWidget(tabs)
+        btns = QHBoxLayout()
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        btns.addStretch()
+        btns.addWidget(close_btn)
+        layout.addLayout(btns)
+
+    def _theme_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        layout.addWidget(QLabel("Theme:"))
+        self.theme_combo = QComboBox()
+        self.theme_combo.addItems(["Light", "Dark"])
+        layout.addWidget(self.theme_combo)
+        layout.addWidget(QLabel("Accent Color:"))
+        self.color_combo = QComboBox()
+        self.color_combo.addItems(["Blue", "Green", "Orange", "Purple", "Red"])
+        layout.addWidget(self.color_combo)
+        self.reopen_check = QCheckBox("Reopen the last folder on startup")
+        self.reopen_check.toggled.connect(self.set_reopen)
+        layout.addWidget(self.reopen_check)
+        layout.addStretch()
+        self.theme_combo.currentTextChanged.connect(self.apply_theme)
+        self.color_combo.currentTextChanged.connect(self.apply_theme)
+        return tab
+
+    def _rules_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        layout.addWidget(QLabel("Add a custom rule:"))
+        input_layout = QHBoxLayout()
+        self.field_combo = QComboBox()
+        self.field_combo.addItems(list(RULE_FIELDS.values()))
+        self.contains_edit = QLineEdit()
+        self.contains_edit.setPlaceholderText("Text or year...")
+        self.target_edit = QLineEdit()
+        self.target_edit.setPlaceholderText("Move to category...")
+        add_rule_btn = QPushButton("Add Rule")
+        add_rule_btn.clicked.connect(self.add_rule)
+        input_layout.addWidget(self.field_combo)
+        input_layout.addWidget(self.contains_edit)
+        input_layout.addWidget(self.target_edit)
+        input_layout.addWidget(add_rule_btn)
+        layout.addLayout(input_layout)
+        self.rules_list = QListWidget()
+        self.rules_list.itemDoubleClicked.connect(lambda _: self.remove_rule())
+        layout.addWidget(self.rules_list)
+        layout.addWidget(QLabel("(Double-click a rule to delete it.)"))
+        layout.addStretch()
+        return tab
+
+    def _advanced_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        rules_help = QLabel(
+            "One rule per line, first match wins. Conditions: ext: type: size: age: year: creator: "
+            "folder: name: regex: path:\nExample: ext:.pdf regex:\"invoice_(?P<client>[a-z]+)\" -> Invoices/{year}/{client}")
+        rules_help.setWordWrap(True)
+        layout.addWidget(rules_help)
+        self.rules_edit = QPlainTextEdit()
+        self.rules_edit.setPlaceholderText("type:Images size:>10MB -> Large Photos/{year}")
+        layout.addWidget(self.rules_edit)
+        apply_rules_btn = QPushButton("Apply Rules")
+        apply_rules_btn.clicked.connect(self.apply_advanced_rules)
+        layout.addWidget(apply_rules_btn)
+        return tab
+
+    def _categories_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        layout.addWidget(QLabel("Edit category extensions:"))
+        self.cat_list = QListWidget()
+        self.cat_list.currentItemChanged.connect(lambda *_: self.refresh_ext_list())
+        layout.addWidget(self.cat_list)
+        self.ext_list = QListWidget()
+        layout.addWidget(QLabel("Extensions for selected category:"))
+        layout.addWidget(self.ext_list)
+        ext_input_layout = QHBoxLayout()
+        self.ext_edit = QLineEdit()
+        self.ext_edit.setPlaceholderText("Add extension (e.g. .exe)")
+        add_ext_btn = QPushButton("Add Extension")
+        add_ext_btn.clicked.connect(self.add_extension)
+        ext_input_layout.addWidget(self.ext_edit)
+        ext_input_layout.addWidget(add_ext_btn)
+        layout.addLayout(ext_input_layout)
+        del_ext_btn = QPushButton("Remove Selected Extension")
+        del_ext_btn.clicked.connect(self.remove_extension)
+        layout.addWidget(del_ext_btn)
+        # Add/remove category
+        cat_input_layout = QHBoxLayout()
+        self.cat_name_edit = QLineEdit()
+        self.cat_name_edit.setPlaceholderText("New category name")
+        add_cat_btn = QPushButton("Add Category")
+        add_cat_btn.clicked.connect(self.add_category)
+        del_cat_btn = QPushButton("Remove Selected Category")
+        del_cat_btn.clicked.connect(self.remove_category)
+        cat_input_layout.addWidget(self.cat_name_edit)
+        cat_input_layout.addWidget(add_cat_btn)
+        cat_input_layout.addWidget(del_cat_btn)
+        layout.addLayout(cat_input_layout)
+        layout.addStretch()
+        return tab
+
+    def _diagnostics_tab(self):
+        tab = QWidget()
+        layout = QVBoxLayout(tab)
+        self.startup_label = QLabel("")
+        layout.addWidget(self.startup_label)
+        self.profile_check = QCheckBox("Record timings, counters and GUI stalls")
+        layout.addWidget(self.profile_check)
+        self.cprofile_check = QCheckBox("Also collect cProfile data (slows Sortlify down)")
+        layout.addWidget(self.cprofile_check)
+        stall_layout = QHBoxLayout()
+        stall_layout.addWidget(QLabel("Report GUI stalls longer than"))
+        self.stall_spin = QSpinBox()
+        self.stall_spin.setRange(10, 5000)
+        self.stall_spin.setSuffix(" ms")
+        stall_layout.addWidget(self.stall_spin)
+        stall_layout.addStretch()
+        layout.addLayout(stall_layout)
+        self.report_view = QPlainTextEdit()
+        self.report_view.setReadOnly(True)
+        self.report_view.setFont(QFont("Monospace"))
+        layout.addWidget(self.report_view)
+        diag_btns = QHBoxLayout()
+        refresh_btn = QPushButton("Refresh")
+        reset_btn = QPushButton("Reset")
+        trace_btn = QPushButton("Export Chrome Trace...")
+        cprofile_btn = QPushButton("Export cProfile...")
+        for btn in (refresh_btn, reset_btn, trace_btn, cprofile_btn):
+            diag_btns.addWidget(btn)
+        layout.addLayout(diag_btns)
+        self.profile_check.toggled.connect(self.toggle_profiling)
+        self.cprofile_check.toggled.connect(lambda: self.profile_check.isChecked() and self.toggle_profiling())
+        self.stall_spin.valueChanged.connect(lambda value: setattr(self.main_window.stall_detector, "threshold_ms", value))
+        refresh_btn.clicked.connect(self.refresh_report)
+        reset_btn.clicked.connect(self.reset_profile)
+        trace_btn.clicked.connect(self.export_trace)
+        cprofile_btn.clicked.connect(self.export_cprofile)
+        return tab
+
+    def sync(self):
+        """Reload every widget from the main window's settings and active profile."""
+        window = self.main_window
+        settings = window.settings
+        widgets = (self.profile_combo, self.theme_combo, self.color_combo, self.reopen_check,
+                   self.profile_check, self.cprofile_check, self.stall_spin)
+        for widget in widgets:
+            widget.blockSignals(True)
+        self.profile_combo.clear()
+        self.profile_combo.addItems(list(settings.profiles))
+        self.profile_combo.setCurrentText(settings.active_profile)
+        self.delete_profile_btn.setEnabled(len(settings.profiles) > 1)
+        self.theme_combo.setCurrentText(window.theme_mode.capitalize())
+        self.color_combo.setCurrentText(window.accent_color.capitalize())
+        self.reopen_check.setChecked(settings.reopen_last_folder)
+        self.profile_check.setChecked(PROFILER.enabled)
+        self.cprofile_check.setChecked(PROFILER.collect_cprofile)
+        self.stall_spin.setValue(window.stall_detector.threshold_ms)
+        for widget in widgets:
+            widget.blockSignals(False)
+        self.sync_profile()
+        if window.startup_ms is not None:
+            self.startup_label.setText(f"Startup: first paint {window.startup_ms:.0f} ms after launch "
+                                       f"(target {STARTUP_BUDGET_MS} ms)")
+        self.refresh_report()
+
+    def sync_profile(self):
+        """Reload the rule and category widgets, which show the active profile."""
+        window = self.main_window
+        self.rules_list.clear()
+        for rule in window.custom_rules:
+            self.rules_list.addItem(describe_rule(rule))
+        self.rules_edit.setPlainText(window.rules_text)
+        self.cat_list.clear()
+        self.cat_list.addItems(list(window.category_map))
+        # Select first category by default
+        if self.cat_list.count() > 0:
+            self.cat_list.setCurrentRow(0)
+
+    def switch_profile(self, name):
+        self.main_window.switch_profile(name)
+        self.sync_profile()
+
+    def new_profile(self):
+        settings = self.main_window.settings
+        name, ok = QInputDialog.getText(self, "New Profile", f"Name of the new profile (a copy of {settings.active_profile!r}):")
+        if not ok:
+            return
+        try:
+            settings.add_profile(name.strip(), copy_of=settings.active_profile)
+        except ValueError as e:
+            QMessageBox.warning(self, "New Profile", str(e))
+            return
+        self.main_window.switch_profile(settings.active_profile)
+        self.sync()
+
+    def delete_profile(self):
+        settings = self.main_window.settings
+        name = settings.active_profile
+        answer = QMessageBox.question(self, "Delete Profile", f"Delete the profile {name!r} and its rules?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            settings.remove_profile(name)
+        except ValueError as e:
+            QMessageBox.warning(self, "Delete Profile", str(e))
+            return
+        self.main_window.switch_profile(settings.active_profile)
+        self.sync()
+
+    def apply_theme(self):
+        window = self.main_window
+        window.theme_mode = self.theme_combo.currentText().lower()
+        window.accent_color = self.color_combo.currentText().lower()
+        window.setStyleSheet(window.get_stylesheet())
+        window.save_settings()
+
+    def set_reopen(self, checked):
+        self.main_window.settings.reopen_last_folder = checked
+        self.main_window.save_settings()
+
+    def add_rule(self):
+        window = self.main_window
+        contains = self.contains_edit.text().strip()
+        target = self.target_edit.text().strip()
+        field = list(RULE_FIELDS)[self.field_combo.currentIndex()]
+        if field == "year" and not contains.isdigit():
+            QMessageBox.warning(self, "Input Error", "Enter a year such as 2021.")
+        elif contains and target:
+            rule = (contains, target, field)
+            window.custom_rules.append(rule)
+            window.rebuild_classifier()
+            self.rules_list.addItem(describe_rule(rule))
+            self.contains_edit.clear()
+            self.target_edit.clear()
+        else:
+            QMessageBox.warning(self, "Input Error", "Both fields are required.")
+
+    def remove_rule(self):
+        row = self.rules_list.currentRow()
+        if row >= 0:
+            self.rules_list.takeItem(row)
+            del self.main_window.custom_rules[row]
+            self.main_window.rebuild_classifier()
+
+    def apply_advanced_rules(self):
+        window = self.main_window
+        text = self.rules_edit.toPlainText()
+        try:
+            program = RuleProgram(parse_rules(text))
+        except ValueError as e:
+            QMessageBox.warning(self, "Rule Error", str(e))
+            return
+        window.rules_text = text
+        window.rule_program = program
+        window.rebuild_classifier()
+
+    def selected_category(self):
+        item = self.cat_list.currentItem()
+        return item.text() if item is not None else None
+
+    def refresh_ext_list(self):
+        self.ext_list.clear()
+        cat = self.selected_category()
+        if cat and cat in self.main_window.category_map:
+            self.ext_list.addItems(self.main_window.category_map[cat])
+
+    def add_extension(self):
+        category_map = self.main_window.category_map
+        cat = self.selected_category()
+        ext = self.ext_edit.text().strip()
+        if cat and ext and ext.startswith('.') and ext not in category_map[cat]:
+            category_map[cat].append(ext)
+            self.main_window.rebuild_classifier()
+            self.refresh_ext_list()
+            self.ext_edit.clear()
+
+    def remove_extension(self):
+        category_map = self.main_window.category_map
+        cat = self.selected_category()
+        ext_item = self.ext_list.currentItem()
+        if cat and ext_item:
+            ext = ext_item.text()
+            if ext in category_map[cat]:
+                category_map[cat].remove(ext)
+                self.main_window.rebuild_classifier()
+                self.refresh_ext_list()
+
+    def add_category(self):
+        name = self.cat_name_edit.text().strip()
+        if name and name not in self.main_window.category_map:
+            self.main_window.category_map[name] = []
+            self.main_window.rebuild_classifier()
+            self.cat_list.addItem(name)
+            self.cat_name_edit.clear()
+
+    def remove_category(self):
+        window = self.main_window
+        cat = self.selected_category()
+        if cat and cat not in window.builtin_categories:
+            self.cat_list.takeItem(self.cat_list.currentRow())
+            del window.category_map[cat]
+            window.rebuild_classifier()
+            self.ext_list.clear()
+
+    def refresh_report(self):
+        self.report_view.setPlainText(PROFILER.report() if PROFILER.enabled or PROFILER.events
+                                      else "Recording is off. Turn it on, reproduce the slowdown, then refresh.")
+
+    def toggle_profiling(self):
+        self.main_window.set_profiling(self.profile_check.isChecked(), self.cprofile_check.isChecked(), self.stall_spin.value())
+        self.refresh_report()
+
+    def reset_profile(self):
+        PROFILER.reset()
+        self.refresh_report()
+
+    def export_trace(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export Chrome Trace", "sortlify-trace.json", "Trace (*.json)")
+        if path:
+            try:
+                PROFILER.export_chrome_trace(path)
+            except OSError as e:
+                QMessageBox.warning(self, "Export Failed", str(e))
+
+    def export_cprofile(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Export cProfile", "sortlify.prof", "Profile (*.prof)")
+        if path:
+            try:
+                if not PROFILER.export_cprofile(path):
+                    QMessageBox.information(self, "Export cProfile",
+                                            "No cProfile data yet; record with cProfile data collection on.")
+            except OSError as e:
+                QMessageBox.warning(self, "Export Failed", str(e))
+
+@lru_cache(maxsize=None)
+def build_stylesheet(theme, accent):
+    """The window's style sheet for a theme and accent name; built once per pair."""
+    accent = {
+        "blue": "#2563eb",
+        "green": "#22c55e",
+        "orange": "#f59e42",
+        "purple": "#a259ec",
+        "red": "#ef4444"
+    }.get(accent, "#2563eb")
+    if theme == "light":
+        bg = "#f5f6fa"
+        fg = "#181e25"
+        sidebar_bg = "#e9eaf0"
+        border = "#d1d5db"
+        summary_bg = "#fff"
+        help_bg = "#e0e7ef"
+    else:
+        bg = "#181e25"
+        fg = "#f5f6fa"
+        sidebar_bg = "#14181f"
+        border = "#232a34"
+        summary_bg = "#181e25"
+        help_bg = "#232a34"
+    return f"""
+    #MainWindow, #CentralWidget {{
+        background: {bg};
+    }}
+    QWidget {{
+        background: transparent;
+        color: {fg};
+        font-family: 'Be Vietnam Pro', Arial, sans-serif;
+        font-size: 15px;
+    }}
+    #Sidebar {{
+        background: {sidebar_bg};
+        border-right: 1px solid {border};
+    }}
+    #Logo {{
+        font-size: 20px;
+        font-weight: bold;
+        color: {fg};
+    }}
+    #TopBar {{
+        background: transparent;
+    }}
+    #TopBarTitle {{
+        font-size: 18px;
+        font-weight: 600;
+    }}
+    #SettingsButton {{
+        font-size: 20px;
+        border: none;
+        background: transparent;
+    }}
+    #SettingsButton:hover {{
+        background: #2a313c;
+        border-radius: 4px;
+    }}
+    #ViewToggleButton {{
+        border: none;
+        background: transparent;
+    }}
+    #ViewToggleButton:hover {{
+        background: #2a313c;
+        border-radius: 4px;
+    }}
+    #Heading {{
+        font-size: 32px;
+        font-weight: bold;
+        margin-bottom: 8px;
+    }}
+    #Subheading {{
+        font-size: 20px;
+        font-weight: 600;
+        margin-top: 16px;
+        margin-bottom: 4px;
+    }}
+    #CategoryCheckBox {{
+        spacing: 12px;
+        font-size: 16px;
+        margin-left: 8px;
+    }}
+    #StartButton {{
+        background: {accent};
+        color: #fff;
+        border-radius: 8px;
+        padding: 10px 24px;
+        font-size: 16px;
+        font-weight: 600;
+        margin-top: 16px;
+        margin-bottom: 16px;
+    }}
+    #StartButton:hover {{
+        background: #1e40af;
+    }}
+    #SummaryBox {{
+        border: 2px dashed {border};
+        border-radius: 12px;
+        background: {summary_bg};
+        margin-top: 8px;
+        margin-bottom: 8px;
+    }}
+    """
+
+class SortlifyMainWindow(QMainWindow):
+    def __init__(self):
+        super().__init__()
+        self.setObjectName("MainWindow")
+        self.settings = Settings.load()
+        self.theme_mode = self.settings.theme
+        self.accent_color = self.settings.accent
+        self.builtin_categories = list(BUILTIN_CATEGORIES)
+        self.use_profile(self.settings.profile)
+        self.classifier = Classifier(self.category_map, self.custom_rules, self.rule_program)
+        self.startup_ms = None
+        self.save_on_close = True  # off when only measuring startup, so the user's settings stay as they were
+        self.settings_dialog = None
+        self.setWindowTitle("Sortlify")
+        self.setMinimumSize(900, 700)
+        self.setStyleSheet(self.get_stylesheet())
+        self.init_ui()
+
+    def init_ui(self):
+        # Central widget and main layout
+        central = QWidget()
+        central.setObjectName("CentralWidget")
+        main_layout = QHBoxLayout(central)
+        main_layout.setContentsMargins(0, 0, 0, 0)
+        main_layout.setSpacing(0)
+
+        # Sidebar with filters
+        sidebar = QWidget()
+        sidebar.setObjectName("Sidebar")
+        sidebar_layout = QVBoxLayout(sidebar)
+        sidebar_layout.setContentsMargins(24, 24, 24, 24)
+        sidebar_layout.setSpacing(16)
+        logo = QLabel("\u25A0  Sortlify")
+        logo.setObjectName("Logo")
+        sidebar_layout.addWidget(logo)
+        sidebar_layout.addSpacing(16)
+        sidebar_layout.addWidget(QLabel("<b>Filters</b>"))
+        # File type filter
+        sidebar_layout.addWidget(QLabel("Type:"))
+        self.type_filter = QComboBox()
+        self.refresh_type_filter()
+        self.type_filter.currentTextChanged.connect(self.apply_filters)
+        sidebar_layout.addWidget(self.type_filter)
+        # Size filter
+        sidebar_layout.addWidget(QLabel("Size (MB):"))
+        self.size_filter = QComboBox()
+        self.size_filter.addItems(SIZE_FILTERS)
+        self.size_filter.currentTextChanged.connect(self.apply_filters)
+        sidebar_layout.addWidget(self.size_filter)
+        # Date modified filter
+        sidebar_layout.addWidget(QLabel("Modified:"))
+        self.date_filter = QComboBox()
+        self.date_filter.addItems(DATE_FILTERS)
+        self.date_filter.currentTextChanged.connect(self.apply_filters)
+        sidebar_layout.addWidget(self.date_filter)
+        # Embedded metadata filters, filled in once metadata has been read
+        sidebar_layout.addWidget(QLabel("Year Taken:"))
+        self.year_filter = QComboBox()
+        self.year_filter.addItem("All")
+        self.year_filter.currentTextChanged.connect(self.apply_filters)
+        sidebar_layout.addWidget(self.year_filter)
+        sidebar_layout.addWidget(QLabel("Camera / Artist:"))
+        self.creator_filter = QComboBox()
+        self.creator_filter.addItem("All")
+        self.creator_filter.currentTextChanged.connect(self.apply_filters)
+        sidebar_layout.addWidget(self.creator_filter)
+        # Duplicate filter; content hashing only starts once it's switched on
+        self.dup_filter = QCheckBox("Duplicates only")
+        self.dup_filter.toggled.connect(self.on_duplicates_toggled)
+        sidebar_layout.addWidget(self.dup_filter)
+        self.similar_filter = QCheckBox("Similar images")
+        self.similar_filter.setToolTip("Group resized and re-encoded copies of the same picture in the grid view")
+        self.similar_filter.toggled.connect(self.on_similar_toggled)
+        sidebar_layout.addWidget(self.similar_filter)
+        sidebar_layout.addStretch()
+        sidebar.setFixedWidth(180)
+
+        # Main content area
+        content = QWidget()
+        content_layout = QVBoxLayout(content)
+        content_layout.setContentsMargins(0, 0, 0, 0)
+        content_layout.setSpacing(0)
+
+        # Top bar
+        topbar = QWidget()
+        topbar.setObjectName("TopBar")
+        topbar_layout = QHBoxLayout(topbar)
+        topbar_layout.setContentsMargins(32, 16, 32, 16)
+        topbar_layout.setSpacing(16)
+        title = QLabel("Dashboard")
+        title.setObjectName("TopBarTitle")
+        topbar_layout.addWidget(title)
+        topbar_layout.addStretch()
+        settings_btn = QPushButton("⚙️")
+        settings_btn.setObjectName("SettingsButton")
+        settings_btn.setFixedSize(32, 32)
+        settings_btn.clicked.connect(self.open_settings_dialog)
+        topbar_layout.addWidget(settings_btn)
+
+        # View toggle
+        self.view_toggle = QPushButton()
+        self.view_toggle.setObjectName("ViewToggleButton")
+        self.view_toggle.setCheckable(True)
+        self.view_toggle.setChecked(False)
+        self.view_toggle.setFixedSize(32, 32)
+        style = self.style()
+        if style:
+            self.list_icon = style.standardIcon(QStyle.StandardPixmap.SP_FileDialogListView)
+            self.grid_icon = style.standardIcon(QStyle.StandardPixmap.SP_FileDialogContentsView)
+            self.view_toggle.setIcon(self.grid_icon)
+        self.view_toggle.setIconSize(QSize(20, 20))
+        self.view_toggle.setToolTip("Switch to Grid View")
+        self.view_toggle.clicked.connect(self.toggle_view)
+        topbar_layout.addWidget(self.view_toggle)
+
+        # Main dashboard area
+        dashboard = QWidget()
+        dashboard_layout = QVBoxLayout(dashboard)
+        dashboard_layout.setContentsMargins(24, 16, 24, 16)
+        dashboard_layout.setSpacing(12)
+        # Browse button
+        action_bar = QHBoxLayout()
+        browse_btn = QPushButton("Browse")
+        browse_btn.setObjectName("StartButton")
+        browse_btn.clicked.connect(self.browse_folder)
+        action_bar.addWidget(browse_btn)
+        self.organize_btn = QPushButton("Organize")
+        self.organize_btn.setObjectName("StartButton")
+        self.organize_btn.clicked.connect(self.organize_files)
+        action_bar.addWidget(self.organize_btn)
+        self.suggest_btn = QPushButton("Suggest")
+        self.suggest_btn.setToolTip("Suggest categories for the listed files, learned from past organize runs")
+        self.suggest_btn.clicked.connect(self.suggest_categories)
+        action_bar.addWidget(self.suggest_btn)
+        self.rename_btn = QPushButton("Rename")
+        self.rename_btn.setToolTip("Rename the listed files from a template such as {date}_{counter:04}_{name}{ext}")
+        self.rename_btn.clicked.connect(self.open_rename)
+        action_bar.addWidget(self.rename_btn)
+        sizes_btn = QPushButton("Sizes")
+        sizes_btn.setToolTip("Chart where the space goes, by category and by folder")
+        sizes_btn.clicked.connect(self.open_size_chart)
+        action_bar.addWidget(sizes_btn)
+        dashboard_layout.addLayout(action_bar)
+        # Scan progress and cancel
+        scan_bar = QHBoxLayout()
+        self.scan_label = QLabel("")
+        scan_bar.addWidget(self.scan_label)
+        scan_bar.addStretch()
+        self.cancel_scan_btn = QPushButton("Cancel")
+        self.cancel_scan_btn.clicked.connect(self.cancel_current_task)
+        self.cancel_scan_btn.setVisible(False)
+        scan_bar.addWidget(self.cancel_scan_btn)
+        dashboard_layout.addLayout(scan_bar)
+        # Search over file names and indexed document text; composes with the sidebar filters
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search file names and document text...")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.apply_filters)
+        self.search_box.textChanged.connect(self.search_timer.start)
+        dashboard_layout.addWidget(self.search_box)
+        # File explorer view
+        self.suggestions = {}  # index row -> (category, confidence)
+        self.file_model = FileTableModel(self, suggestions=self.suggestions)
+        self.file_table = FileTableView()
+        self.file_table.setModel(self.file_model)
+        self.file_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.file_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.file_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        header = self.file_table.horizontalHeader()
+        if header is not None:
+            header.setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+            header.sectionClicked.connect(self.sort_by_column)
+        # Fixed row heights let the view skip measuring rows it never paints
+        row_header = self.file_table.verticalHeader()
+        if row_header is not None:
+            row_header.setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+            row_header.setVisible(False)
+        dashboard_layout.addWidget(self.file_table)
+        # Grid view shares the file rows; icons are decoded lazily as items scroll into view
+        self.thumbnails = ThumbnailService(96, parent=self)
+        file_icon = style.standardIcon(QStyle.StandardPixmap.SP_FileIcon) if style else None
+        self.grid_model = FileTableModel(self, thumbnails=self.thumbnails, file_icon=file_icon)
+        self.grid_view = FileGridView()
+        self.grid_view.setModel(self.grid_model)
+        self.grid_view.setViewMode(QListView.ViewMode.IconMode)
+        self.grid_view.setIconSize(QSize(96, 96))
+        self.grid_view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.grid_view.setSpacing(16)
+        self.grid_view.setUniformItemSizes(True)
+        self.grid_view.setLayoutMode(QListView.LayoutMode.Batched)
+        self.grid_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.grid_view.setVisible(False)
+        dashboard_layout.addWidget(self.grid_view)
+        # Results Summary
+        summary_heading = QLabel("Results Summary")
+        summary_heading.setObjectName("Subheading")
+        dashboard_layout.addWidget(summary_heading)
+        summary_desc = QLabel("After organizing, Sortlify will display the number of files moved and any errors encountered.")
+        summary_desc.setWordWrap(True)
+        dashboard_layout.addWidget(summary_desc)
+        summary_box = QFrame()
+        summary_box.setObjectName("SummaryBox")
+        summary_box.setMinimumHeight(120)
+        summary_box_layout = QVBoxLayout(summary_box)
+        summary_box_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.summary_label = QLabel("<b>No files organized yet</b>\nStart organizing your files to see the results summary here.")
+        self.summary_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        summary_box_layout.addWidget(self.summary_label)
+        dashboard_layout.addWidget(summary_box)
+        note = QLabel("<span style='color:#888'>Note: Sortlify moves files to their respective categories, ensuring a safe and organized file system.</span>")
+        note.setWordWrap(True)
+        dashboard_layout.addWidget(note)
+        dashboard_layout.addStretch()
+        # Assemble layouts
+        content_layout.addWidget(topbar)
+        content_layout.addWidget(dashboard)
+        main_layout.addWidget(sidebar)
+        main_layout.addWidget(content)
+        self.setCentralWidget(central)
+        # Load files for explorer
+        self.current_folder = None
+        # The index and its caches need NumPy, so start_engine builds them after the first paint
+        self.file_index = None
+        self.filter_cache = None
+        self.sort_cache = None
+        self.sort_spec = []  # (column key, reverse) pairs, most significant first
+        self.size_tree = None
+        self.size_chart = None
+        self.rename_dialog = None
+        self.scan_worker = None
+        self.organize_worker = None
+        self.duplicate_worker = None
+        self.duplicate_groups = None  # group id per index row, -1 for unique files
+        self.similar_worker = None
+        self.similar_groups = None  # near-duplicate image group per index row, -1 for none
+        self.suggest_worker = None
+        self.index_worker = None
+        self.metadata_worker = None
+        self.search_index = None
+        self._search_key = None
+        self._search_rank = None
+        self._search_generation = 0
+        self.stall_detector = StallDetector(parent=self)
+
+    def get_stylesheet(self):
+        return build_stylesheet(self.theme_mode, self.accent_color)
+
+    def use_profile(self, profile):
+        """Make profile's categories and rules the window's own; the lists are shared, so edits land in it."""
+        self.custom_rules = profile.custom_rules  # Each rule: (text, target_category, field), field one of RULE_FIELDS
+        self.category_map = profile.category_map  # User-editable category-extension mapping
+        self.rules_text = profile.rules_text  # Advanced rules, one per line (see sortlify_core.rules)
+        try:
+            self.rule_program = RuleProgram(parse_rules(self.rules_text))
+        except ValueError as e:
+            self.settings.problems.append(f"advanced rules not applied: {e}")
+            self.rule_program = RuleProgram()
+
+    def switch_profile(self, name):
+        self.settings.active_profile = name
+        self.use_profile(self.settings.profile)
+        self.rebuild_classifier()
+
+    def save_settings(self):
+        profile = self.settings.profile
+        profile.category_map, profile.custom_rules, profile.rules_text = self.category_map, self.custom_rules, self.rules_text
+        self.settings.theme, self.settings.accent = self.theme_mode, self.accent_color
+        try:
+            self.settings.save()
+        except OSError as e:
+            self.scan_label.setText(f"Could not save settings: {e}")
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.startup_ms is None:
+            self.startup_ms = (time.perf_counter() - LAUNCHED) * 1000
+            # Anything not needed for the first frame starts once it is on screen
+            QTimer.singleShot(0, self.after_first_paint)
+
+    def start_engine(self):
+        """Load NumPy and the modules built on it and create the empty index; later calls do nothing."""
+        if self.file_index is not None:
+            return
+        with PROFILER.span("load_engine"):
+            load_engine()
+        self.file_index = FileIndex()
+        self.filter_cache = FilterCache(self.file_index)
+        self.sort_cache = SortCache(self.file_index)
+
+    def after_first_paint(self):
+        self.start_engine()
+        if self.settings.problems:
+            self.summary_label.setText("<b>Some settings were reset</b><br>" + html.escape("; ".join(self.settings.problems[:3])))
+        folder = self.settings.last_folder
+        if self.settings.reopen_last_folder and folder and not self.current_folder and os.path.isdir(folder):
+            self.load_files(folder)
+
+    def browse_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Select Folder to Organize")
+        if folder:
+            self.current_folder = folder
+            self.load_files(folder)
+
+    def load_files(self, folder):
+        # Scanning happens on a worker thread; results stream in through on_scan_batch
+        self.start_engine()
+        self.current_folder = folder
+        if self.settings.last_folder != folder:
+            self.settings.last_folder = folder
+            self.save_settings()
+        self.cancel_scan()
+        self.cancel_duplicates()
+        self.cancel_similar()
+        self.cancel_suggestions()
+        self.cancel_indexing()
+        self.cancel_metadata()
+        self.file_index = FileIndex()
+        self.filter_cache = FilterCache(self.file_index)
+        self.sort_cache = SortCache(self.file_index)
+        self.size_tree = SizeTree(folder)
+        self.duplicate_groups = None
+        self.similar_groups = None
+        self.suggestions.clear()
+        self.apply_filters()
+        self.scan_worker = ScanWorker(folder, self.classifier, parent=self)
+        self.scan_worker.batch_ready.connect(self.on_scan_batch)
+        self.scan_worker.progress.connect(self.on_scan_progress)
+        self.scan_worker.scan_finished.connect(self.on_scan_finished)
+        self.scan_label.setText("Scanning...")
+        self.cancel_scan_btn.setVisible(True)
+        self.scan_worker.start()
+
+    def cancel_scan(self):
+        if self.scan_worker is not None:
+            worker = self.scan_worker
+            self.scan_worker = None
+            worker.cancel()
+            worker.wait()
+            worker.deleteLater()
+            self.scan_label.setText(f"Scan cancelled ({len(self.file_index)} files)")
+            self.cancel_scan_btn.setVisible(False)
+
+    def on_scan_batch(self, fragment):
+        if self.sender() is not self.scan_worker:
+            return
+        if self.scan_worker.classifier is not self.classifier:
+            # Categories or rules were edited mid-scan
+            fragment.reclassify(self.classifier)
+        self.size_tree.add_index(fragment)
+        start = len(self.file_index)
+        self.file_index.extend(fragment)
+        with PROFILER.span("filter", rows=len(fragment)):
+            rows = self.filtered_rows(np.arange(start, len(self.file_index)))
+        self.show_files(rows, append=True)
+
+    def on_scan_progress(self, count):
+        if self.sender() is self.scan_worker:
+            self.scan_label.setText(f"Scanning... {count} files")
+
+    def on_scan_finished(self, total, cancelled):
+        if self.sender() is not self.scan_worker:
+            return
+        self.scan_worker.deleteLater()
+        self.scan_worker = None
+        self.cancel_scan_btn.setVisible(False)
+        self.scan_label.setText(f"{total} files found")
+        if self.size_chart is not None:
+            self.size_chart.refresh()
+        if not cancelled:
+            self.index_documents()
+            self.read_metadata()
+        if self.dup_filter.isChecked():
+            self.find_duplicates()
+        if self.similar_filter.isChecked():
+            self.find_similar()
+        if self.sort_spec and not (self.dup_filter.isChecked() or self.similar_filter.isChecked()):
+            # Rows streamed in during the scan were appended unsorted
+            self.apply_filters()
+
+    def index_documents(self):
+        self.cancel_indexing()
+        index = self.file_index
+        codes = [code for code, ext in enumerate(index.extensions.values) if ext in CONTENT_EXTS]
+        rows = np.flatnonzero(np.isin(index.ext, codes) & index.alive)
+        files = [(index.path(row), int(index.size[row]), int(index.mtime[row])) for row in rows.tolist()]
+        self.index_worker = IndexWorker(os.path.abspath(self.current_folder), files, parent=self)
+        self.index_worker.progress.connect(self.on_index_progress)
+        self.index_worker.index_finished.connect(self.on_index_finished)
+        self.index_worker.start()
+
+    def cancel_indexing(self):
+        if self.index_worker is not None:
+            worker = self.index_worker
+            self.index_worker = None
+            worker.cancel()
+            worker.wait()
+            worker.deleteLater()
+            self.search_box.setPlaceholderText("Search file names and document text...")
+
+    def on_index_progress(self, done, total):
+        if self.sender() is self.index_worker:
+            self.search_box.setPlaceholderText(f"Search file names and document text... (indexing {done}/{total})")
+
+    def on_index_finished(self, indexed, cancelled):
+        if self.sender() is not self.index_worker:
+            return
+        self.index_worker.deleteLater()
+        self.index_worker = None
+        self.search_box.setPlaceholderText("Search file names and document text...")
+        if indexed:
+            self._search_generation += 1
+            if self.search_box.text().strip():
+                self.apply_filters()
+
+    def read_metadata(self):
+        self.cancel_metadata()
+        index = self.file_index
+        codes = [code for code, ext in enumerate(index.extensions.values) if ext in EXTRACTORS]
+        rows = np.flatnonzero(np.isin(index.ext, codes) & index.alive)
+        if not len(rows):
+            self.refresh_metadata_filters()
+            return
+        files = [(index.path(row), int(index.size[row]), int(index.mtime[row])) for row in rows.tolist()]
+        self.metadata_worker = MetadataWorker(rows, files, parent=self)
+        self.metadata_worker.batch_ready.connect(self.on_metadata_batch)
+        self.metadata_worker.progress.connect(self.on_metadata_progress)
+        self.metadata_worker.metadata_finished.connect(self.on_metadata_finished)
+        self.metadata_worker.start()
+
+    def cancel_metadata(self):
+        if self.metadata_worker is not None:
+            worker = self.metadata_worker
+            self.metadata_worker = None
+            worker.cancel()
+            worker.wait()
+            worker.deleteLater()
+
+    def on_metadata_batch(self, rows, metas):
+        if self.sender() is self.metadata_worker:
+            self.file_index.set_metadata(rows, metas)
+
+    def on_metadata_progress(self, done, total):
+        if self.sender() is self.metadata_worker and done < total:
+            self.scan_label.setText(f"Reading metadata... {done}/{total}")
+
+    def on_metadata_finished(self, cancelled):
+        if self.sender() is not self.metadata_worker:
+            return
+        self.metadata_worker.deleteLater()
+        self.metadata_worker = None
+        if not cancelled:
+            self.scan_label.setText(f"{self.file_index.live_count()} files found")
+        self.refresh_metadata_filters()
+        if self.classifier.meta_rules or self.rule_program.uses_metadata:
+            self.file_index.reclassify(self.classifier)
+            self.refresh_size_categories()
+        self.apply_filters()
+
+    def refresh_metadata_filters(self):
+        index = self.file_index
+        years = sorted({int(y) for y in np.unique(index.year[index.alive]) if y}, reverse=True)
+        used = np.unique(index.creator[index.alive & (index.creator >= 0)])
+        creators = sorted((index.creators.values[code] for code in used.tolist()), key=str.casefold)
+        for combo, values in ((self.year_filter, [str(y) for y in years]), (self.creator_filter, creators)):
+            current = combo.currentText()
+            combo.blockSignals(True)
+            combo.clear()
+            combo.addItem("All")
+            combo.addItems(values)
+            combo.setCurrentText(current if current in values else "All")
+            combo.blockSignals(False)
+
+    def search_rank(self):
+        """Per-row rank for the current search (-1 where a row doesn't match), or None without one.
+
+        Documents matched by the full-text index come first in BM25 order, followed by other
+        files whose name contains the search text.
+        """
+        text = self.search_box.text().strip()
+        if not text or not self.current_folder:
+            return None
+        key = (text, len(self.file_index), self._search_generation)
+        if key != self._search_key:
+            index = self.file_index
+            if self.search_index is None:
+                self.search_index = SearchIndex()
+            ranked = []
+            for path in self.search_index.search(os.path.abspath(self.current_folder), text, limit=10000):
+                row = index.find(*os.path.split(path))
+                if row >= 0:
+                    ranked.append(row)
+            ranked = np.array(ranked, np.int64)
+            named = index.match_names(text)
+            rank = np.full(len(index), -1, np.int64)
+            rank[named] = len(ranked) + np.arange(len(named))
+            rank[ranked] = np.arange(len(ranked))
+            self._search_key, self._search_rank = key, rank
+        return self._search_rank
+
+    def on_duplicates_toggled(self, checked):
+        if checked and self.duplicate_groups is None and self.scan_worker is None:
+            self.find_duplicates()
+        self.apply_filters()
+
+    def find_duplicates(self):
+        self.cancel_duplicates()
+        index = self.file_index
+        # Only files sharing their size with another file can be duplicates
+        rows = index.select(min_size=1)
+        _, inverse, counts = np.unique(index.size[rows], return_inverse=True, return_counts=True)
+        rows = rows[counts[inverse] > 1]
+        self._duplicate_rows = {index.path(int(row)): int(row) for row in rows}
+        files = [(path, int(index.size[row])) for path, row in self._duplicate_rows.items()]
+        self.duplicate_worker = DuplicateWorker(files, parent=self)
+        self.duplicate_worker.progress.connect(self.on_duplicates_progress)
+        self.duplicate_worker.duplicates_found.connect(self.on_duplicates_found)
+        self.scan_label.setText("Finding duplicates...")
+        self.cancel_scan_btn.setVisible(True)
+        self.duplicate_worker.start()
+
+    def cancel_duplicates(self):
+        if self.duplicate_worker is not None:
+            worker = self.duplicate_worker
+            self.duplicate_worker = None
+            worker.cancel()
+            worker.wait()
+            worker.deleteLater()
+            self.cancel_scan_btn.setVisible(False)
+
+    def on_duplicates_progress(self, stage, done, total):
+        if self.sender() is self.duplicate_worker:
+            what = "comparing file edges" if stage == "edges" else "hashing full contents"
+            self.scan_label.setText(f"Finding duplicates: {what} {done}/{total}")
+
+    def on_duplicates_found(self, groups, cancelled):
+        if self.sender() is not self.duplicate_worker:
+            return
+        self.duplicate_worker.deleteLater()
+        self.duplicate_worker = None
+        self.cancel_scan_btn.setVisible(False)
+        if cancelled:
+            self.scan_label.setText("Duplicate search cancelled")
+            return
+        ids = np.full(len(self.file_index), -1, np.int64)
+        wasted = 0
+        for group_id, (size, paths) in enumerate(groups):
+            for path in paths:
+                ids[self._duplicate_rows[path]] = group_id
+            wasted += size * (len(paths) - 1)
+        self.duplicate_groups = ids
+        self.scan_label.setText(f"{len(groups)} sets of duplicates, {wasted / MB:.1f} MB in extra copies")
+        self.apply_filters()
+
+    def on_similar_toggled(self, checked):
+        if checked and self.similar_groups is None and self.scan_worker is None:
+            self.find_similar()
+        if checked and not self.view_toggle.isChecked():
+            # Groups of look-alikes are compared by eye, so show them as thumbnails
+            self.view_toggle.setChecked(True)
+            self.toggle_view()
+        else:
+            self.apply_filters()
+
+    def find_similar(self):
+        self.cancel_similar()
+        index = self.file_index
+        code = index.categories.find("Images")
+        exts = [c for c, ext in enumerate(index.extensions.values)
+                if ext in HASH_EXTS and ext in self.category_map.get("Images", [])]
+        rows = np.flatnonzero(index.alive & (index.category == code) & np.isin(index.ext, exts))
+        files = [(index.path(row), int(index.size[row]), int(index.mtime[row])) for row in rows.tolist()]
+        self.similar_worker = SimilarWorker(rows, files, parent=self)
+        self.similar_worker.progress.connect(self.on_similar_progress)
+        self.similar_worker.similar_found.connect(self.on_similar_found)
+        self.scan_label.setText("Finding similar images...")
+        self.cancel_scan_btn.setVisible(True)
+        self.similar_worker.start()
+
+    def cancel_similar(self):
+        if self.similar_worker is not None:
+            worker = self.similar_worker
+            self.similar_worker = None
+            worker.cancel()
+            worker.wait()
+            worker.deleteLater()
+            self.cancel_scan_btn.setVisible(False)
+
+    def on_similar_progress(self, done, total):
+        if self.sender() is self.similar_worker:
+            self.scan_label.setText(f"Finding similar images: hashing {done}/{total}")
+
+    def on_similar_found(self, rows, groups, cancelled):
+        if self.sender() is not self.similar_worker:
+            return
+        self.similar_worker.deleteLater()
+        self.similar_worker = None
+        self.cancel_scan_btn.setVisible(False)
+        if cancelled:
+            self.scan_label.setText("Similar image search cancelled")
+            return
+        ids = np.full(len(self.file_index), -1, np.int64)
+        ids[rows] = groups
+        self.similar_groups = ids
+        count = int(groups.max()) + 1 if len(groups) else 0
+        self.scan_label.setText(f"{count} groups of similar images among {len(rows)} images")
+        self.apply_filters()
+
+    def suggest_categories(self):
+        self.cancel_suggestions()
+        rows = self.filtered_rows()
+        rows = rows[[int(row) not in self.suggestions for row in rows]]
+        if not len(rows):
+            return
+        index = self.file_index
+        files = [(index.path(row), int(index.size[row]), int(index.mtime[row])) for row in rows.tolist()]
+        self.suggest_worker = SuggestWorker(rows, files, parent=self)
+        self.suggest_worker.suggestions_ready.connect(self.on_suggestions_ready)
+        self.suggest_worker.suggest_finished.connect(self.on_suggest_finished)
+        self.suggest_btn.setEnabled(False)
+        self.cancel_scan_btn.setVisible(True)
+        self.scan_label.setText("Suggesting categories...")
+        self.suggest_worker.start()
+
+    def cancel_suggestions(self):
+        if self.suggest_worker is not None:
+            worker = self.suggest_worker
+            self.suggest_worker = None
+            worker.cancel()
+            worker.wait()
+            worker.deleteLater()
+            self.suggest_btn.setEnabled(True)
+            self.cancel_scan_btn.setVisible(False)
+
+    def on_suggestions_ready(self, rows, suggestions):
+        if self.sender() is not self.suggest_worker:
+            return
+        self.suggestions.update(zip(rows.tolist(), suggestions))
+        self.file_model.refresh_column(4)
+        self.scan_label.setText(f"Suggesting categories... {len(self.suggestions)} files")
+
+    def on_suggest_finished(self, trained, cancelled):
+        if self.sender() is not self.suggest_worker:
+            return
+        self.suggest_worker.deleteLater()
+        self.suggest_worker = None
+        self.suggest_btn.setEnabled(True)
+        self.cancel_scan_btn.setVisible(False)
+        if not trained:
+            self.scan_label.setText("Organize some files first; suggestions learn from where you put them")
+        elif cancelled:
+            self.scan_label.setText("Suggestions cancelled")
+        else:
+            self.scan_label.setText(f"Suggested categories for {len(self.suggestions)} files")
+
+    def cancel_current_task(self):
+        if self.organize_worker is not None:
+            self.organize_worker.cancel()
+        elif self.suggest_worker is not None:
+            self.cancel_suggestions()
+            self.scan_label.setText("Suggestions cancelled")
+        elif self.duplicate_worker is not None:
+            self.cancel_duplicates()
+            self.scan_label.setText("Duplicate search cancelled")
+        elif self.similar_worker is not None:
+            self.cancel_similar()
+            self.scan_label.setText("Similar image search cancelled")
+        else:
+            self.cancel_scan()
+
+    def organize_files(self):
+        if not self.current_folder or self.organize_worker is not None:
+            return
+        root = os.path.abspath(self.current_folder)
+        if self.offer_unfinished(Organizer, root, "Unfinished Organize",
+                                 "A previous organize run in this folder did not finish.\n"
+                                 "Resume it, move its files back, or leave it and start a new one?"):
+            return
+        moves = plan_moves(self.file_index.iter_files(self.filtered_rows()), root)
+        if not moves:
+            self.summary_label.setText("<b>Nothing to organize</b><br>Every shown file is already in its category folder.")
+            return
+        answer = QMessageBox.question(
+            self, "Organize Files",
+            f"Move {len(moves)} files into category folders under {root}?")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            organizer = Organizer.create(root, moves)
+        except OSError as e:
+            QMessageBox.warning(self, "Organize Error", f"Could not write the organize journal: {e}")
+            return
+        self.start_organize(organizer)
+
+    def open_rename(self):
+        if not self.current_folder or self.organize_worker is not None:
+            return
+        root = os.path.abspath(self.current_folder)
+        if self.offer_unfinished(Renamer, root, "Unfinished Rename",
+                                 "A previous rename in this folder did not finish.\n"
+                                 "Resume it, give its files their old names back, or leave it and start a new one?"):
+            return
+        if self.rename_dialog is None:
+            self.rename_dialog = RenameDialog(self)
+        # Number the files in the order the list shows them
+        model = self.grid_model if self.view_toggle.isChecked() else self.file_model
+        self.rename_dialog.set_rows(self.file_index, model.rows())
+        self.rename_dialog.show()
+        self.rename_dialog.raise_()
+        self.rename_dialog.activateWindow()
+
+    def offer_unfinished(self, runner, root, title, text):
+        """Ask what to do about an unfinished journal of runner (Organizer or Renamer) under root.
+
+        Returns True if the caller should stop: a resume or rollback was started, or the
+        user cancelled. "Start New" sets the old journals aside and returns False.
+        """
+        unfinished = runner.unfinished(root)
+        if not unfinished:
+            return False
+        box = QMessageBox(self)
+        box.setWindowTitle(title)
+        box.setText(text)
+        resume_btn = box.addButton("Resume", QMessageBox.ButtonRole.AcceptRole)
+        rollback_btn = box.addButton("Roll Back", QMessageBox.ButtonRole.DestructiveRole)
+        new_btn = box.addButton("Start New", QMessageBox.ButtonRole.ResetRole)
+        box.addButton(QMessageBox.StandardButton.Cancel)
+        box.exec()
+        if box.clickedButton() is new_btn:
+            for path in unfinished:
+                runner.load(path).abandon()
+            return False
+        if box.clickedButton() in (resume_btn, rollback_btn):
+            self.start_organize(runner.load(unfinished[0]), rollback=box.clickedButton() is rollback_btn)
+        return True
+
+    def start_organize(self, organizer, rollback=False):
+        # Files are about to move, so a running scan would only report stale paths
+        self.cancel_scan()
+        self.organize_worker = OrganizeWorker(organizer, rollback=rollback, parent=self)
+        self.organize_worker.progress.connect(self.on_organize_progress)
+        self.organize_worker.organize_finished.connect(self.on_organize_finished)
+        self.organize_btn.setEnabled(False)
+        self.rename_btn.setEnabled(False)
+        self.cancel_scan_btn.setVisible(True)
+        self.summary_label.setText(f"<b>{self.organize_wording(self.organize_worker)[0]}...</b>")
+        self.organize_worker.start()
+
+    @staticmethod
+    def organize_wording(worker):
+        """(heading, past-tense verb, button) describing what an OrganizeWorker is doing."""
+        if isinstance(worker.organizer, Renamer):
+            return "Renaming", "restored" if worker.rollback else "renamed", "Rename"
+        return "Organizing", "restored" if worker.rollback else "moved", "Organize"
+
+    def on_organize_progress(self, completed, total, errors):
+        if self.organize_worker is None:
+            return
+        heading, verb, _ = self.organize_wording(self.organize_worker)
+        text = f"<b>{heading}...</b><br>{completed} of {total} files {verb}"
+        if errors:
+            text += f", {errors} errors"
+        self.summary_label.setText(text)
+
+    def on_organize_finished(self, completed, errors, cancelled):
+        worker = self.organize_worker
+        self.organize_worker = None
+        worker.deleteLater()
+        self.organize_btn.setEnabled(True)
+        self.rename_btn.setEnabled(True)
+        self.cancel_scan_btn.setVisible(False)
+        _, verb, button = self.organize_wording(worker)
+        text = f"<b>{completed} files {verb}</b>"
+        if cancelled:
+            text += f" (cancelled, click {button} to resume or roll back)"
+        text += f"<br>{len(errors)} errors encountered"
+        for error in errors[:5]:
+            text += f"<br><span style='color:#ef4444'>{html.escape(error)}</span>"
+        if len(errors) > 5:
+            text += f"<br>...and {len(errors) - 5} more"
+        self.summary_label.setText(text)
+        if self.current_folder:
+            self.load_files(self.current_folder)
+
+    def closeEvent(self, event):
+        if self.organize_worker is not None:
+            self.organize_worker.cancel()
+            self.organize_worker.wait()
+        self.cancel_scan()
+        self.cancel_duplicates()
+        self.cancel_similar()
+        self.cancel_suggestions()
+        self.cancel_indexing()
+        self.cancel_metadata()
+        if self.search_index is not None:
+            self.search_index.close()
+        self.thumbnails.shutdown()
+        self.set_profiling(False)
+        if self.save_on_close:
+            self.save_settings()
+        super().closeEvent(event)
+
+    def set_profiling(self, enabled, cprofile=False, stall_ms=None):
+        """Turn the diagnostics recording on (starting afresh) or off."""
+        if stall_ms is not None:
+            self.stall_detector.threshold_ms = stall_ms
+        if enabled:
+            PROFILER.enable(cprofile)
+            self.stall_detector.start()
+        else:
+            self.stall_detector.stop()
+            PROFILER.disable()
+
+    def refresh_type_filter(self):
+        current = self.type_filter.currentText() or "All"
+        categories = list(self.category_map)
+        for target in [rule[1] for rule in self.custom_rules] + self.rule_program.targets():
+            if target not in categories:
+                categories.append(target)
+        self.type_filter.blockSignals(True)
+        self.type_filter.clear()
+        self.type_filter.addItem("All")
+        self.type_filter.addItems(categories)
+        self.type_filter.setCurrentText(current if current in categories else "All")
+        self.type_filter.blockSignals(False)
+
+    def rebuild_classifier(self):
+        """Recompile category_map/custom_rules after an edit and reclassify the loaded files."""
+        self.classifier = Classifier(self.category_map, self.custom_rules, self.rule_program)
+        self.file_index.reclassify(self.classifier)
+        self.refresh_size_categories()
+        self.refresh_type_filter()
+        self.apply_filters()
+        self.save_settings()
+
+    def refresh_size_categories(self):
+        if self.size_tree is not None:
+            self.size_tree.rebuild_categories(self.file_index)
+            if self.size_chart is not None:
+                self.size_chart.refresh()
+
+    def open_size_chart(self):
+        if self.size_tree is None:
+            self.scan_label.setText("Browse to a folder to chart its sizes")
+            return
+        if self.size_chart is None:
+            try:
+                self.size_chart = SizeChartDialog(self)
+            except ImportError:
+                QMessageBox.warning(self, "Sizes", "Charts need matplotlib: pip install matplotlib")
+                return
+        self.size_chart.show()
+        self.size_chart.raise_()
+        self.size_chart.activateWindow()
+
+    def filter_choices(self):
+        """The sidebar's (type, size, date) selection, as FilterCache.select takes it."""
+        type_val = self.type_filter.currentText() if hasattr(self, 'type_filter') else "All"
+        size_val = self.size_filter.currentText() if hasattr(self, 'size_filter') else "All"
+        date_val = self.date_filter.currentText() if hasattr(self, 'date_filter') else "All"
+        return type_val or "All", size_val or "All", date_val or "All"
+
+    def filtered_rows(self, rows=None):
+        rows = self.filter_cache.select(*self.filter_choices(), rows=rows)
+        year, creator = self.year_filter.currentText(), self.creator_filter.currentText()
+        if year not in ("", "All"):
+            rows = rows[self.file_index.year[rows] == int(year)]
+        if creator not in ("", "All"):
+            code = self.file_index.creators.find(creator)
+            rows = rows[self.file_index.creator[rows] == code] if code >= 0 else rows[:0]
+        if self.dup_filter.isChecked():
+            if self.duplicate_groups is None:
+                return rows[:0]
+            rows = rows[self.duplicate_groups[rows] >= 0]
+        if self.similar_filter.isChecked():
+            if self.similar_groups is None:
+                return rows[:0]
+            rows = rows[self.similar_groups[rows] >= 0]
+        rank = self.search_rank()
+        if rank is not None:
+            rows = rows[rank[rows] >= 0]
+        return rows
+
+    def apply_filters(self):
+        with PROFILER.span("filter", rows=len(self.file_index)):
+            rows = self.filtered_rows()
+        self.grid_model.groups = self.similar_groups if self.similar_filter.isChecked() else None
+        if self.sort_spec:
+            rows = self.sort_cache.sort(rows, self.sort_spec)
+        elif self.similar_filter.isChecked() and self.similar_groups is not None:
+            # Each group together, its largest (usually the original) copy first
+            rows = rows[np.lexsort((-self.file_index.size[rows], self.similar_groups[rows]))]
+        elif self.dup_filter.isChecked() and self.duplicate_groups is not None:
+            # Keep copies of the same file next to each other
+            rows = rows[np.argsort(self.duplicate_groups[rows], kind="stable")]
+        elif self.search_rank() is not None:
+            rows = rows[np.argsort(self.search_rank()[rows], kind="stable")]
+        self.show_files(rows)
+
+    def show_files(self, rows, append=False):
+        with PROFILER.span("render", rows=len(rows), append=append):
+            self._show_files(rows, append)
+
+    def _show_files(self, rows, append):
+        if not self.view_toggle.isChecked():
+            # List view
+            self.file_table.setVisible(True)
+            self.grid_view.setVisible(False)
+            if append:
+                self.file_model.append_rows(rows)
+            else:
+                self.file_model.set_rows(self.file_index, rows)
+        else:
+            # Grid/thumbnail view
+            self.file_table.setVisible(False)
+            self.grid_view.setVisible(True)
+            if append:
+                self.grid_model.append_rows(rows)
+            else:
+                self.grid_model.set_rows(self.file_index, rows)
+
+    def sort_by_column(self, col):
+        """Sort by a clicked column; shift-click adds it as a further key, or flips it if already sorted on."""
+        key_map = {0: "name", 1: "size", 2: "type", 3: "mtime"}
+        if col not in key_map:
+            return
+        key = key_map[col]
+        spec = list(self.sort_spec)
+        position = next((i for i, (k, _) in enumerate(spec) if k == key), None)
+        if QApplication.keyboardModifiers() & Qt.KeyboardModifier.ShiftModifier:
+            if position is None:
+                spec.append((key, False))
+            else:
+                spec[position] = (key, not spec[position][1])
+        elif len(spec) == 1 and spec[0][0] == key:
+            spec = [(key, not spec[0][1])]
+        else:
+            spec = [(key, False)]
+        self.sort_spec = spec
+        columns = {k: c for c, k in key_map.items()}
+        marks = {columns[k]: ("\u25bc" if reverse else "\u25b2") + (str(i + 1) if len(spec) > 1 else "")
+                 for i, (k, reverse) in enumerate(spec)}
+        self.file_model.set_sort_marks(marks)
+        if len(self.file_index):
+            self.apply_filters()
+
+    def toggle_view(self):
+        style = self.style()
+        if not style:
+            return
+        if self.view_toggle.isChecked():
+            self.view_toggle.setIcon(self.list_icon)
+            self.view_toggle.setToolTip("Switch to List View")
+        else:
+            self.view_toggle.setIcon(self.grid_icon)
+            self.view_toggle.setToolTip("Switch to Grid View")
+        self.apply_filters()
+
+    def open_settings_dialog(self, event=None):
+        # Built on first use and kept, so reopening only refreshes the widgets
+        if self.settings_dialog is None:
+            self.settings_dialog = SettingsDialog(self)
+        self.settings_dialog.sync()
+        self.settings_dialog.exec()
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    app = QApplication(argv)
+    window = SortlifyMainWindow()
+    window.show()
+    if "--startup-time" in argv:
+        window.save_on_close = False
+        # For benchmarks: report the time to first paint and exit
+        def report():
+            if window.startup_ms is None:
+                QTimer.singleShot(10, report)
+                return
+            print(f"{window.startup_ms:.1f}")
+            window.close()
+            app.quit()
+        QTimer.singleShot(0, report)
+    return app.exec()
+
+if __name__ == "__main__":
+    sys.exit(main())
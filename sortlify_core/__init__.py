@@ -0,0 +1,5 @@
+"""Qt-free core of Sortlify: scanning, classification, filtering, organizing and watching.
+
+Submodules are imported on demand so the command-line interface (python -m sortlify_core)
+starts without paying for NumPy or PyQt6.
+"""
@@ -0,0 +1,120 @@
+"""Extension and custom-rule classification of filenames."""
+import bisect
+import hashlib
+import itertools
+import re
+from .profiling import PROFILER
+
+BUILTIN_CATEGORIES = [
+    "Documents", "Images", "Videos", "Audio", "Archives", "Code", "Other"
+]
+DEFAULT_CATEGORY_MAP = {
+    "Documents": [".pdf", ".doc", ".docx", ".txt", ".xls", ".xlsx", ".ppt", ".pptx", ".odt", ".rtf"],
+    "Images": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tiff", ".svg", ".webp", ".heic"],
+    "Videos": [".mp4", ".mov", ".avi", ".mkv", ".flv", ".wmv", ".webm", ".mpeg"],
+    "Audio": [".mp3", ".wav", ".aac", ".flac", ".ogg", ".m4a", ".wma"],
+    "Archives": [".zip", ".rar", ".7z", ".tar", ".gz", ".bz2", ".xz"],
+    "Code": [".py", ".js", ".ts", ".java", ".cpp", ".c", ".cs", ".html", ".css", ".json", ".xml", ".sh", ".bat", ".php", ".rb", ".go", ".rs", ".swift", ".kt", ".m", ".pl", ".lua", ".sql"],
+    "Other": []
+}
+
+META_RULE_FIELDS = ("year", "creator")
+
+def file_ext(name):
+    """Lower-cased extension of a filename, matching os.path.splitext (leading dots don't count)."""
+    i = name.rfind(".")
+    if i <= 0 or not name[:i].strip("."):
+        return ""
+    return name[i:].lower()
+
+def join_names(names):
+    """Concatenate names into one '/'-terminated blob plus the start offset of each name."""
+    offsets = list(itertools.accumulate((len(n) + 1 for n in names), initial=0))
+    return "/".join(names) + "/", offsets
+
+class Classifier:
+    """Compiled form of category_map and custom_rules.
+
+    Extensions become a single dict lookup (the first category listing an extension wins),
+    and all "filename contains" rules are folded into one alternation regex run over the
+    lower-cased names, so names that match no rule are rejected in a single scan. Rules take
+    precedence over extensions, and earlier rules over later ones.
+
+    A rule is (text, target) or (text, target, field). Rules on a metadata field ("year" is,
+    "creator" contains) only apply once metadata has been read, in FileIndex.reclassify,
+    and filename rules win over them. A rules.RuleProgram, if given, is also applied by
+    FileIndex.reclassify and wins over everything else.
+    """
+    def __init__(self, category_map, custom_rules=(), program=None):
+        self.program = program
+        self.ext_map = {}
+        for cat, exts in category_map.items():
+            for ext in exts:
+                self.ext_map.setdefault(ext.lower(), cat)
+        rules = [(rule[0], rule[1], rule[2] if len(rule) > 2 else "name") for rule in custom_rules]
+        # A rule containing '/' can never match a filename, and keeping it out of the
+        # pattern lets match_rules run over '/'-joined name blobs safely
+        self.rules = [(text.lower(), target) for text, target, field in rules
+                      if field == "name" and text and "/" not in text]
+        self.meta_rules = [(field, text.lower(), target) for text, target, field in rules
+                           if field in META_RULE_FIELDS and text]
+        if self.rules:
+            self.rule_pattern = re.compile("|".join(re.escape(text) for text, _ in self.rules))
+        else:
+            self.rule_pattern = None
+        # Identifies the compiled rules so cached categories can be trusted or recomputed
+        self.key = hashlib.sha1(repr((sorted(self.ext_map.items()), self.rules)).encode("utf-8")).hexdigest()
+
+    def category_for_ext(self, ext):
+        return self.ext_map.get(ext, "Other")
+
+    def rule_target(self, name):
+        name = name.lower()
+        for text, target in self.rules:
+            if text in name:
+                return target
+        return None
+
+    def classify(self, name, ext=None):
+        if self.rule_pattern is not None and self.rule_pattern.search(name.lower()):
+            return self.rule_target(name)
+        return self.ext_map.get(file_ext(name) if ext is None else ext, "Other")
+
+    def match_rules(self, blob, offsets):
+        """Yield (row, category) for every name in a join_names blob matched by a custom rule."""
+        if self.rule_pattern is None:
+            return
+        lowered = blob.lower()
+        if len(lowered) != len(blob):
+            # A few characters grow when lower-cased, which would shift the offsets
+            for row in range(len(offsets) - 1):
+                target = self.rule_target(blob[offsets[row]:offsets[row + 1] - 1])
+                if target is not None:
+                    yield row, target
+            return
+        last = -1
+        for m in self.rule_pattern.finditer(lowered):
+            row = bisect.bisect_right(offsets, m.start()) - 1
+            if row != last:
+                last = row
+                yield row, self.rule_target(blob[offsets[row]:offsets[row + 1] - 1])
+
+    def classify_many(self, names, exts=None):
+        if exts is None:
+            exts = [file_ext(n) for n in names]
+        get = self.ext_map.get
+        categories = [get(e, "Other") for e in exts]
+        if self.rule_pattern is not None:
+            blob, offsets = join_names(names)
+            for row, category in self.match_rules(blob, offsets):
+                categories[row] = category
+        return categories
+
+def classify_entries(classifier, entries):
+    """Turn (folder, name, size, mtime) tuples into FileIndex rows."""
+    with PROFILER.span("classify", files=len(entries)):
+        names = [name for _, name, _, _ in entries]
+        exts = [file_ext(name) for name in names]
+        categories = classifier.classify_many(names, exts)
+    return [(folder, name, size, mtime, ext, category)
+            for (folder, name, size, mtime), ext, category in zip(entries, exts, categories)]
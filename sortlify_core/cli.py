@@ -0,0 +1,340 @@
+"""Headless command-line interface: python -m sortlify_core {scan,plan,apply,rename,dupes,similar,suggest,search,meta,sizes,watch}.
+
+Every command streams JSON lines on stdout so the output can be piped into other tools.
+Heavier modules are imported inside the commands that need them to keep start-up fast.
+"""
+import argparse
+import json
+import os
+import sys
+from .classify import DEFAULT_CATEGORY_MAP, Classifier
+from .filters import DATE_FILTERS, SIZE_FILTERS, filter_bounds, matches
+
+def emit(obj):
+    sys.stdout.write(json.dumps(obj) + "\n")
+
+def parse_rule(text):
+    contains, sep, target = text.partition("=")
+    if not sep or not contains or not target:
+        raise argparse.ArgumentTypeError("rules look like TEXT=CATEGORY")
+    return contains, target
+
+def build_classifier(args):
+    program = None
+    if args.rules:
+        from .rules import RuleProgram, parse_rules
+        try:
+            with open(args.rules, encoding="utf-8") as f:
+                program = RuleProgram(parse_rules(f.read()))
+        except (OSError, ValueError) as e:
+            raise SystemExit(f"sortlify: {args.rules}: {e}")
+    return Classifier(DEFAULT_CATEGORY_MAP, args.rule, program)
+
+def scanned_rows(args, classifier, destinations=False):
+    """Yield classified (folder, name, size, mtime, ext, category) rows that pass the filters.
+
+    With destinations, the last field is the folder the row would be organized into, which
+    differs from the category for rules with templated destinations.
+    """
+    from .classify import classify_entries
+    from .scan import ScanCache, scan_tree
+    bounds = filter_bounds(args.type, args.size, args.modified)
+    cache = None if args.no_cache else ScanCache()
+    try:
+        if cache is not None:
+            batches = cache.scan(args.folder, classifier)
+        else:
+            batches = (classify_entries(classifier, entries) for entries in scan_tree(args.folder))
+        for batch in batches:
+            categories = [row[5] for row in batch]
+            if classifier.program:
+                batch, categories = _apply_program(classifier, batch, destinations)
+            for row, category in zip(batch, categories):
+                if matches(bounds, category, row[2], row[3]):
+                    yield row
+    finally:
+        if cache is not None:
+            cache.close()
+
+def _apply_program(classifier, batch, destinations):
+    from .index import FileIndex
+    fragment = FileIndex()
+    fragment.append_batch(batch)
+    fragment.reclassify(classifier)
+    categories = [fragment.category_name(i) for i in range(len(batch))]
+    last = [fragment.destination_name(i) for i in range(len(batch))] if destinations else categories
+    return [row[:5] + (value,) for row, value in zip(batch, last)], categories
+
+def planned_moves(args):
+    from .organize import plan_moves
+    dest = os.path.abspath(args.dest or args.folder)
+    rows = scanned_rows(args, build_classifier(args), destinations=True)
+    return dest, plan_moves(((folder, name, category) for folder, name, _, _, _, category in rows), dest)
+
+def cmd_scan(args):
+    for folder, name, size, mtime, ext, category in scanned_rows(args, build_classifier(args)):
+        emit({"path": os.path.join(folder, name), "size": size, "mtime": mtime, "ext": ext, "category": category})
+    return 0
+
+def cmd_plan(args):
+    _, moves = planned_moves(args)
+    for src, dst in moves:
+        emit({"src": src, "dst": dst})
+    return 0
+
+def cmd_apply(args):
+    from .organize import Organizer
+    if args.resume or args.rollback:
+        organizer = Organizer.load(args.resume or args.rollback)
+    else:
+        dest, moves = planned_moves(args)
+        if not moves:
+            emit({"moved": 0, "errors": []})
+            return 0
+        organizer = Organizer.create(dest, moves)
+    def progress(completed, total, errors):
+        emit({"completed": completed, "total": total, "errors": errors})
+    action = organizer.rollback if args.rollback else organizer.run
+    try:
+        completed, errors = action(progress)
+    except KeyboardInterrupt:
+        emit({"interrupted": True, "journal": organizer.journal_path})
+        return 130
+    emit({"restored" if args.rollback else "moved": completed, "errors": errors, "journal": organizer.journal_path})
+    return 1 if errors else 0
+
+def cmd_rename(args):
+    from .rename import STATUS_TEXT, UNCHANGED, Renamer, plan_renames
+    if args.resume or args.rollback:
+        renamer = Renamer.load(args.resume or args.rollback)
+    else:
+        from .index import FileIndex
+        index = FileIndex()
+        index.append_batch(sorted(scanned_rows(args, build_classifier(args)), key=lambda row: (row[0], row[1])))
+        try:
+            plan = plan_renames(index, index.select(), args.template, args.start)
+        except ValueError as e:
+            raise SystemExit(f"sortlify: {e}")
+        for i in range(len(plan)):
+            if plan.status[i] != UNCHANGED:
+                emit({"src": os.path.join(plan.folders[i], plan.names[i]), "dst": os.path.join(plan.folders[i], plan.targets[i]),
+                      "status": STATUS_TEXT[int(plan.status[i])]})
+        if not args.apply:
+            return 0
+        steps = plan.steps()
+        if not steps:
+            emit({"renamed": 0, "errors": []})
+            return 0
+        renamer = Renamer.create(os.path.abspath(args.folder), steps)
+    def progress(completed, total, errors):
+        emit({"completed": completed, "total": total, "errors": errors})
+    action = renamer.rollback if args.rollback else renamer.run
+    try:
+        completed, errors = action(progress)
+    except KeyboardInterrupt:
+        emit({"interrupted": True, "journal": renamer.journal_path})
+        return 130
+    emit({"restored" if args.rollback else "renamed": completed, "errors": errors, "journal": renamer.journal_path})
+    return 1 if errors else 0
+
+def cmd_dupes(args):
+    from .duplicates import find_duplicates
+    rows = scanned_rows(args, build_classifier(args))
+    files = ((os.path.join(folder, name), size) for folder, name, size, _, _, _ in rows)
+    for size, paths in find_duplicates(files, min_size=args.min_size):
+        emit({"size": size, "paths": paths})
+    return 0
+
+def cmd_similar(args):
+    import numpy as np
+    from .similar import HASH_EXTS, HashCache, group_similar
+    files = [(os.path.join(folder, name), size, mtime)
+             for folder, name, size, mtime, ext, _ in scanned_rows(args, build_classifier(args)) if ext in HASH_EXTS]
+    paths, hashes = [], []
+    cache = HashCache()
+    try:
+        for start, batch in cache.hashes(files):
+            for (path, _, _), pair in zip(files[start:], batch):
+                if pair is not None:
+                    paths.append(path)
+                    hashes.append(pair[1])
+    finally:
+        cache.close()
+    groups = group_similar(np.array(hashes, np.int64).view(np.uint64), args.max_distance)
+    members = {}
+    for path, group in zip(paths, groups.tolist()):
+        if group >= 0:
+            members.setdefault(group, []).append(path)
+    for group in sorted(members):
+        emit({"paths": sorted(members[group])})
+    return 0
+
+def cmd_suggest(args):
+    from .suggest import Suggester
+    suggester = Suggester()
+    try:
+        learned = suggester.learn()
+        if not suggester.trained:
+            print("sortlify: nothing to learn from yet; organize some files first", file=sys.stderr)
+            return 1
+        if learned:
+            emit({"learned": learned})
+        files = [(os.path.join(folder, name), size, mtime)
+                 for folder, name, size, mtime, _, _ in scanned_rows(args, build_classifier(args))]
+        for start, suggestions in suggester.suggest(files):
+            for (path, _, _), (category, confidence) in zip(files[start:], suggestions):
+                emit({"path": path, "suggested": category, "confidence": round(confidence, 3)})
+    finally:
+        suggester.close()
+    return 0
+
+def cmd_search(args):
+    from .search import SearchIndex
+    root = os.path.abspath(args.folder)
+    files = {os.path.join(folder, name): (size, mtime)
+             for folder, name, size, mtime, _, _ in scanned_rows(args, build_classifier(args))}
+    index = SearchIndex()
+    try:
+        # With filters the scan doesn't list every file, so nothing can be pruned
+        everything = args.type == args.size == args.modified == "All"
+        index.update(root, [(path, size, mtime) for path, (size, mtime) in files.items()], prune=everything)
+        for path in index.search(root, args.query, limit=args.limit):
+            if path in files:
+                emit({"path": path})
+    finally:
+        index.close()
+    return 0
+
+def cmd_meta(args):
+    from .metadata import EXTRACTORS, MetadataCache
+    files = [(os.path.join(folder, name), size, mtime)
+             for folder, name, size, mtime, ext, _ in scanned_rows(args, build_classifier(args)) if ext in EXTRACTORS]
+    cache = MetadataCache()
+    try:
+        for start, metas in cache.extract(files):
+            for (path, _, _), meta in zip(files[start:], metas):
+                emit({"path": path, **meta})
+    finally:
+        cache.close()
+    return 0
+
+def cmd_sizes(args):
+    from itertools import islice
+    from .index import FileIndex
+    from .sizes import SizeTree
+    # The tree keys folders by absolute path, so the scan has to report them that way too
+    args.folder = os.path.abspath(args.folder)
+    tree = SizeTree(args.folder)
+    rows = scanned_rows(args, build_classifier(args))
+    while True:
+        batch = list(islice(rows, 10_000))
+        if not batch:
+            break
+        fragment = FileIndex()
+        fragment.append_batch(batch)
+        tree.add_index(fragment)
+    size, files = tree.total()
+    emit({"path": tree.root, "size": size, "files": files})
+    for category, (size, files) in sorted(tree.categories.items(), key=lambda item: -item[1][0]):
+        emit({"category": category, "size": size, "files": files})
+    for path, size, files in tree.top(args.top):
+        emit({"path": path, "size": size, "files": files})
+    return 0
+
+def cmd_watch(args):
+    from .watch import FolderWatch, PollingWatcher
+    root = os.path.abspath(args.folder)
+    watcher = PollingWatcher(root) if args.poll else None
+    def report(counts):
+        emit(counts)
+        sys.stdout.flush()
+    watch = FolderWatch(root, build_classifier(args), organize=args.organize,
+                        settle=args.settle, on_change=report, watcher=watcher)
+    report({"watching": root, "files": watch.index.live_count()})
+    try:
+        watch.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watch.close()
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="sortlify", description="Scan and organize folders without the GUI.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(sub, filters=True):
+        sub.add_argument("folder")
+        sub.add_argument("--rule", action="append", type=parse_rule, default=[], metavar="TEXT=CATEGORY",
+                         help="custom rule: files whose name contains TEXT go to CATEGORY (repeatable)")
+        sub.add_argument("--rules", metavar="FILE",
+                         help="file of advanced rules, one per line, e.g. 'ext:.pdf name:*invoice* -> Invoices/{year}'")
+        if filters:
+            sub.add_argument("--type", default="All", help="only files of this category")
+            sub.add_argument("--size", default="All", choices=SIZE_FILTERS, help="size class in MB")
+            sub.add_argument("--modified", default="All", choices=DATE_FILTERS)
+            sub.add_argument("--no-cache", action="store_true", help="don't read or update the scan cache")
+
+    scan = commands.add_parser("scan", help="list files with their categories")
+    add_common(scan)
+    scan.set_defaults(func=cmd_scan)
+    plan = commands.add_parser("plan", help="dry run: list the moves apply would make")
+    add_common(plan)
+    plan.add_argument("--dest", help="folder to create category folders in (default: the scanned folder)")
+    plan.set_defaults(func=cmd_plan)
+    apply = commands.add_parser("apply", help="move files into their category folders")
+    add_common(apply)
+    apply.add_argument("--dest", help="folder to create category folders in (default: the scanned folder)")
+    journal = apply.add_mutually_exclusive_group()
+    journal.add_argument("--resume", metavar="JOURNAL", help="finish an interrupted run from its journal")
+    journal.add_argument("--rollback", metavar="JOURNAL", help="move the files of a journaled run back")
+    apply.set_defaults(func=cmd_apply)
+    rename = commands.add_parser("rename", help="rename files from a template; lists the renames unless --apply")
+    add_common(rename)
+    rename.add_argument("template", nargs="?", default="{date:%Y-%m-%d}_{counter:04}_{name}{ext}",
+                        help="fields: {name} {ext} {date:FMT} {counter:SPEC} {category} {folder} {size}")
+    rename.add_argument("--start", type=int, default=1, help="first {counter} value")
+    journal = rename.add_mutually_exclusive_group()
+    journal.add_argument("--apply", action="store_true", help="perform the renames")
+    journal.add_argument("--resume", metavar="JOURNAL", help="finish an interrupted rename from its journal")
+    journal.add_argument("--rollback", metavar="JOURNAL", help="give the files of a journaled rename their old names back")
+    rename.set_defaults(func=cmd_rename)
+    dupes = commands.add_parser("dupes", help="list groups of files with identical content")
+    add_common(dupes)
+    dupes.add_argument("--min-size", type=int, default=1, help="ignore files smaller than this many bytes")
+    dupes.set_defaults(func=cmd_dupes)
+    similar = commands.add_parser("similar", help="list groups of near-duplicate images (resized or re-encoded copies)")
+    add_common(similar)
+    similar.add_argument("--max-distance", type=int, default=6, help="differing bits of the 64-bit pHash still counted as similar")
+    similar.set_defaults(func=cmd_similar)
+    suggest = commands.add_parser("suggest", help="suggest categories learned from past organize runs")
+    add_common(suggest)
+    suggest.set_defaults(func=cmd_suggest)
+    search = commands.add_parser("search", help="full-text search of document names and contents")
+    add_common(search)
+    search.add_argument("query")
+    search.add_argument("--limit", type=int, default=100, help="maximum number of results")
+    search.set_defaults(func=cmd_search)
+    meta = commands.add_parser("meta", help="read EXIF, ID3 and MP4 metadata")
+    add_common(meta)
+    meta.set_defaults(func=cmd_meta)
+    sizes = commands.add_parser("sizes", help="total bytes per category and the largest folders")
+    add_common(sizes)
+    sizes.add_argument("--top", type=int, default=20, help="number of largest folders to list")
+    sizes.set_defaults(func=cmd_sizes)
+    watch = commands.add_parser("watch", help="keep a folder organized as files arrive")
+    add_common(watch, filters=False)
+    watch.add_argument("--organize", action="store_true", help="move new files into their category folders")
+    watch.add_argument("--settle", type=float, default=0.5, help="seconds a file must be quiet before it is handled")
+    watch.add_argument("--poll", action="store_true", help="use directory polling instead of inotify")
+    watch.set_defaults(func=cmd_watch)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # Output piped into something like head; stop quietly
+        sys.stderr.close()
+        return 0
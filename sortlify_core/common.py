@@ -0,0 +1,34 @@
+"""Constants and locations shared by the Sortlify core modules."""
+import os
+import sys
+
+MB = 1024 * 1024
+DAY = 86400
+
+def app_cache_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+    return os.path.join(base, "Sortlify")
+
+def app_config_dir():
+    if sys.platform == "win32":
+        base = os.environ.get("APPDATA", os.path.expanduser("~"))
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_CONFIG_HOME", os.path.expanduser("~/.config"))
+    return os.path.join(base, "Sortlify")
+
+def process_pool(workers=None):
+    """A process pool that spawns its workers; fork would copy the parent's Qt and SQLite state.
+
+    multiprocessing is imported here rather than at the top of each module, which keeps
+    it out of the GUI's startup.
+    """
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
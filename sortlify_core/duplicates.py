@@ -0,0 +1,73 @@
+"""Content-hash duplicate detection with staged hashing.
+
+Files are first bucketed by size, which costs nothing since the scan already has it.
+Within a size bucket only the first and last 64 KiB are hashed, and only files that
+still collide after that are hashed in full, so most of a large tree is never read.
+"""
+import hashlib
+import mmap
+from collections import defaultdict
+from .common import MB
+
+EDGE_BYTES = 64 * 1024
+
+def edge_digest(path, size):
+    """BLAKE2 of the first and last EDGE_BYTES; covers the whole file when it's small."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        h.update(f.read(EDGE_BYTES))
+        if size > 2 * EDGE_BYTES:
+            f.seek(size - EDGE_BYTES)
+        h.update(f.read(EDGE_BYTES))
+    return h.digest()
+
+def full_digest(path, size, chunk_size=8 * MB):
+    """BLAKE2 of the whole file, read through a memory map (hashlib releases the GIL)."""
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        view = memoryview(m)
+        try:
+            for offset in range(0, len(view), chunk_size):
+                h.update(view[offset:offset + chunk_size])
+        finally:
+            view.release()
+    return h.digest()
+
+def _regroup(pool, groups, digest, progress, stage, is_cancelled):
+    """Split each group of (path, size) by digest, keeping only sub-groups with 2+ files."""
+    items = [item for group in groups for item in group]
+    def job(item):
+        if is_cancelled is not None and is_cancelled():
+            return None
+        try:
+            return digest(*item)
+        except (OSError, ValueError):
+            return None
+    buckets = defaultdict(list)
+    for done, (item, key) in enumerate(zip(items, pool.map(job, items)), 1):
+        if key is not None:
+            buckets[(item[1], key)].append(item)
+        if progress is not None and (done % 256 == 0 or done == len(items)):
+            progress(stage, done, len(items))
+    return [group for group in buckets.values() if len(group) > 1]
+
+def find_duplicates(files, min_size=1, workers=8, progress=None, is_cancelled=None):
+    """Group identical files from an iterable of (path, size).
+
+    Returns (size, paths) for each set of identical files, largest first. progress, if
+    given, is called as progress(stage, done, total) with stage "edges" or "full".
+    """
+    by_size = defaultdict(list)
+    for path, size in files:
+        if size >= min_size:
+            by_size[size].append((path, size))
+    groups = [group for group in by_size.values() if len(group) > 1]
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        groups = _regroup(pool, groups, edge_digest, progress, "edges", is_cancelled)
+        # The edge hash already read every byte of files up to 2 * EDGE_BYTES
+        confirmed = [g for g in groups if g[0][1] <= 2 * EDGE_BYTES]
+        large = [g for g in groups if g[0][1] > 2 * EDGE_BYTES]
+        confirmed += _regroup(pool, large, full_digest, progress, "full", is_cancelled)
+    confirmed.sort(key=lambda g: g[0][1], reverse=True)
+    return [(group[0][1], sorted(path for path, _ in group)) for group in confirmed]
@@ -0,0 +1,78 @@
+"""The sidebar's Type/Size/Modified filters as plain bounds, shared by the GUI and CLI."""
+import time
+from .common import DAY, MB
+
+SIZE_FILTERS = ["All", "<10", "10-100", ">100"]
+DATE_FILTERS = ["All", "Today", "Last 7 Days", "Last Month", "Older"]
+
+def filter_bounds(type_val="All", size_val="All", date_val="All", now=None):
+    """Translate filter choices into FileIndex.select keyword arguments."""
+    bounds = {}
+    # Type
+    if type_val != "All":
+        bounds["category"] = type_val
+    # Size
+    if size_val == "<10":
+        bounds["max_size"] = 10 * MB - 1
+    elif size_val == "10-100":
+        bounds["min_size"] = 10 * MB
+        bounds["max_size"] = 100 * MB
+    elif size_val == ">100":
+        bounds["min_size"] = 100 * MB + 1
+    # Date: a file is within N calendar days when it was modified after midnight N days ago
+    local = time.localtime(now)
+    midnight = int(time.mktime((local.tm_year, local.tm_mon, local.tm_mday, 0, 0, 0, 0, 0, -1)))
+    days = {"Today": 0, "Last 7 Days": 7, "Last Month": 31}
+    if date_val in days:
+        bounds["min_mtime"] = midnight - days[date_val] * DAY
+    elif date_val == "Older":
+        bounds["max_mtime"] = midnight - 31 * DAY - 1
+    return bounds
+
+def _buckets(choices, low, high, bounds_for):
+    # Edges at every bound any choice uses, so each choice keeps a union of whole buckets
+    edges = set()
+    for choice in choices:
+        bounds = bounds_for(choice)
+        if low in bounds:
+            edges.add(bounds[low])
+        if high in bounds:
+            edges.add(bounds[high] + 1)
+    edges = sorted(edges)
+    allowed = {}
+    for choice in choices:
+        bounds = bounds_for(choice)
+        keep = []
+        for k in range(len(edges) + 1):
+            value = edges[k - 1] if k else (edges[0] - 1 if edges else 0)
+            if bounds.get(low, value) <= value <= bounds.get(high, value):
+                keep.append(k)
+        allowed[choice] = keep
+    return edges, allowed
+
+def filter_buckets(now=None):
+    """Bucket edges for the Size and Modified filters.
+
+    Returns (size_edges, size_allowed, mtime_edges, mtime_allowed). A value v falls in
+    bucket bisect_right(edges, v), and the allowed dicts map each filter choice to the
+    buckets it keeps, so a filter can be checked per bucket instead of per value.
+    """
+    size_edges, size_allowed = _buckets(SIZE_FILTERS, "min_size", "max_size",
+                                        lambda choice: filter_bounds(size_val=choice, now=now))
+    mtime_edges, mtime_allowed = _buckets(DATE_FILTERS, "min_mtime", "max_mtime",
+                                          lambda choice: filter_bounds(date_val=choice, now=now))
+    return size_edges, size_allowed, mtime_edges, mtime_allowed
+
+def matches(bounds, category, size, mtime):
+    """Scalar form of FileIndex.select for streaming one file at a time."""
+    if "category" in bounds and category != bounds["category"]:
+        return False
+    if "min_size" in bounds and size < bounds["min_size"]:
+        return False
+    if "max_size" in bounds and size > bounds["max_size"]:
+        return False
+    if "min_mtime" in bounds and mtime < bounds["min_mtime"]:
+        return False
+    if "max_mtime" in bounds and mtime > bounds["max_mtime"]:
+        return False
+    return True
@@ -0,0 +1,717 @@
+"""Columnar in-memory index of scanned files."""
+import bisect
+import os
+import re
+import time
+from collections import OrderedDict
+import numpy as np
+from .classify import join_names
+from .common import DAY
+from .filters import filter_buckets
+from .profiling import PROFILER
+
+NATURAL_DIGITS = re.compile(r"([0-9]+)")
+
+class StringTable:
+    """Interns repeated strings (categories, extensions, folders) as small integer codes."""
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def codes(self, values):
+        # Intern each distinct value once, then map the whole sequence with plain dict lookups
+        mapping = {v: self.code(v) for v in dict.fromkeys(values)}
+        return [mapping[v] for v in values]
+
+    def find(self, value):
+        return self._codes.get(value, -1)
+
+    def __len__(self):
+        return len(self.values)
+
+class FileIndex:
+    """Columnar store of scanned files.
+
+    Size, mtime and the interned category/extension/folder codes live in packed NumPy
+    arrays, so filtering is a handful of vectorized comparisons and sorting is an argsort.
+    Names are kept in one '/'-separated string blob per appended batch (a character no
+    filename can contain), addressed through an offset array. Removed files are only
+    marked dead, so row numbers stay stable for views holding them.
+    """
+    _columns = {
+        "size": np.int64,      # bytes
+        "mtime": np.int64,     # seconds since the epoch
+        "category": np.int16,
+        "ext": np.int32,
+        "folder": np.int32,
+        "alive": np.bool_,
+        "year": np.int16,      # year taken/recorded from embedded metadata, 0 if unknown
+        "creator": np.int32,   # camera model or artist code, -1 if unknown
+        "destination": np.int32,  # folder a templated rule files the row under, -1 for its category
+    }
+
+    def __init__(self):
+        self.categories = StringTable()
+        self.extensions = StringTable()
+        self.folders = StringTable()
+        self.creators = StringTable()
+        self.destinations = StringTable()
+        self._arrays = {name: np.empty(0, dtype) for name, dtype in self._columns.items()}
+        self._count = 0
+        # Name chunks: row where the chunk starts, concatenated names, offsets into the blob
+        self._chunk_starts = []
+        self._chunks = []
+        self._lookup = None
+        self._lowered = {}  # chunk number -> lower-cased blob, for name search
+        self._natural = {}  # chunk number -> (natural sort keys, chunk rows in key order)
+        self.generation = 0  # bumped whenever existing rows change; appends don't count
+
+    def __len__(self):
+        return self._count
+
+    def live_count(self):
+        return int(np.count_nonzero(self.alive))
+
+    @property
+    def size(self):
+        return self._arrays["size"][:self._count]
+
+    @property
+    def mtime(self):
+        return self._arrays["mtime"][:self._count]
+
+    @property
+    def category(self):
+        return self._arrays["category"][:self._count]
+
+    @property
+    def ext(self):
+        return self._arrays["ext"][:self._count]
+
+    @property
+    def folder(self):
+        return self._arrays["folder"][:self._count]
+
+    @property
+    def alive(self):
+        return self._arrays["alive"][:self._count]
+
+    @property
+    def year(self):
+        return self._arrays["year"][:self._count]
+
+    @property
+    def creator(self):
+        return self._arrays["creator"][:self._count]
+
+    @property
+    def destination(self):
+        return self._arrays["destination"][:self._count]
+
+    def _reserve(self, extra):
+        needed = self._count + extra
+        capacity = len(self._arrays["size"])
+        if needed <= capacity:
+            return
+        capacity = max(needed, capacity * 2, 1024)
+        for name, arr in self._arrays.items():
+            grown = np.empty(capacity, arr.dtype)
+            grown[:self._count] = arr[:self._count]
+            self._arrays[name] = grown
+
+    def _append_names(self, names):
+        blob, offsets = join_names(names)
+        self._chunk_starts.append(self._count)
+        self._chunks.append((blob, np.array(offsets, np.int64)))
+
+    def append_batch(self, rows):
+        """Append (folder, name, size_bytes, mtime_secs, ext, category) tuples."""
+        if not rows:
+            return
+        n = len(rows)
+        self._reserve(n)
+        start, end = self._count, self._count + n
+        folders, names, sizes, mtimes, exts, cats = zip(*rows)
+        self._arrays["size"][start:end] = sizes
+        self._arrays["mtime"][start:end] = mtimes
+        self._arrays["ext"][start:end] = self.extensions.codes(exts)
+        self._arrays["category"][start:end] = self.categories.codes(cats)
+        self._arrays["folder"][start:end] = self.folders.codes(folders)
+        self._arrays["alive"][start:end] = True
+        self._arrays["year"][start:end] = 0
+        self._arrays["creator"][start:end] = -1
+        self._arrays["destination"][start:end] = -1
+        self._append_names(names)
+        self._count = end
+        if self._lookup is not None:
+            codes = self._arrays["folder"][start:end].tolist()
+            self._lookup.update(zip(zip(codes, names), range(start, end)))
+
+    def extend(self, other):
+        """Append every row of another index, remapping its string codes into this one."""
+        n = len(other)
+        if not n:
+            return
+        self._reserve(n)
+        start, end = self._count, self._count + n
+        for name in ("size", "mtime", "alive", "year"):
+            self._arrays[name][start:end] = other._arrays[name][:n]
+        for name, table in (("category", "categories"), ("ext", "extensions"), ("folder", "folders"),
+                            ("creator", "creators"), ("destination", "destinations")):
+            mine = getattr(self, table)
+            # The trailing -1 keeps unknown (-1) codes unknown
+            remap = np.array([mine.code(v) for v in getattr(other, table).values] + [-1], dtype=np.int64)
+            self._arrays[name][start:end] = remap[other._arrays[name][:n]]
+        # Sort keys a scan worker already computed for the fragment come along with its names
+        first = len(self._chunks)
+        self._natural.update((first + number, keys) for number, keys in other._natural.items())
+        for chunk_start, chunk in zip(other._chunk_starts, other._chunks):
+            self._chunk_starts.append(start + chunk_start)
+            self._chunks.append(chunk)
+        self._count = end
+        self._lookup = None
+
+    def find(self, folder, name):
+        """Row of a live file, or -1. The (folder, name) lookup is built on first use."""
+        if self._lookup is None:
+            self._lookup = {}
+            folder_codes = self.folder.tolist()
+            alive = self.alive
+            for start, (blob, offsets) in zip(self._chunk_starts, self._chunks):
+                names = blob[:-1].split("/")
+                for i, n in enumerate(names):
+                    if alive[start + i]:
+                        self._lookup[(folder_codes[start + i], n)] = start + i
+        code = self.folders.find(folder)
+        return self._lookup.get((code, name), -1) if code >= 0 else -1
+
+    def update(self, row, size, mtime, category):
+        self._arrays["size"][row] = size
+        self._arrays["mtime"][row] = mtime
+        self._arrays["category"][row] = self.categories.code(category)
+        self._arrays["destination"][row] = -1
+        self.generation += 1
+
+    def set_metadata(self, rows, metas):
+        """Store the year and creator from metadata dicts (see metadata.py) for rows."""
+        rows = np.asarray(rows, dtype=np.int64)
+        years = (meta.get("year", 0) for meta in metas)
+        self._arrays["year"][rows] = [year if 0 < year < 10000 else 0 for year in years]
+        self._arrays["creator"][rows] = [self.creators.code(meta["creator"]) if meta.get("creator") else -1
+                                         for meta in metas]
+
+    def remove(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        self._arrays["alive"][rows] = False
+        self.generation += 1
+        if self._lookup is not None:
+            folder_codes = self.folder
+            for row in rows.tolist():
+                self._lookup.pop((int(folder_codes[row]), self.name(row)), None)
+
+    def fragmented(self, max_chunks=64):
+        """Whether dead rows or small name chunks have piled up enough for compacted() to pay off."""
+        dead = self._count - self.live_count()
+        return len(self._chunks) > max_chunks or dead > max(1024, self._count // 4)
+
+    def compacted(self):
+        """A new index of just the live rows, in order, with all names in one chunk.
+
+        Row numbers change, and strings no live row uses are dropped from the tables, so
+        a long-lived index can shed what removals and small appends leave behind.
+        """
+        rows = np.flatnonzero(self.alive)
+        other = FileIndex()
+        n = len(rows)
+        if not n:
+            return other
+        other._reserve(n)
+        for name in self._columns:
+            other._arrays[name][:n] = self._arrays[name][rows]
+        for name, table in (("category", "categories"), ("ext", "extensions"), ("folder", "folders"),
+                            ("creator", "creators"), ("destination", "destinations")):
+            codes = other._arrays[name][:n]
+            values, mine = getattr(self, table).values, getattr(other, table)
+            # The trailing -1 keeps unknown (-1) codes unknown
+            remap = np.full(len(values) + 1, -1, np.int64)
+            used = np.unique(codes[codes >= 0]).tolist()
+            remap[used] = [mine.code(values[code]) for code in used]
+            codes[:] = remap[codes]
+        other._append_names(self.names(rows))
+        other._count = n
+        return other
+
+    def rows_under(self, folder):
+        """Live rows in folder or any of its subfolders."""
+        prefix = folder.rstrip(os.sep) + os.sep
+        codes = [code for code, path in enumerate(self.folders.values) if path == folder or path.startswith(prefix)]
+        return np.flatnonzero(np.isin(self.folder, codes) & self.alive)
+
+    def match_names(self, text):
+        """Live rows whose name contains text, ignoring case; one substring scan per name chunk."""
+        needle = text.lower()
+        if not needle or "/" in needle:
+            return np.empty(0, np.int64)
+        found = []
+        for k, (start, (blob, offsets)) in enumerate(zip(self._chunk_starts, self._chunks)):
+            lowered = self._lowered.get(k)
+            if lowered is None:
+                lowered = self._lowered[k] = blob.lower()
+            if len(lowered) != len(blob):
+                # Lower-casing changed some character's length; fall back to matching name by name
+                names = blob[:-1].split("/")
+                hits = [i for i, n in enumerate(names) if needle in n.lower()]
+            else:
+                positions, i = [], lowered.find(needle)
+                while i >= 0:
+                    positions.append(i)
+                    i = lowered.find(needle, i + 1)
+                hits = np.unique(np.searchsorted(offsets, positions, side="right") - 1) if positions else []
+            found.append(np.asarray(hits, np.int64) + start)
+        rows = np.concatenate(found) if found else np.empty(0, np.int64)
+        return rows[self.alive[rows]]
+
+    def search_names(self, pattern, lower=False):
+        """Rows of live files whose name pattern.search matches, and the match for each.
+
+        Each name chunk is searched in one pass with names on separate lines, so a
+        pattern compiled with re.MULTILINE anchors ^ and $ at name boundaries. With lower,
+        the lower-cased names are searched. The result is the same as searching every name
+        on its own: a match that runs on into the next name is retried within its own name.
+        """
+        found_rows, found = [], []
+        for k, (start, (blob, offsets)) in enumerate(zip(self._chunk_starts, self._chunks)):
+            text = blob
+            if lower:
+                text = self._lowered.get(k)
+                if text is None:
+                    text = self._lowered[k] = blob.lower()
+            if len(text) != len(blob):
+                names = blob[:-1].split("/")
+                hits = [(i, pattern.search(n.lower() if lower else n)) for i, n in enumerate(names)]
+                hits = [(i, m) for i, m in hits if m]
+                found_rows.append(np.array([i for i, _ in hits], np.int64) + start)
+                found.extend(m for _, m in hits)
+                continue
+            text = text.replace("/", "\n")
+            matches = list(pattern.finditer(text))
+            if not matches:
+                continue
+            starts = np.fromiter((m.start() for m in matches), np.int64, len(matches))
+            ends = np.fromiter((m.end() for m in matches), np.int64, len(matches))
+            names = np.searchsorted(offsets, starts, side="right") - 1
+            # An empty match after the last newline belongs to no name
+            inside = names < len(offsets) - 1
+            if not inside.all():
+                matches = [m for m, kept in zip(matches, inside.tolist()) if kept]
+                names, ends = names[inside], ends[inside]
+            if (ends >= offsets[names + 1]).any():
+                # A match ran on into the next name and may have swallowed a match there
+                hits = self._search_by_name(pattern, text, offsets)
+                found_rows.append(np.array([i for i, _ in hits], np.int64) + start)
+                found.extend(m for _, m in hits)
+                continue
+            # First match per name
+            keep = np.r_[True, names[1:] != names[:-1]]
+            found_rows.append(names[keep] + start)
+            found.extend(m for m, kept in zip(matches, keep.tolist()) if kept)
+        rows = np.concatenate(found_rows) if found_rows else np.empty(0, np.int64)
+        alive = self.alive[rows]
+        return rows[alive], [m for m, live in zip(found, alive.tolist()) if live]
+
+    @staticmethod
+    def _search_by_name(pattern, text, offsets):
+        """(name number, match) for each name in a newline-joined chunk, never matching across names."""
+        hits, pos, count = [], 0, len(offsets) - 1
+        while pos < len(text):
+            m = pattern.search(text, pos)
+            if m is None:
+                break
+            i = int(np.searchsorted(offsets, m.start(), side="right")) - 1
+            if i >= count:
+                break
+            end = int(offsets[i + 1]) - 1
+            if m.end() > end:
+                # Crossed the newline: retry with the search confined to name i
+                m = pattern.search(text, int(offsets[i]), end)
+            if m is not None:
+                hits.append((i, m))
+            pos = end + 1
+        return hits
+
+    def name(self, row):
+        k = bisect.bisect_right(self._chunk_starts, row) - 1
+        blob, offsets = self._chunks[k]
+        i = row - self._chunk_starts[k]
+        return blob[offsets[i]:offsets[i + 1] - 1]
+
+    def names(self, rows):
+        """Names of many rows at once: each chunk they touch is split once rather than sliced per row."""
+        rows = np.asarray(rows, np.int64)
+        chunks = np.searchsorted(self._chunk_starts, rows, "right") - 1
+        order = np.argsort(chunks, kind="stable")
+        bounds = np.flatnonzero(np.diff(chunks[order])) + 1
+        result = np.empty(len(rows), object)
+        for positions in np.split(order, bounds) if len(rows) else ():
+            k = int(chunks[positions[0]])
+            split = self._chunks[k][0][:-1].split("/")
+            result[positions] = [split[i] for i in (rows[positions] - self._chunk_starts[k]).tolist()]
+        return result.tolist()
+
+    def path(self, row):
+        return os.path.join(self.folders.values[self.folder[row]], self.name(row))
+
+    def creator_name(self, row):
+        code = self.creator[row]
+        return self.creators.values[code] if code >= 0 else ""
+
+    def category_name(self, row):
+        return self.categories.values[self.category[row]]
+
+    def destination_name(self, row):
+        """Folder (relative to the organize root) the row is filed under: its rendered destination or its category."""
+        code = self.destination[row]
+        return self.destinations.values[code] if code >= 0 else self.category_name(row)
+
+    def ext_name(self, row):
+        return self.extensions.values[self.ext[row]]
+
+    def iter_files(self, rows):
+        """Yield (folder, name, destination) for each row, the shape plan_moves expects."""
+        folders, categories, destinations = self.folders.values, self.categories.values, self.destinations.values
+        folder_codes, category_codes, destination_codes = self.folder, self.category, self.destination
+        for row in rows:
+            row = int(row)
+            code = destination_codes[row]
+            yield (folders[folder_codes[row]], self.name(row),
+                   destinations[code] if code >= 0 else categories[category_codes[row]])
+
+    def record(self, row):
+        return {
+            "name": self.name(row),
+            "size": int(self.size[row]),
+            "type": self.category_name(row),
+            "ext": self.ext_name(row),
+            "mtime": int(self.mtime[row]),
+            "path": self.path(row),
+            "year": int(self.year[row]) or None,
+            "creator": self.creator_name(row) or None,
+        }
+
+    def reclassify(self, classifier):
+        """Recompute every row's category: a table lookup per extension plus one regex pass per name chunk."""
+        n = self._count
+        if not n:
+            return
+        with PROFILER.span("reclassify", files=n):
+            self._reclassify(classifier)
+
+    def _reclassify(self, classifier):
+        n = self._count
+        ext_codes = np.array([self.categories.code(classifier.category_for_ext(e)) for e in self.extensions.values], np.int16)
+        categories = ext_codes[self.ext]
+        # Earlier metadata rules win over later ones, and filename rules over both
+        for field, text, target in reversed(classifier.meta_rules):
+            categories[self.meta_matches(field, text)] = self.categories.code(target)
+        for start, (blob, offsets) in zip(self._chunk_starts, self._chunks):
+            for row, category in classifier.match_rules(blob, offsets):
+                categories[start + row] = self.categories.code(category)
+        # Every row is rendered again, so destinations of the old rules can go
+        self.destinations = StringTable()
+        destinations = np.full(n, -1, np.int32)
+        if classifier.program:
+            with PROFILER.span("rules", rules=len(classifier.program.rules)):
+                classifier.program.apply(self, categories, destinations)
+        self._arrays["category"][:n] = categories
+        self._arrays["destination"][:n] = destinations
+        self.generation += 1
+
+    def apply_rules(self, program, rows):
+        """Run a RuleProgram over rows only, which must hold the categories the classifier gave
+        them (as after append_batch or update); the rest of the index is left alone."""
+        rows = np.asarray(rows, np.int64)
+        if not program or not len(rows):
+            return
+        with PROFILER.span("rules", rules=len(program.rules), files=len(rows)):
+            program.apply(self, self.category, self.destination, rows)
+        self.generation += 1
+
+    def meta_matches(self, field, text):
+        """Boolean mask of rows whose year equals text or whose creator contains it (case-insensitive)."""
+        if field == "year":
+            return self.year == int(text) if text.strip().isdigit() else np.zeros(self._count, np.bool_)
+        text = text.lower()
+        codes = [code for code, value in enumerate(self.creators.values) if text in value.lower()]
+        return np.isin(self.creator, codes)
+
+    def select(self, category=None, min_size=None, max_size=None, min_mtime=None, max_mtime=None,
+               year=None, creator=None, rows=None):
+        """Return the row numbers matching every given bound (sizes in bytes, inclusive)."""
+        if rows is None:
+            rows = np.arange(self._count)
+        mask = self.alive[rows]
+        if year is not None:
+            mask &= self.year[rows] == year
+        if creator is not None:
+            code = self.creators.find(creator)
+            mask &= (self.creator[rows] == code) if code >= 0 else False
+        if category is not None:
+            mask &= self.category[rows] == self.categories.find(category)
+        if min_size is not None or max_size is not None:
+            sizes = self.size[rows]
+            if min_size is not None:
+                mask &= sizes >= min_size
+            if max_size is not None:
+                mask &= sizes <= max_size
+        if min_mtime is not None or max_mtime is not None:
+            mtimes = self.mtime[rows]
+            if min_mtime is not None:
+                mask &= mtimes >= min_mtime
+            if max_mtime is not None:
+                mask &= mtimes <= max_mtime
+        return rows[mask]
+
+    def natural_chunk(self, number):
+        """Natural sort keys for one name chunk, and the chunk's rows (from 0) in key order.
+
+        Keys are casefolded with every digit run zero-padded to 20 places, so plain string
+        comparison puts "file2" before "File10". The whole chunk is split on digit runs in
+        one regex call rather than padding each name separately.
+        """
+        cached = self._natural.get(number)
+        if cached is None:
+            parts = NATURAL_DIGITS.split(self._chunks[number][0][:-1].casefold())
+            parts[1::2] = [digits.zfill(20) for digits in parts[1::2]]
+            keys = "".join(parts).split("/")
+            cached = self._natural[number] = (keys, sorted(range(len(keys)), key=keys.__getitem__))
+        return cached
+
+    def prepare_sort_keys(self):
+        """Compute every chunk's natural name keys now, e.g. on a worker thread before handing the index over."""
+        for number in range(len(self._chunks)):
+            self.natural_chunk(number)
+
+class FilterCache:
+    """Answers the sidebar's Type/Size/Modified filters over a FileIndex.
+
+    Every row gets one precomputed code combining its category with its size and age
+    buckets (see filters.filter_buckets), so a filter is a lookup table over codes and
+    evaluating it is a single gather. Results are kept per (type, size, date) choice; a
+    choice whose table is covered by a cached one, such as "Today" after "Last 7 Days",
+    refines that smaller result instead of scanning every row. Appended rows extend the
+    codes and cached results in place; any other change to the index, or a new day
+    shifting the age buckets, starts over.
+    """
+    def __init__(self, index, max_entries=16):
+        self.index = index
+        self.max_entries = max_entries
+        self._codes = np.empty(0, np.int32)
+        self._results = OrderedDict()
+        self._generation = None
+        self._day = None
+
+    def _compute(self, start, end):
+        index = self.index
+        sizes = np.searchsorted(self._size_edges, index.size[start:end], side="right")
+        ages = np.searchsorted(self._mtime_edges, index.mtime[start:end], side="right")
+        codes = (index.category[start:end].astype(np.int32) * self._size_buckets + sizes) * self._age_buckets + ages
+        codes[~index.alive[start:end]] = -1  # the last table entry, always False
+        return codes.astype(np.int32)
+
+    def _refresh(self, now):
+        index = self.index
+        day = int(now // DAY) if now is not None else int(time.time() // DAY)
+        if index.generation != self._generation or day != self._day:
+            size_edges, self._size_allowed, mtime_edges, self._mtime_allowed = filter_buckets(now)
+            self._size_edges = np.array(size_edges, np.int64)
+            self._mtime_edges = np.array(mtime_edges, np.int64)
+            self._size_buckets = len(size_edges) + 1
+            self._age_buckets = len(mtime_edges) + 1
+            self._codes = self._compute(0, len(index))
+            self._results.clear()
+            self._generation, self._day = index.generation, day
+        elif len(self._codes) < len(index):
+            start = len(self._codes)
+            fresh = self._compute(start, len(index))
+            self._codes = np.concatenate((self._codes, fresh))
+            for key, rows in self._results.items():
+                self._results[key] = np.concatenate((rows, start + np.flatnonzero(self._table(*key)[fresh])))
+
+    def _table(self, type_val, size_val, date_val):
+        categories = len(self.index.categories)
+        if type_val == "All":
+            category_ok = np.ones(categories, np.bool_)
+        else:
+            category_ok = np.arange(categories) == self.index.categories.find(type_val)
+        size_ok = np.zeros(self._size_buckets, np.bool_)
+        size_ok[self._size_allowed[size_val]] = True
+        age_ok = np.zeros(self._age_buckets, np.bool_)
+        age_ok[self._mtime_allowed[date_val]] = True
+        table = category_ok[:, None, None] & size_ok[None, :, None] & age_ok[None, None, :]
+        return np.append(table.ravel(), False)
+
+    def select(self, type_val="All", size_val="All", date_val="All", rows=None, now=None):
+        """Rows passing the filters, in index order; among rows if given (not cached)."""
+        self._refresh(now)
+        key = (type_val, size_val, date_val)
+        table = self._table(*key)
+        if rows is not None:
+            return rows[table[self._codes[rows]]]
+        result = self._results.get(key)
+        if result is not None:
+            PROFILER.count("filter_cache.hits")
+            self._results.move_to_end(key)
+            return result
+        PROFILER.count("filter_cache.misses")
+        # Refine the smallest cached result whose filter lets through everything this one does
+        base = None
+        for cached_key, cached in self._results.items():
+            if (base is None or len(cached) < len(base)) and not np.any(table & ~self._table(*cached_key)):
+                base = cached
+        if base is None:
+            result = np.flatnonzero(table[self._codes])
+        else:
+            result = base[table[self._codes[base]]]
+        self._results[key] = result
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return result
+
+class SortCache:
+    """Sorted views of FileIndex rows by one or more columns.
+
+    A stable permutation of every row is computed once per column and kept until the
+    index changes, so sorting a filtered subset is a gather through that permutation
+    rather than a sort, and flipping the direction of a sort reverses a cached result
+    instead of sorting again. Multi-column sorts lexsort per-column dense ranks (equal
+    keys share a rank) and are cached per column/direction combination. Names sort
+    naturally and case-insensitively (see FileIndex.natural_chunk); their order only
+    depends on the names, so appended rows are merged into it rather than starting over.
+    """
+    columns = ("name", "size", "type", "mtime")
+
+    def __init__(self, index, max_entries=8):
+        self.index = index
+        self.max_entries = max_entries
+        self._generation = None
+        self._count = 0
+        self._orders = {}  # column -> permutation of every row
+        self._ranks = {}  # column -> dense rank of every row
+        self._results = OrderedDict()  # ((column, reverse), ...) -> permutation of every row
+        self._positions = None  # the last permutation used for a small subset, and its inverse
+        self._name_keys = []
+        self._name_order = []
+        self._name_chunks = 0
+
+    def _refresh(self):
+        index = self.index
+        if index.generation != self._generation or len(index) != self._count:
+            self._orders = {}
+            self._ranks = {}
+            self._results.clear()
+            self._positions = None
+            self._generation, self._count = index.generation, len(index)
+
+    def _name_permutation(self):
+        index = self.index
+        runs = []
+        for number in range(self._name_chunks, len(index._chunks)):
+            keys, local_order = index.natural_chunk(number)
+            start = len(self._name_keys)
+            self._name_keys.extend(keys)
+            runs.extend([start + i for i in local_order])
+        self._name_chunks = len(index._chunks)
+        if runs:
+            # The existing order and each chunk are already sorted runs, which Timsort just merges
+            self._name_order = sorted(self._name_order + runs, key=self._name_keys.__getitem__)
+        return np.array(self._name_order, np.int64)
+
+    def _values(self, column):
+        index = self.index
+        if column == "type":
+            names = index.categories.values
+            rank = np.empty(len(names), np.int64)
+            rank[sorted(range(len(names)), key=names.__getitem__)] = np.arange(len(names))
+            return rank[index.category]
+        return getattr(index, column)
+
+    def order(self, column):
+        """Stable permutation of every row by column, ascending."""
+        self._refresh()
+        order = self._orders.get(column)
+        if order is None:
+            with PROFILER.span("sort_keys", column=column, rows=len(self.index)):
+                if column == "name":
+                    order = self._name_permutation()
+                else:
+                    order = np.argsort(self._values(column), kind="stable")
+            self._orders[column] = order
+        return order
+
+    def ranks(self, column):
+        """Dense rank of every row by column: 0 for the smallest key, equal keys share a rank."""
+        ranks = self._ranks.get(column)
+        if ranks is None:
+            order = self.order(column)
+            if column == "name":
+                keys = self._name_keys
+                ordered = np.array([keys[i] for i in order.tolist()], dtype=object)
+                changed = ordered[1:] != ordered[:-1]
+            else:
+                ordered = self._values(column)[order]
+                changed = ordered[1:] != ordered[:-1]
+            ranks = np.empty(len(order), np.int64)
+            ranks[order] = np.concatenate(([0], np.cumsum(changed)))
+            self._ranks[column] = ranks
+        return ranks
+
+    def _permutation(self, spec):
+        if len(spec) == 1:
+            return self.order(spec[0][0])
+        cached = self._results.get(spec)
+        if cached is not None:
+            self._results.move_to_end(spec)
+            return cached
+        # np.lexsort sorts by its last key first; negating a rank reverses just that column
+        keys = [-self.ranks(column) if reverse else self.ranks(column) for column, reverse in reversed(spec)]
+        result = np.lexsort(keys)
+        self._results[spec] = result
+        if len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+        return result
+
+    def sort(self, rows, spec):
+        """rows sorted by spec, a sequence of (column, reverse) pairs, most significant first."""
+        spec = tuple((column, bool(reverse)) for column, reverse in spec)
+        if not spec:
+            return rows
+        self._refresh()
+        n = len(self.index)
+        with PROFILER.span("sort", spec=str(spec), rows=len(rows)):
+            flipped = tuple((column, not reverse) for column, reverse in spec)
+            if len(spec) == 1 and spec[0][1]:
+                permutation, backwards = self._permutation(flipped), True
+            elif len(spec) > 1 and flipped in self._results:
+                permutation, backwards = self._permutation(flipped), True
+            else:
+                permutation, backwards = self._permutation(spec), False
+            if len(rows) * 16 < n:
+                # A handful of rows: sorting them by their place in the permutation is cheaper
+                if self._positions is None or self._positions[0] is not permutation:
+                    inverse = np.empty(n, np.int64)
+                    inverse[permutation] = np.arange(n)
+                    self._positions = (permutation, inverse)
+                result = rows[np.argsort(self._positions[1][rows])]
+            else:
+                wanted = np.zeros(n, np.bool_)
+                wanted[rows] = True
+                result = permutation[wanted[permutation]]
+            return result[::-1] if backwards else result
@@ -0,0 +1,265 @@
+"""Embedded metadata (EXIF, ID3, MP4) read from file headers.
+
+Extractors are registered per extension and return a dict using a small common
+vocabulary: "year", "taken" (seconds since the epoch), "creator" (camera model or
+artist), "album", "title", "duration" (seconds), "width" and "height". Each reads only
+the bytes it needs: Pillow parses just the image header, ID3 tags sit at the start (or
+last 128 bytes) of the file, and MP4 readers seek from atom header to atom header until
+they reach "moov". Results are cached by path, mtime and size; misses are extracted in a
+process pool so parsing never competes for the GIL and disk bandwidth is the limit.
+"""
+import json
+import os
+import sqlite3
+import struct
+import time
+from .classify import file_ext
+from .common import MB, app_cache_dir, process_pool
+from .profiling import PROFILER
+
+EXTRACTORS = {}
+MP4_EPOCH_OFFSET = 2082844800  # seconds from 1904-01-01 to 1970-01-01
+
+def register(*exts):
+    """Decorator registering fn(path) -> dict as the metadata extractor for exts."""
+    def decorate(fn):
+        for ext in exts:
+            EXTRACTORS[ext] = fn
+        return fn
+    return decorate
+
+def _parse_date(text):
+    """Seconds since the epoch for EXIF-style "YYYY:MM:DD HH:MM:SS" or ISO "YYYY-MM-DD..." text."""
+    text = text.strip().replace("-", ":").replace("T", " ")
+    for fmt, length in (("%Y:%m:%d %H:%M:%S", 19), ("%Y:%m:%d", 10), ("%Y", 4)):
+        try:
+            return int(time.mktime(time.strptime(text[:length], fmt)))
+        except (ValueError, OverflowError):
+            continue
+    return None
+
+def _with_year(meta, date_text=None):
+    if date_text:
+        taken = _parse_date(date_text)
+        if taken is not None:
+            meta["taken"] = taken
+        year = date_text.strip()[:4]
+        if year.isdigit():
+            meta["year"] = int(year)
+    return meta
+
+@register(".jpg", ".jpeg", ".tiff", ".tif", ".png", ".webp", ".heic")
+def image_metadata(path):
+    from PIL import Image
+    with Image.open(path) as image:
+        meta = {"width": image.size[0], "height": image.size[1]}
+        exif = image.getexif()
+    # DateTimeOriginal lives in the Exif sub-IFD; fall back to the IFD0 DateTime
+    taken = exif.get_ifd(0x8769).get(36867) or exif.get(306)
+    make, model = (exif.get(271) or "").strip(" \0"), (exif.get(272) or "").strip(" \0")
+    if model:
+        meta["creator"] = model if not make or model.startswith(make) else f"{make} {model}"
+    return _with_year(meta, taken if isinstance(taken, str) else None)
+
+def _syncsafe(raw):
+    # ID3 sizes use 7 bits per byte so they never contain a false frame sync
+    return (raw[0] << 21) | (raw[1] << 14) | (raw[2] << 7) | raw[3]
+
+def _id3_text(frame):
+    encoding, data = frame[0], frame[1:]
+    codec = ("latin-1", "utf-16", "utf-16-be", "utf-8")[encoding] if encoding < 4 else "latin-1"
+    text = data.decode(codec, "replace")
+    return text.split("\0")[0].strip()
+
+@register(".mp3")
+def id3_metadata(path):
+    frames = {}
+    with open(path, "rb") as f:
+        header = f.read(10)
+        if len(header) == 10 and header[:3] == b"ID3":
+            major, flags = header[3], header[5]
+            tag = f.read(_syncsafe(header[6:10]))
+            pos = 0
+            if flags & 0x40 and major >= 3:
+                # Skip the extended header; its v2.3 size leaves out the size field itself
+                pos = _syncsafe(tag) if major == 4 else 4 + struct.unpack(">I", tag[:4])[0]
+            id_len, header_len = (3, 6) if major == 2 else (4, 10)
+            while pos + header_len <= len(tag) and tag[pos] != 0:
+                frame_id = tag[pos:pos + id_len].decode("latin-1")
+                raw = tag[pos + id_len:pos + id_len + (3 if major == 2 else 4)]
+                if major == 2:
+                    frame_size = int.from_bytes(raw, "big")
+                elif major == 4:
+                    frame_size = _syncsafe(raw)
+                else:
+                    frame_size = struct.unpack(">I", raw)[0]
+                body = tag[pos + header_len:pos + header_len + frame_size]
+                if frame_id.startswith("T") and body:
+                    frames[frame_id] = _id3_text(body)
+                pos += header_len + frame_size
+        if not frames:
+            # ID3v1: a fixed 128-byte block at the very end
+            f.seek(0, os.SEEK_END)
+            if f.tell() >= 128:
+                f.seek(-128, os.SEEK_END)
+                block = f.read(128)
+                if block[:3] == b"TAG":
+                    field = lambda a, b: block[a:b].split(b"\0")[0].decode("latin-1").strip()
+                    frames = {"TIT2": field(3, 33), "TPE1": field(33, 63), "TALB": field(63, 93), "TYER": field(93, 97)}
+    meta = {}
+    for key, frame_ids in (("title", ("TIT2", "TT2")), ("creator", ("TPE1", "TP1")), ("album", ("TALB", "TAL"))):
+        value = next((frames[i] for i in frame_ids if frames.get(i)), None)
+        if value:
+            meta[key] = value
+    return _with_year(meta, frames.get("TDRC") or frames.get("TYER") or frames.get("TYE"))
+
+def _atoms(data, start=0, end=None):
+    """Yield (type, body_start, body_end) for the atoms in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", data[pos + 8:pos + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield kind, pos + header, min(pos + size, end)
+        pos += size
+
+def _find_moov(f, max_bytes=64 * MB):
+    """Seek from top-level atom header to header until "moov" and return its body."""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, kind = struct.unpack(">I4s", header[:8])
+        header_len = 8
+        if size == 1:
+            size, header_len = struct.unpack(">Q", header[8:16])[0], 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_len:
+            return None
+        if kind == b"moov":
+            if size > max_bytes:
+                return None
+            f.seek(pos + header_len)
+            return f.read(size - header_len)
+        pos += size
+    return None
+
+@register(".mp4", ".m4a", ".m4v", ".mov")
+def mp4_metadata(path):
+    with open(path, "rb") as f:
+        moov = _find_moov(f)
+    if moov is None:
+        return {}
+    meta = {}
+    for kind, start, end in _atoms(moov):
+        if kind == b"mvhd":
+            version = moov[start]
+            if version == 1:
+                created, _, timescale, duration = struct.unpack(">QQIQ", moov[start + 4:start + 32])
+            else:
+                created, _, timescale, duration = struct.unpack(">IIII", moov[start + 4:start + 20])
+            if created > MP4_EPOCH_OFFSET:
+                meta["taken"] = created - MP4_EPOCH_OFFSET
+                meta["year"] = time.localtime(meta["taken"]).tm_year
+            if timescale:
+                meta["duration"] = round(duration / timescale, 1)
+        elif kind == b"trak":
+            for child, cstart, cend in _atoms(moov, start, end):
+                if child == b"tkhd" and cend - cstart >= 8:
+                    width, height = struct.unpack(">II", moov[cend - 8:cend])
+                    if width and height:
+                        meta["width"], meta["height"] = width >> 16, height >> 16
+        elif kind == b"udta":
+            for child, cstart, cend in _atoms(moov, start, end):
+                if child != b"meta":
+                    continue
+                # "meta" is a full atom: 4 bytes of version and flags before its children
+                for ilst, istart, iend in _atoms(moov, cstart + 4, cend):
+                    if ilst != b"ilst":
+                        continue
+                    for item, tstart, tend in _atoms(moov, istart, iend):
+                        for data, dstart, dend in _atoms(moov, tstart, tend):
+                            if data == b"data":
+                                value = moov[dstart + 8:dend].decode("utf-8", "replace").strip()
+                                field = {b"\xa9ART": "creator", b"\xa9alb": "album", b"\xa9nam": "title",
+                                         b"\xa9day": "date"}.get(item)
+                                if field and value:
+                                    meta[field] = value
+    date = meta.pop("date", None)
+    if date:
+        meta.pop("taken", None)
+        _with_year(meta, date)
+    return meta
+
+def extract_metadata(path):
+    """Metadata dict for path, {} when its type has no extractor or the header is unreadable."""
+    extractor = EXTRACTORS.get(file_ext(path))
+    if extractor is None:
+        return {}
+    try:
+        return extractor(path)
+    except Exception:
+        # Truncated or malformed headers just mean no metadata
+        return {}
+
+class MetadataCache:
+    """SQLite cache of extracted metadata keyed by path, mtime and size."""
+    schema = "CREATE TABLE IF NOT EXISTS meta (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, data TEXT)"
+
+    def __init__(self, path=None, workers=None):
+        if path is None:
+            path = os.path.join(app_cache_dir(), "metadata_cache.sqlite3")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.workers = workers
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(self.schema)
+
+    def close(self):
+        self.conn.close()
+
+    def extract(self, files, batch_size=256, is_cancelled=None):
+        """Yield (start, [meta dict]) for successive batches of (path, size, mtime)."""
+        pool = None
+        try:
+            for start in range(0, len(files), batch_size):
+                if is_cancelled is not None and is_cancelled():
+                    return
+                batch = files[start:start + batch_size]
+                result = [None] * len(batch)
+                missing = []
+                for i, (path, size, mtime) in enumerate(batch):
+                    row = self.conn.execute("SELECT mtime, size, data FROM meta WHERE path = ?", (path,)).fetchone()
+                    if row is not None and row[0] == mtime and row[1] == size:
+                        result[i] = json.loads(row[2])
+                    elif file_ext(path) in EXTRACTORS:
+                        missing.append(i)
+                    else:
+                        result[i] = {}
+                PROFILER.count("metadata_cache.hits", len(batch) - len(missing))
+                PROFILER.count("metadata_cache.misses", len(missing))
+                if missing:
+                    if pool is None:
+                        pool = process_pool(self.workers)
+                    paths = [batch[i][0] for i in missing]
+                    for i, meta in zip(missing, pool.map(extract_metadata, paths, chunksize=16)):
+                        result[i] = meta
+                    with self.conn:
+                        self.conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?, ?, ?)",
+                                              [(batch[i][0], batch[i][2], batch[i][1], json.dumps(result[i]))
+                                               for i in missing])
+                yield start, result
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
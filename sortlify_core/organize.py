@@ -0,0 +1,261 @@
+"""Planning and executing journaled moves into category folders."""
+import errno
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from .common import MB, app_cache_dir
+
+def unique_name(name, taken):
+    """Return name, or "stem (n).ext", so that it doesn't collide with anything in taken.
+
+    taken holds names already present in (or planned for) the destination folder and is
+    compared case-insensitively on platforms whose filesystems usually are.
+    """
+    fold = str.casefold if sys.platform in ("win32", "darwin") else str
+    if fold(name) not in taken:
+        return name
+    stem, ext = os.path.splitext(name)
+    n = 1
+    while fold(f"{stem} ({n}){ext}") in taken:
+        n += 1
+    return f"{stem} ({n}){ext}"
+
+def plan_moves(files, root):
+    """Plan (src, dst) moves of (folder, name, category) tuples into root/<category>/.
+
+    Files already in their category folder are skipped. Each destination folder is listed
+    once and collisions are resolved against that listing plus the plan itself, so no
+    per-file existence checks are needed.
+    """
+    fold = str.casefold if sys.platform in ("win32", "darwin") else str
+    taken = {}
+    moves = []
+    for folder, src_name, category in files:
+        dst_dir = os.path.join(root, category)
+        if folder == dst_dir:
+            continue
+        names = taken.get(dst_dir)
+        if names is None:
+            try:
+                names = {fold(n) for n in os.listdir(dst_dir)}
+            except OSError:
+                names = set()
+            taken[dst_dir] = names
+        dst_name = unique_name(src_name, names)
+        names.add(fold(dst_name))
+        moves.append((os.path.join(folder, src_name), os.path.join(dst_dir, dst_name)))
+    return moves
+
+def copy_file(src, dst, buffer_size=4 * MB):
+    """Copy file contents, in-kernel with copy_file_range where available."""
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        if hasattr(os, "copy_file_range"):
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), buffer_size * 16):
+                    pass
+                return
+            except OSError:
+                # Unsupported for this pair of filesystems; restart with a plain copy
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        shutil.copyfileobj(fsrc, fdst, buffer_size)
+
+class Organizer:
+    """Executes a list of moves with a JSON-lines journal so a run can be resumed or rolled back.
+
+    The journal holds a header, one line per planned move, then a "done" line per finished
+    move, written as soon as that file has moved. Moves within one device are plain
+    renames; moves across devices are copied to a temporary name, renamed into place and
+    only then removed from the source. Work is spread over a thread pool in chunks of
+    moves sharing a destination folder.
+    """
+    part_suffix = ".sortlify-part"
+    journal_prefix = "organize"
+
+    def __init__(self, journal_path, root, moves, done=(), workers=8, chunk_size=256):
+        self.journal_path = journal_path
+        self.root = root
+        self.moves = moves
+        self.done = set(done)
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._journal = None
+
+    @staticmethod
+    def journal_dir():
+        return os.path.join(app_cache_dir(), "journals")
+
+    @classmethod
+    def create(cls, root, moves, journal_dir=None, **kwargs):
+        journal_dir = journal_dir or cls.journal_dir()
+        os.makedirs(journal_dir, exist_ok=True)
+        path = os.path.join(journal_dir, f"{cls.journal_prefix}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"root": root, "created": time.time(), "count": len(moves)}) + "\n")
+            for src, dst in moves:
+                f.write(json.dumps({"src": src, "dst": dst}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return cls(path, root, moves, **kwargs)
+
+    @classmethod
+    def load(cls, journal_path, **kwargs):
+        moves, done = [], set()
+        root = None
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break  # torn final line from a crash
+                if "src" in entry:
+                    moves.append((entry["src"], entry["dst"]))
+                elif "done" in entry:
+                    done.add(entry["done"])
+                elif "undone" in entry:
+                    done.discard(entry["undone"])
+                elif "root" in entry:
+                    root = entry["root"]
+        return cls(journal_path, root, moves, done, **kwargs)
+
+    @staticmethod
+    def journal_root(journal_path):
+        """The root recorded in a journal's header, or None if it can't be read."""
+        try:
+            with open(journal_path, encoding="utf-8") as f:
+                return json.loads(f.readline()).get("root")
+        except (OSError, ValueError, AttributeError):
+            return None
+
+    @classmethod
+    def unfinished(cls, root=None, journal_dir=None):
+        """Journals of this kind of run that crashed or were cancelled, newest first."""
+        journal_dir = journal_dir or cls.journal_dir()
+        try:
+            names = sorted((n for n in os.listdir(journal_dir)
+                            if n.startswith(cls.journal_prefix + "-") and n.endswith(".jsonl")), reverse=True)
+        except OSError:
+            return []
+        found = []
+        for name in names:
+            path = os.path.join(journal_dir, name)
+            journal_root = cls.journal_root(path)
+            if journal_root is not None and (root is None or journal_root == root):
+                found.append(path)
+        return found
+
+    def _move(self, src, dst):
+        if not os.path.lexists(src) and os.path.lexists(dst):
+            return  # moved by an earlier run that died before journaling it
+        if os.path.lexists(dst):
+            raise FileExistsError(f"{dst} already exists")
+        try:
+            os.rename(src, dst)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        part = dst + self.part_suffix
+        try:
+            copy_file(src, part)
+            shutil.copystat(src, part)
+            os.replace(part, dst)
+        except BaseException:
+            if os.path.lexists(part):
+                os.unlink(part)
+            raise
+        os.unlink(src)
+
+    def _run_chunk(self, chunk, reverse, is_cancelled, record):
+        errors = []
+        for i in chunk:
+            if is_cancelled is not None and is_cancelled():
+                break
+            src, dst = self.moves[i]
+            if reverse:
+                src, dst = dst, src
+            try:
+                self._move(src, dst)
+            except OSError as e:
+                errors.append(f"{src}: {e.strerror or e}")
+                continue
+            record(i)
+        return errors
+
+    def _execute(self, indices, reverse, progress, is_cancelled):
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        # Group by destination folder so each folder is created once and chunks stay local
+        by_dir = {}
+        for i in indices:
+            dst = self.moves[i][0 if reverse else 1]
+            by_dir.setdefault(os.path.dirname(dst), []).append(i)
+        chunks = []
+        for folder, group in by_dir.items():
+            try:
+                os.makedirs(folder, exist_ok=True)
+            except OSError:
+                pass
+            chunks.extend(group[k:k + self.chunk_size] for k in range(0, len(group), self.chunk_size))
+        completed, errors = [], []
+        key = "undone" if reverse else "done"
+        lock = threading.Lock()
+        with open(self.journal_path, "a", encoding="utf-8") as journal, \
+                ThreadPoolExecutor(max_workers=self.workers) as pool:
+            def record(i):
+                # Journaled the moment the file has moved, so a crash can't leave moved files unrecorded
+                with lock:
+                    journal.write(json.dumps({key: i}) + "\n")
+                    journal.flush()
+                    if reverse:
+                        self.done.discard(i)
+                    else:
+                        self.done.add(i)
+                    completed.append(i)
+            futures = [pool.submit(self._run_chunk, chunk, reverse, is_cancelled, record) for chunk in chunks]
+            for future in as_completed(futures):
+                errors.extend(future.result())
+                if progress is not None:
+                    progress(len(completed), len(indices), len(errors))
+            os.fsync(journal.fileno())
+        return len(completed), errors
+
+    def _close_journal(self, suffix):
+        try:
+            os.replace(self.journal_path, self.journal_path + suffix)
+            self.journal_path += suffix
+        except OSError:
+            pass
+
+    def run(self, progress=None, is_cancelled=None):
+        """Perform every move not yet journaled as done; returns (moved, errors).
+
+        Unless cancelled, the journal is closed as ".done" afterwards even if some moves
+        failed (it then ends with an {"errors": n} line): retrying a vanished or locked file
+        on every later run would only fail the same way, and rollback still works.
+        """
+        todo = [i for i in range(len(self.moves)) if i not in self.done]
+        moved, errors = self._execute(todo, False, progress, is_cancelled)
+        if len(self.done) == len(self.moves) or not (is_cancelled is not None and is_cancelled()):
+            if errors:
+                try:
+                    with open(self.journal_path, "a", encoding="utf-8") as journal:
+                        journal.write(json.dumps({"errors": len(errors)}) + "\n")
+                except OSError:
+                    pass
+            self._close_journal(".done")
+        return moved, errors
+
+    def abandon(self):
+        """Give up on an unfinished run without resuming or undoing it, so it isn't offered again."""
+        self._close_journal(".abandoned")
+
+    def rollback(self, progress=None, is_cancelled=None):
+        """Move every journaled file back to where it came from; returns (restored, errors)."""
+        restored, errors = self._execute(sorted(self.done, reverse=True), True, progress, is_cancelled)
+        if not self.done:
+            self._close_journal(".rolledback")
+        return restored, errors
@@ -0,0 +1,224 @@
+"""Opt-in instrumentation: timing spans, counters and GUI stall records.
+
+Code on hot paths wraps work in PROFILER.span("name") and bumps PROFILER.count("name").
+While the profiler is disabled both return after a single attribute check, so the
+instrumentation can stay in place. When enabled, events go to a bounded buffer that
+can be summarized or exported as Chrome trace JSON (chrome://tracing, Perfetto), and
+optionally cProfile data is collected per thread and written as one pstats dump.
+"""
+import json
+import os
+import threading
+import time
+from collections import Counter, deque
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "start")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter_ns()
+        self.profiler._record("X", self.name, self.start, end - self.start, self.args)
+        return False
+
+class Profiler:
+    """Collects spans, counters and stalls while enabled; see the module docstring."""
+    def __init__(self, max_events=500_000):
+        self.enabled = False
+        self.collect_cprofile = False
+        self.events = deque(maxlen=max_events)  # (phase, name, thread id, start ns, duration ns or value, args)
+        self.counters = Counter()
+        self.threads = {}
+        self.started = None
+        self._lock = threading.Lock()
+        self._profiles = []
+        self._main_profile = None
+
+    def enable(self, cprofile=False):
+        """Start a fresh recording; with cprofile, also profile the calling thread and instrumented workers."""
+        self.disable()
+        self.reset()
+        self.collect_cprofile = cprofile
+        self.started = time.perf_counter_ns()
+        if cprofile:
+            self._main_profile = self._start_profile()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._main_profile is not None:
+            self._main_profile.disable()
+            self._profiles.append(self._main_profile)
+            self._main_profile = None
+
+    def reset(self):
+        with self._lock:
+            self.events.clear()
+            self.counters.clear()
+            self.threads.clear()
+            self._profiles = []
+            self.started = time.perf_counter_ns()
+
+    def _record(self, phase, name, start, value, args=None):
+        ident = threading.get_ident()
+        if ident not in self.threads:
+            self.threads[ident] = threading.current_thread().name
+        self.events.append((phase, name, ident, start, value, args))
+
+    def span(self, name, **args):
+        """Context manager timing the enclosed block; args end up in the trace."""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] += n
+
+    def gauge(self, name, value):
+        """Record the current value of something that goes up and down, such as queued jobs."""
+        if self.enabled:
+            self._record("C", name, time.perf_counter_ns(), value)
+
+    def stall(self, start_ns, duration_ns):
+        """Record that the GUI thread didn't run its event loop for duration_ns from start_ns."""
+        if self.enabled:
+            self._record("X", "GUI stall", start_ns, duration_ns, {"stall": True})
+
+    def _start_profile(self):
+        import cProfile  # only when asked for; it and pstats stay out of startup
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from one active profiler
+            return None
+        return profile
+
+    def thread_profile(self):
+        """Context manager for a worker thread's run(): collects its cProfile data when asked to."""
+        if not (self.enabled and self.collect_cprofile):
+            return NULL_SPAN
+        return _ThreadProfile(self)
+
+    def summary(self):
+        """Per-span count/total/mean/max in ms, counters, stalls and files per second of scanning."""
+        spans = {}
+        stalls = []
+        for phase, name, _, _, value, args in list(self.events):
+            if phase != "X":
+                continue
+            if args and args.get("stall"):
+                stalls.append(value)
+                continue
+            stat = spans.setdefault(name, [0, 0, 0])
+            stat[0] += 1
+            stat[1] += value
+            stat[2] = max(stat[2], value)
+        result = {
+            "spans": {name: {"count": n, "total_ms": total / 1e6, "mean_ms": total / n / 1e6, "max_ms": worst / 1e6}
+                      for name, (n, total, worst) in sorted(spans.items(), key=lambda item: -item[1][1])},
+            "counters": dict(sorted(self.counters.items())),
+            "stalls": {"count": len(stalls), "total_ms": sum(stalls) / 1e6, "max_ms": max(stalls, default=0) / 1e6},
+        }
+        scan = spans.get("scan")
+        if scan and scan[1] and self.counters.get("files"):
+            result["files_per_sec"] = self.counters["files"] / (scan[1] / 1e9)
+        return result
+
+    def report(self):
+        """The summary as plain text, one line per span and counter."""
+        summary = self.summary()
+        lines = [f"{'Span':<20}{'Count':>8}{'Total ms':>12}{'Mean ms':>10}{'Max ms':>10}"]
+        for name, s in summary["spans"].items():
+            lines.append(f"{name:<20}{s['count']:>8}{s['total_ms']:>12.1f}{s['mean_ms']:>10.2f}{s['max_ms']:>10.1f}")
+        stalls = summary["stalls"]
+        lines.append("")
+        lines.append(f"GUI stalls: {stalls['count']}, {stalls['total_ms']:.0f} ms in total, longest {stalls['max_ms']:.0f} ms")
+        if "files_per_sec" in summary:
+            lines.append(f"Scanning: {summary['files_per_sec']:,.0f} files/s")
+        if summary["counters"]:
+            lines.append("")
+            lines.extend(f"{name:<32}{value:>12,}" for name, value in summary["counters"].items())
+        return "\n".join(lines)
+
+    def chrome_trace(self):
+        """The recording in Chrome's trace event format."""
+        pid = os.getpid()
+        origin = self.started or 0
+        events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": ident, "args": {"name": name}}
+                  for ident, name in list(self.threads.items())]
+        for phase, name, ident, start, value, args in list(self.events):
+            event = {"name": name, "ph": phase, "pid": pid, "tid": ident, "ts": (start - origin) / 1000}
+            if phase == "X":
+                event["dur"] = value / 1000
+                event["cat"] = "stall" if args and args.get("stall") else "sortlify"
+                if args:
+                    event["args"] = args
+            else:
+                event["args"] = {name: value}
+            events.append(event)
+        counters = [{"name": name, "ph": "C", "pid": pid, "tid": 0, "ts": (time.perf_counter_ns() - origin) / 1000,
+                     "args": {"total": value}} for name, value in sorted(self.counters.items())]
+        return {"traceEvents": events + counters, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f, default=str)
+
+    def export_cprofile(self, path):
+        """Write the collected cProfile data as a pstats dump; False if none was collected."""
+        import pstats
+        profiles = list(self._profiles)
+        if self._main_profile is not None:
+            # Snapshot the running profile without stopping the recording
+            self._main_profile.disable()
+            profiles.append(self._main_profile)
+        try:
+            if not profiles:
+                return False
+            stats = pstats.Stats(profiles[0])
+            for profile in profiles[1:]:
+                stats.add(profile)
+            stats.dump_stats(path)
+            return True
+        finally:
+            if self._main_profile is not None:
+                self._main_profile.enable()
+
+class _ThreadProfile:
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.profile = None
+
+    def __enter__(self):
+        self.profile = self.profiler._start_profile()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profile is not None:
+            self.profile.disable()
+            with self.profiler._lock:
+                self.profiler._profiles.append(self.profile)
+        return False
+
+PROFILER = Profiler()
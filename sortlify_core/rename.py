@@ -0,0 +1,328 @@
+"""Batch renaming from templates such as "{date:%Y-%m-%d}_{counter:04}_{name}{ext}".
+
+Fields:
+    {name}        file name without its extension
+    {ext}         extension including the dot, as it is on disk
+    {date:FMT}    modification time, strftime format (default %Y-%m-%d)
+    {counter:SPEC} position in the selection, from start; format spec such as 04
+    {category}    current category
+    {folder}      name of the containing folder
+    {size}        size in bytes
+Text fields take "lower", "upper" or "title" as their spec, anything else is a
+regular format spec.
+
+A template is rendered for the whole selection at once from FileIndex columns, each
+distinct date or category formatted once. Planning needs no per-file filesystem
+calls: every affected folder is listed once, names the selection is about to vacate
+are freed, and clashes (with other files or within the batch) get a " (n)" suffix.
+Renames within a batch can depend on each other (a -> b while b -> c) or form
+cycles (a <-> b); steps() orders them along those chains and breaks cycles through a
+temporary name. Renamer executes the steps with the organize journal, so a run can be
+resumed or undone.
+"""
+import errno
+import json
+import os
+import re
+import string
+import sys
+import time
+import numpy as np
+from .common import DAY
+from .organize import Organizer, unique_name
+from .rules import UNSAFE
+
+DEFAULT_TEMPLATE = "{date:%Y-%m-%d}_{counter:04}_{name}{ext}"
+FIELDS = {"name", "ext", "date", "counter", "category", "folder", "size"}
+TEXT_CASES = {"lower": str.lower, "upper": str.upper, "title": str.title}
+# Per-row plan status
+UNCHANGED, RENAME, RENUMBERED, INVALID = 0, 1, 2, 3
+STATUS_TEXT = {UNCHANGED: "Unchanged", RENAME: "Rename", RENUMBERED: "Name taken, numbered", INVALID: "Invalid name"}
+# strftime codes that need the time of day, and those that need the actual zone rather than local fields
+TIME_CODES = re.compile(r"%[-_0^#]?[HIklMSpPXcrRT]")
+ZONE_CODES = re.compile(r"%[-_0^#]?[zZs+]")
+
+def _fold():
+    return str.casefold if sys.platform in ("win32", "darwin") else str
+
+class Template:
+    """A parsed rename template; raises ValueError for unknown fields or bad syntax."""
+    def __init__(self, text):
+        self.text = text
+        self.parts = []  # (literal, field or None, spec)
+        for literal, field, spec, conversion in string.Formatter().parse(text):
+            if field is not None and field not in FIELDS:
+                raise ValueError(f"unknown field {{{field}}}; use one of {', '.join(sorted(FIELDS))}")
+            if conversion:
+                raise ValueError(f"conversions like !{conversion} aren't supported")
+            self.parts.append((literal, field, spec or ""))
+        if not any(field for _, field, _ in self.parts):
+            raise ValueError("a template needs at least one field, such as {name}")
+
+    def _column(self, index, rows, names, field, spec, start):
+        """Values of one field for every row, as a list of strings."""
+        if field == "counter":
+            return [format(n, spec) for n in range(start, start + len(rows))]
+        if field == "date":
+            return _dates(index.mtime[rows].astype(np.int64), spec or "%Y-%m-%d")
+        if field == "size":
+            return [format(int(s), spec) for s in index.size[rows].tolist()]
+        if field in ("category", "folder"):
+            codes = index.category[rows] if field == "category" else index.folder[rows]
+            values = index.categories.values if field == "category" else [os.path.basename(f) for f in index.folders.values]
+            used, inverse = np.unique(codes, return_inverse=True)
+            texts = self._text([values[code] for code in used.tolist()], spec)
+            return np.array(texts, object)[inverse.ravel()].tolist()
+        # The index already knows each extension, so its length splits the name without splitext
+        lengths = np.array([len(ext) for ext in index.extensions.values], np.int64)[index.ext[rows]].tolist()
+        if field == "name":
+            return self._text([n[:len(n) - k] for n, k in zip(names, lengths)], spec)
+        return self._text([n[len(n) - k:] for n, k in zip(names, lengths)], spec)
+
+    @staticmethod
+    def _text(values, spec):
+        if not spec:
+            return values
+        case = TEXT_CASES.get(spec)
+        return [case(v) for v in values] if case else [format(v, spec) for v in values]
+
+    def render(self, index, rows, start=1, names=None):
+        """New names for the given FileIndex rows, in order; counters run from start."""
+        if names is None:
+            names = index.names(rows)
+        columns = []
+        for literal, field, spec in self.parts:
+            if literal:
+                columns.append([literal] * len(rows))
+            if field is not None:
+                columns.append(self._column(index, rows, names, field, spec, start))
+        return ["".join(pieces) for pieces in zip(*columns)]
+
+def _local_seconds(mtimes):
+    """Timestamps shifted by the local UTC offset in effect at each, so gmtime() gives local wall-clock fields."""
+    days, inverse = np.unique(mtimes // DAY, return_inverse=True)
+    inverse = inverse.ravel()
+    first = np.array([time.localtime(d * DAY).tm_gmtoff for d in days.tolist()], np.int64)
+    last = np.array([time.localtime(d * DAY + DAY - 1).tm_gmtoff for d in days.tolist()], np.int64)
+    offsets = first[inverse]
+    # Days with a daylight saving change are looked up one timestamp at a time
+    changed = np.flatnonzero((first != last)[inverse])
+    offsets[changed] = [time.localtime(t).tm_gmtoff for t in mtimes[changed].tolist()]
+    return mtimes + offsets
+
+def _dates(mtimes, fmt):
+    """strftime(fmt) of each timestamp in local time, formatting each distinct day (or second) once."""
+    if ZONE_CODES.search(fmt):
+        keys, step = mtimes, None
+    else:
+        # Without time-of-day codes, every file from the same local day gets the same text
+        step = 1 if TIME_CODES.search(fmt) else DAY
+        keys = _local_seconds(mtimes) // step
+    unique, inverse = np.unique(keys, return_inverse=True)
+    if step is None:
+        texts = [time.strftime(fmt, time.localtime(k)) for k in unique.tolist()]
+    else:
+        texts = [time.strftime(fmt, time.gmtime(k * step)) for k in unique.tolist()]
+    return np.array(texts, object)[inverse.ravel()].tolist()
+
+class RenamePlan:
+    """Sources, resolved target names and a status per row of a rename selection."""
+    def __init__(self, folders, names, targets, status):
+        self.folders = folders
+        self.names = names
+        self.targets = targets
+        self.status = status
+
+    def __len__(self):
+        return len(self.names)
+
+    def counts(self):
+        return {STATUS_TEXT[code]: int(n) for code, n in enumerate(np.bincount(self.status, minlength=4)) if n}
+
+    def renames(self):
+        """Indices of the rows that will actually change name."""
+        return np.flatnonzero((self.status == RENAME) | (self.status == RENUMBERED))
+
+    def steps(self):
+        """(src, dst) paths in an order that never overwrites: along chains, with cycles broken by a temporary name."""
+        fold = _fold()
+        changing = self.renames().tolist()
+        owner = {(self.folders[i], fold(self.names[i])): i for i in changing}
+        waiting = {}  # i -> the rename whose target is i's current name, which can run once i has
+        blocked = set()
+        for i in changing:
+            j = owner.get((self.folders[i], fold(self.targets[i])))
+            if j is not None and j != i:
+                waiting[j] = i
+                blocked.add(i)
+        steps, visited = [], set()
+
+        def follow(i):
+            while i is not None and i not in visited:
+                visited.add(i)
+                steps.append((os.path.join(self.folders[i], self.names[i]), os.path.join(self.folders[i], self.targets[i])))
+                i = waiting.get(i)
+        for i in changing:
+            if i not in blocked:
+                follow(i)
+        temps = {}
+        for i in changing:
+            if i in visited:
+                continue
+            # Every rename left waits on another: a cycle. Park one file, run the rest, then finish it
+            folder = self.folders[i]
+            taken = temps.get(folder)
+            if taken is None:
+                members = [k for k, f in enumerate(self.folders) if f == folder]
+                taken = temps[folder] = {fold(self.names[k]) for k in members} | {fold(self.targets[k]) for k in members}
+            temp = unique_name(f".{self.names[i]}.sortlify-rename", taken)
+            taken.add(fold(temp))
+            steps.append((os.path.join(folder, self.names[i]), os.path.join(folder, temp)))
+            visited.add(i)
+            follow(waiting.get(i))
+            steps.append((os.path.join(folder, temp), os.path.join(folder, self.targets[i])))
+        return steps
+
+def plan_renames(index, rows, template, start=1, listings=None):
+    """Plan renaming FileIndex rows (in order) by template, a Template or its text.
+
+    listings maps folder -> names already in it and is filled in (one os.listdir per
+    folder) for folders it doesn't have, so a preview can pass the same dict again.
+    """
+    if not isinstance(template, Template):
+        template = Template(template)
+    fold = _fold()
+    listings = {} if listings is None else listings
+    rows = np.asarray(rows, np.int64)
+    names = index.names(rows)
+    codes = index.folder[rows]
+    folders = [index.folders.values[code] for code in codes.tolist()]
+    targets = template.render(index, rows, start, names)
+    status = np.full(len(rows), RENAME, np.int8)
+    # Usually no target has an unsafe character, and one search over all of them shows it
+    unsafe = UNSAFE.search("".join(targets)) is not None
+    for i, (name, target) in enumerate(zip(names, targets)):
+        if target == name:
+            status[i] = UNCHANGED
+        elif (not target or target in (".", "..") or target[0] == " " or target[-1] == " "
+              or (unsafe and UNSAFE.search(target))):
+            status[i] = INVALID
+            targets[i] = name
+    changing = np.flatnonzero(status == RENAME)
+    changing = changing[np.argsort(codes[changing], kind="stable")]
+    for group in np.split(changing, np.flatnonzero(np.diff(codes[changing])) + 1) if len(changing) else ():
+        folder = folders[group[0]]
+        if folder not in listings:
+            try:
+                listings[folder] = {fold(n) for n in os.listdir(folder)}
+            except OSError:
+                listings[folder] = set()
+        group = group.tolist()
+        # Names this folder is about to vacate are free for the others to take
+        taken = listings[folder] - {fold(names[i]) for i in group}
+        wanted = [fold(targets[i]) for i in group]
+        if len(set(wanted)) == len(wanted) and taken.isdisjoint(wanted):
+            continue
+        # Where numbering of each clashing name resumes, so n clashes don't cost n^2 lookups
+        next_number = {}
+        for i in group:
+            key = fold(targets[i])
+            if key in taken:
+                stem, ext, n = next_number.get(key) or (*os.path.splitext(targets[i]), 1)
+                while fold(f"{stem} ({n}){ext}") in taken:
+                    n += 1
+                next_number[key] = stem, ext, n + 1
+                status[i] = RENUMBERED
+                targets[i] = f"{stem} ({n}){ext}"
+            taken.add(fold(targets[i]))
+    return RenamePlan(folders, names, targets, status)
+
+_renameat2 = None
+
+def _rename_noreplace(src, dst):
+    """rename() that fails with EEXIST instead of replacing dst, in one syscall where the kernel allows.
+
+    Returns False when no-replace renames aren't available here, so the caller checks first.
+    """
+    import ctypes.util  # imported on first use: ctypes.util pulls in subprocess, which startup can do without
+    global _renameat2
+    if _renameat2 is None:
+        _renameat2 = False
+        if sys.platform.startswith("linux"):
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            _renameat2 = getattr(libc, "renameat2", False)
+    if not _renameat2:
+        return False
+    AT_FDCWD, RENAME_NOREPLACE = -100, 1
+    if _renameat2(AT_FDCWD, os.fsencode(src), AT_FDCWD, os.fsencode(dst), RENAME_NOREPLACE) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.EINVAL, errno.ENOSYS):
+        return False  # the filesystem (or kernel) doesn't support the flag
+    raise OSError(err, os.strerror(err), src)
+
+class Renamer(Organizer):
+    """Executes rename steps in order with the organize journal, so runs can be resumed or undone.
+
+    Steps within a folder depend on each other, so they run one after another on a single
+    thread, and each finished step is journaled before the next one starts.
+    """
+    journal_prefix = "rename"
+
+    @classmethod
+    def last_completed(cls, root, journal_dir=None):
+        """Journal of the most recent finished rename run under root, for undo; None if there is none."""
+        journal_dir = journal_dir or cls.journal_dir()
+        try:
+            names = sorted((n for n in os.listdir(journal_dir)
+                            if n.startswith(cls.journal_prefix + "-") and n.endswith(".jsonl.done")), reverse=True)
+        except OSError:
+            return None
+        for name in names:
+            path = os.path.join(journal_dir, name)
+            if cls.journal_root(path) == root:
+                return path
+        return None
+
+    def _move(self, src, dst):
+        fold = _fold()
+        if fold(src) == fold(dst):
+            os.rename(src, dst)  # only the letter case changes, so dst is src itself
+            return
+        try:
+            if _rename_noreplace(src, dst):
+                return
+            if os.path.lexists(dst):
+                raise FileExistsError(errno.EEXIST, "already exists", dst)
+            os.rename(src, dst)
+        except OSError:
+            if not os.path.lexists(src) and os.path.lexists(dst):
+                return  # renamed by an earlier run that died before journaling it
+            raise
+
+    def _execute(self, indices, reverse, progress, is_cancelled):
+        completed, errors = 0, []
+        key = "undone" if reverse else "done"
+        with open(self.journal_path, "a", encoding="utf-8") as journal:
+            for n, i in enumerate(indices, 1):
+                if is_cancelled is not None and is_cancelled():
+                    break
+                src, dst = self.moves[i]
+                if reverse:
+                    src, dst = dst, src
+                try:
+                    self._move(src, dst)
+                except OSError as e:
+                    errors.append(f"{src}: {e.strerror or e}")
+                    continue
+                if reverse:
+                    self.done.discard(i)
+                else:
+                    self.done.add(i)
+                journal.write(json.dumps({key: i}) + "\n")
+                journal.flush()
+                completed += 1
+                if progress is not None and (n % 256 == 0 or n == len(indices)):
+                    progress(completed, len(indices), len(errors))
+            os.fsync(journal.fileno())
+        return completed, errors
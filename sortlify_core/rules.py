@@ -0,0 +1,301 @@
+"""Organize rules with combined conditions and destination templates.
+
+A rule is one line of "field:value" conditions, an arrow and a destination, e.g.
+
+    ext:.pdf name:*invoice* regex:"(?P<client>[a-z]+)_\\d+" age:<2y -> Invoices/{year}/{client}
+
+Conditions:
+    ext:.pdf,.docx     extension is one of
+    type:Images        current category (from extensions and simpler rules) is
+    size:>10MB         size range: <N, >N or N..M with B/KB/MB/GB units
+    age:<30d           time since modification: <N, >N or N..M with d/w/m/y units
+    year:2019..2021    year taken from metadata, or a single year
+    creator:canon      camera model or artist contains (case-insensitive)
+    folder:*/Scans*    * and ? glob on the containing folder (case-insensitive)
+    name:*invoice*     * and ? glob on the file name (case-insensitive)
+    regex:PATTERN      regular expression searched in the file name
+    path:PATTERN       regular expression searched in the full path
+
+Destinations may use {category}, {ext}, {year}, {month}, {creator}, {stem} and any
+named group from a regex or path pattern. {year} falls back to the modification year
+when no metadata year is known. A fixed destination also becomes the category of the
+files it matches; with a template their category is its leading folder (Invoices for
+Invoices/{year}/{client}), or stays what it was when the template starts with a field.
+
+Rules are compiled into a RuleProgram that evaluates them in order over a FileIndex,
+first match wins. Within a rule, conditions run cheapest first: column comparisons,
+then per-folder and per-creator lookups, then one regex pass per name chunk, and
+only then per-path regexes, each narrowing the rows the next one sees. NumPy is only
+imported once a program is applied, so parsing rules stays cheap at start-up.
+"""
+import hashlib
+import os
+import re
+import shlex
+import string
+import time
+from .common import DAY, MB
+
+SIZE_UNITS = {"b": 1, "kb": 1024, "mb": MB, "gb": 1024 * MB, "tb": 1024 * 1024 * MB}
+AGE_UNITS = {"d": DAY, "w": 7 * DAY, "m": 30 * DAY, "y": 365 * DAY}
+# Evaluation order within a rule: cheapest, and usually most selective, first
+COST = {"ext": 0, "type": 0, "size": 0, "age": 0, "year": 0, "creator": 1, "folder": 1,
+        "name": 2, "regex": 2, "path": 3}
+COLUMN_FIELDS = {"category", "ext", "year", "month", "creator"}
+UNSAFE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+def _quantity(text, units, default_unit):
+    m = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([a-z]*)\s*", text.lower())
+    if not m or (m.group(2) or default_unit) not in units:
+        raise ValueError(f"can't read {text!r}; expected a number with one of {', '.join(units)}")
+    return int(float(m.group(1)) * units[m.group(2) or default_unit])
+
+def _range(text, parse):
+    """Inclusive (low, high) bounds from "<N", ">N", "N..M" or "N"; None means unbounded."""
+    if text.startswith("<"):
+        return None, parse(text[1:]) - 1
+    if text.startswith(">"):
+        return parse(text[1:]) + 1, None
+    if ".." in text:
+        low, high = text.split("..", 1)
+        return parse(low), parse(high)
+    value = parse(text)
+    return value, value
+
+def glob_regex(pattern):
+    """Regex for a * and ? glob matching one whole line, so it can run over newline-joined names."""
+    parts = ("[^\n]*" if ch == "*" else "[^\n]" if ch == "?" else re.escape(ch) for ch in pattern)
+    return "^" + "".join(parts) + "$"
+
+class Rule:
+    """One parsed rule: conditions as (field, value) in evaluation order, and a destination."""
+    def __init__(self, conditions, target, source=""):
+        self.conditions = sorted(conditions, key=lambda c: COST[c[0]])
+        self.target = target
+        self.source = source
+        self.fields = [f for _, f, _, _ in string.Formatter().parse(target) if f]
+        # Category of the matched files: the whole destination, or for a template its leading
+        # literal folder ("Invoices" for Invoices/{year}); None keeps the category they had
+        head = target.split("/", 1)[0]
+        self.category = target if not self.fields else head if "{" not in head else None
+        groups = set()
+        for field, value in self.conditions:
+            if field in ("regex", "path"):
+                groups.update(value.groupindex)
+        unknown = set(self.fields) - COLUMN_FIELDS - {"stem"} - groups
+        if unknown:
+            raise ValueError(f"unknown destination field {{{sorted(unknown)[0]}}}")
+
+    @property
+    def uses_metadata(self):
+        return any(f in ("year", "creator") for f, _ in self.conditions) or bool({"year", "creator"} & set(self.fields))
+
+def parse_rule(line):
+    """Parse one "conditions -> destination" line into a Rule; raises ValueError."""
+    conditions_text, arrow, target = line.partition("->")
+    target = target.strip().strip("/")
+    if not arrow or not target:
+        raise ValueError("a rule needs a destination after '->'")
+    conditions = []
+    for token in shlex.split(conditions_text, posix=True):
+        field, sep, value = token.partition(":")
+        field = field.lower()
+        if not sep or field not in COST or not value:
+            raise ValueError(f"can't read condition {token!r}")
+        if field == "ext":
+            value = {e.lower() if e.startswith(".") else "." + e.lower() for e in value.split(",") if e}
+        elif field == "size":
+            value = _range(value, lambda v: _quantity(v, SIZE_UNITS, "b"))
+        elif field == "age":
+            value = _range(value, lambda v: _quantity(v, AGE_UNITS, "d"))
+        elif field == "year":
+            value = _range(value, lambda v: _quantity(v, {"": 1}, ""))
+        elif field == "creator":
+            value = value.lower()
+        elif field in ("folder", "name"):
+            value = re.compile(glob_regex(value.lower()), re.MULTILINE)
+        elif field in ("regex", "path"):
+            try:
+                value = re.compile(value, re.MULTILINE)
+            except re.error as e:
+                raise ValueError(f"bad regular expression {value!r}: {e}") from None
+        conditions.append((field, value))
+    if not conditions:
+        raise ValueError("a rule needs at least one condition")
+    return Rule(conditions, target, line.strip())
+
+def parse_rules(text):
+    """Parse rules one per line, skipping blanks and # comments; errors name the line."""
+    rules = []
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            rules.append(parse_rule(line))
+        except ValueError as e:
+            raise ValueError(f"line {number}: {e}") from None
+    return rules
+
+def _clean(value):
+    # Template values become folder names, so they can't add path separators of their own
+    value = UNSAFE.sub("_", str(value)).strip(" .")
+    return value or "Unknown"
+
+class RuleProgram:
+    """Rules compiled for ordered, batched evaluation over a FileIndex."""
+    def __init__(self, rules=()):
+        self.rules = list(rules)
+        self.key = hashlib.sha1("\n".join(r.source for r in self.rules).encode("utf-8")).hexdigest()
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    @property
+    def uses_metadata(self):
+        return any(rule.uses_metadata for rule in self.rules)
+
+    def targets(self):
+        """Categories the rules assign, for listing; templated destinations aren't categories."""
+        return list(dict.fromkeys(rule.category for rule in self.rules if rule.category is not None))
+
+    def _narrow(self, index, rows, field, value, categories, now, captures):
+        import numpy as np
+        if field == "ext":
+            codes = [index.extensions.find(e) for e in value]
+            return rows[np.isin(index.ext[rows], codes)]
+        if field == "type":
+            code = index.categories.find(value)
+            return rows[categories[rows] == code] if code >= 0 else rows[:0]
+        if field in ("size", "age", "year"):
+            values = now - index.mtime[rows] if field == "age" else getattr(index, field)[rows]
+            low, high = value
+            mask = np.ones(len(rows), np.bool_)
+            if low is not None:
+                mask &= values >= low
+            if high is not None:
+                mask &= values <= high
+            if field == "year":
+                mask &= values > 0
+            return rows[mask]
+        if field == "creator":
+            codes = [code for code, v in enumerate(index.creators.values) if value in v.lower()]
+            return rows[np.isin(index.creator[rows], codes)]
+        if field == "folder":
+            codes = [code for code, v in enumerate(index.folders.values) if value.match(v.lower())]
+            return rows[np.isin(index.folder[rows], codes)]
+        if field in ("name", "regex"):
+            if len(rows) * 8 < len(index):
+                # Few candidates left: matching them one by one beats scanning every name
+                matches = ((row, value.search(index.name(row).lower() if field == "name" else index.name(row)))
+                           for row in rows.tolist())
+                found = [(row, m) for row, m in matches if m]
+                hits, matches = np.array([row for row, _ in found], np.int64), [m for _, m in found]
+            else:
+                hits, matches = index.search_names(value, lower=field == "name")
+            keep = np.isin(hits, rows)
+            if value.groupindex:
+                captures.update(zip(hits[keep].tolist(), (m for m, kept in zip(matches, keep.tolist()) if kept)))
+            return hits[keep]
+        if field == "path":
+            found = {}
+            for row in rows.tolist():
+                m = value.search(index.path(row))
+                if m:
+                    found[row] = m
+            if value.groupindex:
+                captures.update(found)
+            return np.fromiter(found, np.int64, len(found))
+        raise ValueError(field)
+
+    def _render(self, index, rule, rows, categories, captures):
+        """Category codes and destination codes (see FileIndex.destination) for the matched rows.
+
+        Rendered destinations are interned in index.destinations rather than as categories, so
+        a per-file template such as Docs/{stem} can't run the category column out of codes.
+        """
+        import numpy as np
+        if not rule.fields:
+            return np.full(len(rows), index.categories.code(rule.target), categories.dtype), -1
+        category = categories[rows] if rule.category is None else index.categories.code(rule.category)
+        years = np.where(index.year[rows] > 0, index.year[rows],
+                         index.mtime[rows].astype("datetime64[s]").astype("datetime64[Y]").astype(np.int64) + 1970)
+        months = index.mtime[rows].astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+        if set(rule.fields) <= COLUMN_FIELDS:
+            # Render once per distinct combination of the columns the template uses, found by
+            # packing those columns into one integer key per row
+            columns = {"category": categories[rows], "ext": index.ext[rows], "year": years, "month": months,
+                       "creator": index.creator[rows] + 1}
+            used = [f for f in ("category", "ext", "year", "month", "creator") if f in rule.fields]
+            key = np.zeros(len(rows), np.int64)
+            for f in used:
+                column = columns[f].astype(np.int64)
+                key = key * (int(column.max()) + 1) + column
+            combos, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+            codes = np.empty(len(combos), np.int32)
+            for k, i in enumerate(first.tolist()):
+                creator = int(columns["creator"][i]) - 1
+                values = {"category": index.categories.values[columns["category"][i]],
+                          "ext": index.extensions.values[columns["ext"][i]][1:],
+                          "year": int(years[i]), "month": f"{int(months[i]):02d}",
+                          "creator": index.creators.values[creator] if creator >= 0 else ""}
+                codes[k] = index.destinations.code(self._format(rule, values))
+            return category, codes[inverse.ravel()]
+        # Per-row values (file stems, regex captures): render each distinct tuple once
+        getters = {
+            "category": lambda i, row: index.categories.values[categories[row]],
+            "ext": lambda i, row: index.ext_name(row)[1:],
+            "year": lambda i, row: int(years[i]),
+            "month": lambda i, row: f"{int(months[i]):02d}",
+            "creator": lambda i, row: index.creator_name(row),
+            "stem": lambda i, row: os.path.splitext(index.name(row))[0],
+        }
+        codes = np.empty(len(rows), np.int32)
+        rendered = {}
+        for i, row in enumerate(rows.tolist()):
+            m = captures.get(row)
+            groups = m.groupdict() if m is not None else {}
+            raw = tuple(groups[f] if groups.get(f) is not None else getters[f](i, row) if f in getters else ""
+                        for f in rule.fields)
+            code = rendered.get(raw)
+            if code is None:
+                code = rendered[raw] = index.destinations.code(self._format(rule, dict(zip(rule.fields, raw))))
+            codes[i] = code
+        return category, codes
+
+    def _format(self, rule, values):
+        values = {k: _clean(v) for k, v in values.items()}
+        return rule.target.format_map({f: values.get(f, "Unknown") for f in rule.fields})
+
+    def apply(self, index, categories, destinations, rows=None, now=None):
+        """Overwrite categories and destinations (arrays over index rows) for rows matched by a rule.
+
+        Only rows (every row by default) are evaluated. Returns the number of rows matched.
+        Rules see categories as they stand before any rule of this program ran, so "type:"
+        refers to the extension-based category.
+        """
+        import numpy as np
+        if not self.rules or not len(index):
+            return 0
+        now = int(time.time() if now is None else now)
+        before = categories.copy()
+        if rows is None:
+            undecided = np.flatnonzero(index.alive)
+        else:
+            rows = np.unique(np.asarray(rows, np.int64))
+            undecided = rows[index.alive[rows]]
+        matched = 0
+        for rule in self.rules:
+            rows, captures = undecided, {}
+            for field, value in rule.conditions:
+                rows = self._narrow(index, rows, field, value, before, now, captures)
+                if not len(rows):
+                    break
+            if not len(rows):
+                continue
+            categories[rows], destinations[rows] = self._render(index, rule, rows, before, captures)
+            matched += len(rows)
+            undecided = undecided[~np.isin(undecided, rows, assume_unique=True)]
+            if not len(undecided):
+                break
+        return matched
@@ -0,0 +1,210 @@
+"""Recursive folder scanning and the persistent scan cache."""
+import os
+import sqlite3
+import time
+from .classify import classify_entries
+from .common import MB, app_cache_dir
+from .profiling import PROFILER
+
+def scan_tree(root, batch_size=1000, is_cancelled=None):
+    """Walk root recursively with os.scandir, yielding lists of (folder, name, size, mtime) tuples.
+
+    Directories are visited iteratively so deep trees can't hit the recursion limit,
+    symlinked directories are not followed, and unreadable directories are skipped.
+    """
+    stack = [root]
+    batch = []
+    while stack:
+        if is_cancelled is not None and is_cancelled():
+            return
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file():
+                            # DirEntry caches the stat result; on Windows it comes free with the listing
+                            stat = entry.stat()
+                            batch.append((current, entry.name, stat.st_size, int(stat.st_mtime)))
+                    except OSError:
+                        continue
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = []
+                        if is_cancelled is not None and is_cancelled():
+                            return
+        except OSError:
+            continue
+    if batch:
+        yield batch
+
+class ScanCache:
+    """SQLite index of previously scanned trees, keyed by directory mtime.
+
+    A directory whose st_mtime_ns matches the cached value has had no entries added,
+    removed or renamed, so its files are read back from the cache instead of being
+    listed and stat'ed again; only changed directories hit the disk. Files edited in
+    place don't touch their directory's mtime, so their cached size and mtime are kept
+    until the directory itself changes. Roots are evicted least-recently-used first once
+    the database grows past max_bytes.
+    """
+    schema = """
+        CREATE TABLE IF NOT EXISTS roots (root TEXT PRIMARY KEY, last_used REAL, classifier TEXT);
+        CREATE TABLE IF NOT EXISTS dirs (
+            id INTEGER PRIMARY KEY, root TEXT, path TEXT, parent_id INTEGER, mtime_ns INTEGER,
+            UNIQUE (root, path));
+        CREATE INDEX IF NOT EXISTS dirs_parent ON dirs (parent_id);
+        CREATE TABLE IF NOT EXISTS files (
+            dir_id INTEGER, name TEXT, size INTEGER, mtime INTEGER, ext TEXT, category TEXT);
+        CREATE INDEX IF NOT EXISTS files_dir ON files (dir_id);
+    """
+
+    def __init__(self, path=None, max_bytes=512 * MB):
+        if path is None:
+            path = os.path.join(app_cache_dir(), "scan_cache.sqlite3")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.schema)
+
+    def close(self):
+        self.conn.close()
+
+    def _subtree_ids(self, root, path):
+        prefix = path.rstrip(os.sep) + os.sep
+        upper = prefix[:-1] + chr(ord(os.sep) + 1)
+        rows = self.conn.execute(
+            "SELECT id FROM dirs WHERE root = ? AND (path = ? OR (path >= ? AND path < ?))",
+            (root, path, prefix, upper))
+        return [r[0] for r in rows]
+
+    def _forget(self, dir_ids):
+        for i in range(0, len(dir_ids), 500):
+            chunk = dir_ids[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            self.conn.execute(f"DELETE FROM files WHERE dir_id IN ({marks})", chunk)
+            self.conn.execute(f"DELETE FROM dirs WHERE id IN ({marks})", chunk)
+
+    def _store_files(self, dir_id, rows, replace=False):
+        if replace:
+            self.conn.execute("DELETE FROM files WHERE dir_id = ?", (dir_id,))
+        self.conn.executemany(
+            "INSERT INTO files (dir_id, name, size, mtime, ext, category) VALUES (?, ?, ?, ?, ?, ?)",
+            [(dir_id, name, size, mtime, ext, category) for _, name, size, mtime, ext, category in rows])
+
+    def _rescan_dir(self, root, path, parent_id, mtime_ns, cached):
+        """List one directory from disk and store it; returns (dir_id, entries, subdirs)."""
+        entries, subdirs = [], []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        stat = entry.stat()
+                        entries.append((path, entry.name, stat.st_size, int(stat.st_mtime)))
+                except OSError:
+                    continue
+        if cached is None:
+            dir_id = self.conn.execute(
+                "INSERT INTO dirs (root, path, parent_id, mtime_ns) VALUES (?, ?, ?, ?)",
+                (root, path, parent_id, mtime_ns)).lastrowid
+        else:
+            dir_id = cached[0]
+            self.conn.execute("UPDATE dirs SET mtime_ns = ?, parent_id = ? WHERE id = ?", (mtime_ns, parent_id, dir_id))
+            self.conn.execute("DELETE FROM files WHERE dir_id = ?", (dir_id,))
+            # Drop cached subdirectories that are gone, along with everything below them
+            current = set(subdirs)
+            for (child,) in self.conn.execute("SELECT path FROM dirs WHERE parent_id = ?", (dir_id,)).fetchall():
+                if child not in current:
+                    self._forget(self._subtree_ids(root, child))
+        return dir_id, entries, subdirs
+
+    def scan(self, root, classifier, batch_size=1000, is_cancelled=None):
+        """Like scan_tree, but yields classified FileIndex rows and reuses unchanged directories."""
+        root = os.path.abspath(root)
+        row = self.conn.execute("SELECT classifier FROM roots WHERE root = ?", (root,)).fetchone()
+        categories_valid = row is not None and row[0] == classifier.key
+        # While a reclassification is under way the cache holds a mix of old and new categories, so
+        # record no classifier until the whole tree has been through this one
+        self.conn.execute("INSERT OR REPLACE INTO roots (root, last_used, classifier) VALUES (?, ?, ?)",
+                          (root, time.time(), classifier.key if categories_valid else None))
+        cached_dirs = {path: (dir_id, mtime_ns) for dir_id, path, mtime_ns in
+                       self.conn.execute("SELECT id, path, mtime_ns FROM dirs WHERE root = ?", (root,))}
+        stack = [(root, None)]
+        batch = []
+        try:
+            while stack:
+                if is_cancelled is not None and is_cancelled():
+                    return
+                path, parent_id = stack.pop()
+                try:
+                    mtime_ns = os.stat(path).st_mtime_ns
+                except OSError:
+                    continue
+                cached = cached_dirs.get(path)
+                if cached is not None and cached[1] == mtime_ns:
+                    PROFILER.count("scan_cache.hits")
+                    dir_id = cached[0]
+                    files = self.conn.execute(
+                        "SELECT name, size, mtime, ext, category FROM files WHERE dir_id = ?", (dir_id,)).fetchall()
+                    if categories_valid:
+                        rows = [(path, name, size, mtime, ext, category)
+                                for name, size, mtime, ext, category in files]
+                    else:
+                        rows = classify_entries(classifier, [(path, name, size, mtime)
+                                                             for name, size, mtime, _, _ in files])
+                        self._store_files(dir_id, rows, replace=True)
+                    batch.extend(rows)
+                    subdirs = [child for (child,) in self.conn.execute(
+                        "SELECT path FROM dirs WHERE parent_id = ?", (dir_id,))]
+                else:
+                    PROFILER.count("scan_cache.misses")
+                    try:
+                        dir_id, entries, subdirs = self._rescan_dir(root, path, parent_id, mtime_ns, cached)
+                    except OSError:
+                        continue
+                    rows = classify_entries(classifier, entries)
+                    self._store_files(dir_id, rows)
+                    batch.extend(rows)
+                    for child in subdirs:
+                        if child not in cached_dirs:
+                            # Recorded with an mtime no directory has, so that if this scan stops
+                            # before reaching it, the next one still lists it instead of losing it
+                            child_id = self.conn.execute(
+                                "INSERT INTO dirs (root, path, parent_id, mtime_ns) VALUES (?, ?, ?, -1)",
+                                (root, child, dir_id)).lastrowid
+                            cached_dirs[child] = (child_id, -1)
+                stack.extend((child, dir_id) for child in subdirs)
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+            self.conn.execute("UPDATE roots SET classifier = ? WHERE root = ?", (classifier.key, root))
+        finally:
+            self.conn.commit()
+        self.evict(keep=root)
+
+    def used_bytes(self):
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        pages = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        free = self.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        return (pages - free) * page_size
+
+    def evict(self, keep=None):
+        """Forget least-recently-used roots until the cache fits in max_bytes."""
+        while self.used_bytes() > self.max_bytes:
+            row = self.conn.execute(
+                "SELECT root FROM roots WHERE root != ? ORDER BY last_used LIMIT 1", (keep or "",)).fetchone()
+            if row is None:
+                break
+            ids = [r[0] for r in self.conn.execute("SELECT id FROM dirs WHERE root = ?", (row[0],))]
+            self._forget(ids)
+            self.conn.execute("DELETE FROM roots WHERE root = ?", (row[0],))
+            self.conn.commit()
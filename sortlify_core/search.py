@@ -0,0 +1,111 @@
+"""Full-text search over scanned documents with SQLite FTS5.
+
+Documents are indexed by path with their mtime and size; an update only extracts files
+that are new or changed since they were last indexed and drops files that are gone, so
+rescanning a folder costs little more than the comparison. Text extraction runs in a
+process pool. Queries are ranked with BM25, weighting matches in the file name above
+matches in the body.
+"""
+import os
+import sqlite3
+from functools import partial
+from .classify import file_ext
+from .common import app_cache_dir, process_pool
+from .text import CONTENT_EXTS, extract_text
+
+INDEX_BYTES = 256 * 1024
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix."""
+    words = [w.replace('"', '""') for w in text.split()]
+    if not words:
+        return ""
+    terms = [f'"{w}"' for w in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
+
+class SearchIndex:
+    """SQLite FTS5 index of document text, kept current by path, mtime and size."""
+    schema = """
+        CREATE TABLE IF NOT EXISTS docs (id INTEGER PRIMARY KEY, path TEXT UNIQUE, mtime INTEGER, size INTEGER);
+        CREATE VIRTUAL TABLE IF NOT EXISTS content USING fts5 (name, body, tokenize = 'unicode61 remove_diacritics 2');
+    """
+
+    def __init__(self, path=None, workers=None):
+        if path is None:
+            path = os.path.join(app_cache_dir(), "search_index.sqlite3")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.workers = workers
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.schema)
+
+    def close(self):
+        self.conn.close()
+
+    def _under(self, root):
+        prefix = root.rstrip(os.sep) + os.sep
+        return prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+    def update(self, root, files, prune=True, batch_size=64, progress=None, is_cancelled=None):
+        """Bring the index for root in line with files, an iterable of (path, size, mtime).
+
+        Only documents with an extension in CONTENT_EXTS are indexed, and with prune,
+        indexed documents under root missing from files are dropped. Returns the number of
+        documents (re)indexed; progress, if given, is called as progress(done, total).
+        """
+        indexed = {path: (doc_id, mtime, size) for doc_id, path, mtime, size in
+                   self.conn.execute("SELECT id, path, mtime, size FROM docs WHERE path >= ? AND path < ?",
+                                     self._under(root))}
+        stale = []
+        for path, size, mtime in files:
+            if file_ext(path) not in CONTENT_EXTS:
+                continue
+            known = indexed.pop(path, None)
+            if known is None or known[1] != mtime or known[2] != size:
+                stale.append((path, size, mtime))
+        if prune:
+            gone = [(doc_id,) for doc_id, _, _ in indexed.values()]
+            with self.conn:
+                self.conn.executemany("DELETE FROM content WHERE rowid = ?", gone)
+                self.conn.executemany("DELETE FROM docs WHERE id = ?", gone)
+        if not stale:
+            return 0
+        extract = partial(extract_text, limit=INDEX_BYTES)
+        done = 0
+        with process_pool(self.workers) as pool:
+            for start in range(0, len(stale), batch_size):
+                if is_cancelled is not None and is_cancelled():
+                    break
+                batch = stale[start:start + batch_size]
+                texts = list(pool.map(extract, [path for path, _, _ in batch], chunksize=4))
+                with self.conn:
+                    for (path, size, mtime), text in zip(batch, texts):
+                        row = self.conn.execute("SELECT id FROM docs WHERE path = ?", (path,)).fetchone()
+                        if row is not None:
+                            self.conn.execute("DELETE FROM content WHERE rowid = ?", row)
+                            self.conn.execute("UPDATE docs SET mtime = ?, size = ? WHERE id = ?", (mtime, size, row[0]))
+                            doc_id = row[0]
+                        else:
+                            doc_id = self.conn.execute("INSERT INTO docs (path, mtime, size) VALUES (?, ?, ?)",
+                                                       (path, mtime, size)).lastrowid
+                        self.conn.execute("INSERT INTO content (rowid, name, body) VALUES (?, ?, ?)",
+                                          (doc_id, os.path.basename(path), text))
+                done += len(batch)
+                if progress is not None:
+                    progress(done, len(stale))
+        return done
+
+    def search(self, root, text, limit=1000):
+        """Paths of documents under root matching text, best match first."""
+        query = fts_query(text)
+        if not query:
+            return []
+        try:
+            rows = self.conn.execute(
+                "SELECT docs.path FROM content JOIN docs ON docs.id = content.rowid "
+                "WHERE content MATCH ? AND docs.path >= ? AND docs.path < ? "
+                "ORDER BY bm25(content, 4.0, 1.0) LIMIT ?", (query, *self._under(root), limit))
+            return [path for (path,) in rows]
+        except sqlite3.OperationalError:
+            return []
@@ -0,0 +1,179 @@
+"""Persistent settings and named rule/category profiles, kept in one versioned JSON file.
+
+The file is read once at startup and validated field by field: anything missing, of
+the wrong type or out of range falls back to its default (and is listed in problems),
+so a damaged or hand-edited file never stops Sortlify from starting. Files written by
+older versions are upgraded through MIGRATIONS on load. Saves write a temporary file
+and rename it over the old one, so a crash mid-save leaves the previous settings.
+"""
+import json
+import os
+from .classify import BUILTIN_CATEGORIES, DEFAULT_CATEGORY_MAP, META_RULE_FIELDS
+from .common import app_config_dir
+
+SETTINGS_VERSION = 1
+THEMES = ("dark", "light")
+ACCENTS = ("blue", "green", "orange", "purple", "red")
+RULE_FIELDS = ("name",) + META_RULE_FIELDS
+DEFAULT_PROFILE = "Default"
+# version -> function upgrading a settings dict written by that version to the next one
+MIGRATIONS = {}
+
+class Profile:
+    """A named set of category extensions, simple rules and advanced rule text."""
+    def __init__(self, category_map=None, custom_rules=(), rules_text=""):
+        if category_map is None:
+            category_map = {cat: list(exts) for cat, exts in DEFAULT_CATEGORY_MAP.items()}
+        self.category_map = category_map
+        self.custom_rules = list(custom_rules)  # (text, target_category, field), field one of RULE_FIELDS
+        self.rules_text = rules_text
+
+    def copy(self):
+        return Profile({cat: list(exts) for cat, exts in self.category_map.items()}, self.custom_rules, self.rules_text)
+
+    def to_json(self):
+        return {"category_map": self.category_map, "custom_rules": [list(rule) for rule in self.custom_rules],
+                "rules_text": self.rules_text}
+
+    @classmethod
+    def from_json(cls, data, problems, name):
+        """A Profile from its JSON form, dropping (and reporting) whatever doesn't validate."""
+        if not isinstance(data, dict):
+            problems.append(f"profile {name!r} is not an object; using the defaults")
+            return cls()
+        category_map = {}
+        raw = data.get("category_map")
+        if isinstance(raw, dict):
+            for cat, exts in raw.items():
+                if not isinstance(cat, str) or not cat.strip() or not isinstance(exts, list):
+                    problems.append(f"profile {name!r}: dropped category {cat!r}")
+                    continue
+                valid = [ext.lower() for ext in exts if isinstance(ext, str) and len(ext) > 1 and ext.startswith(".")]
+                if len(valid) != len(exts):
+                    problems.append(f"profile {name!r}: dropped bad extensions of {cat!r}")
+                category_map[cat] = list(dict.fromkeys(valid))
+        elif raw is not None:
+            problems.append(f"profile {name!r}: category_map is not an object; using the defaults")
+        if not category_map:
+            category_map = {cat: list(exts) for cat, exts in DEFAULT_CATEGORY_MAP.items()}
+        for cat in BUILTIN_CATEGORIES:
+            # Built-in categories can't be deleted in the GUI, so a file without them was edited by hand
+            category_map.setdefault(cat, list(DEFAULT_CATEGORY_MAP.get(cat, [])))
+        rules = []
+        for rule in data.get("custom_rules") or []:
+            if (isinstance(rule, list) and len(rule) == 3 and all(isinstance(part, str) and part for part in rule)
+                    and rule[2] in RULE_FIELDS and (rule[2] != "year" or rule[0].isdigit())):
+                rules.append(tuple(rule))
+            else:
+                problems.append(f"profile {name!r}: dropped rule {rule!r}")
+        rules_text = data.get("rules_text", "")
+        if not isinstance(rules_text, str):
+            problems.append(f"profile {name!r}: rules_text is not text; ignored")
+            rules_text = ""
+        return cls(category_map, rules, rules_text)
+
+class Settings:
+    """Everything Sortlify remembers between runs: look, last folder and the rule profiles."""
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_config_dir(), "settings.json")
+        self.theme = "dark"
+        self.accent = "blue"
+        self.last_folder = None
+        self.reopen_last_folder = True
+        self.profiles = {DEFAULT_PROFILE: Profile()}
+        self.active_profile = DEFAULT_PROFILE
+        self.problems = []  # what load() had to drop or reset, for showing to the user
+
+    @property
+    def profile(self):
+        return self.profiles[self.active_profile]
+
+    @classmethod
+    def load(cls, path=None):
+        """Settings from path, or the defaults if it doesn't exist or can't be read."""
+        settings = cls(path)
+        try:
+            with open(settings.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return settings
+        except (OSError, ValueError) as e:
+            settings.problems.append(f"could not read {settings.path} ({e}); using the defaults")
+            return settings
+        if not isinstance(data, dict):
+            settings.problems.append(f"{settings.path} is not a settings file; using the defaults")
+            return settings
+        version = data.get("version", 1)
+        if not isinstance(version, int) or isinstance(version, bool) or version < 1:
+            settings.problems.append(f"unknown settings version {version!r}; using the defaults")
+            return settings
+        if version > SETTINGS_VERSION:
+            settings.problems.append(f"settings were written by a newer Sortlify (version {version}); "
+                                     "reading what this version understands")
+        while version < SETTINGS_VERSION:
+            if version not in MIGRATIONS:
+                settings.problems.append(f"no way to upgrade settings from version {version}; using the defaults")
+                return settings
+            data = MIGRATIONS[version](data)
+            version += 1
+        settings._read(data)
+        return settings
+
+    def _read(self, data):
+        problems = self.problems
+        if data.get("theme", self.theme) in THEMES:
+            self.theme = data.get("theme", self.theme)
+        else:
+            problems.append(f"unknown theme {data['theme']!r}")
+        if data.get("accent", self.accent) in ACCENTS:
+            self.accent = data.get("accent", self.accent)
+        else:
+            problems.append(f"unknown accent color {data['accent']!r}")
+        last_folder = data.get("last_folder")
+        self.last_folder = last_folder if isinstance(last_folder, str) and last_folder else None
+        reopen = data.get("reopen_last_folder", self.reopen_last_folder)
+        if isinstance(reopen, bool):
+            self.reopen_last_folder = reopen
+        else:
+            problems.append(f"reopen_last_folder should be true or false, not {reopen!r}")
+        profiles = data.get("profiles")
+        if isinstance(profiles, dict) and profiles:
+            self.profiles = {name: Profile.from_json(profile, problems, name)
+                             for name, profile in profiles.items() if isinstance(name, str) and name.strip()}
+        elif profiles is not None:
+            problems.append("profiles is not an object; using the default profile")
+        if not self.profiles:
+            self.profiles = {DEFAULT_PROFILE: Profile()}
+        active = data.get("active_profile")
+        self.active_profile = active if active in self.profiles else next(iter(self.profiles))
+
+    def to_json(self):
+        return {"version": SETTINGS_VERSION, "theme": self.theme, "accent": self.accent,
+                "last_folder": self.last_folder, "reopen_last_folder": self.reopen_last_folder,
+                "active_profile": self.active_profile,
+                "profiles": {name: profile.to_json() for name, profile in self.profiles.items()}}
+
+    def save(self):
+        """Write the settings atomically; raises OSError if the file can't be written."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        part = self.path + ".part"
+        with open(part, "w", encoding="utf-8") as f:
+            json.dump(self.to_json(), f, indent=2)
+        os.replace(part, self.path)
+
+    def add_profile(self, name, copy_of=None):
+        """Create profile name (a copy of profile copy_of, or the defaults) and make it active."""
+        if not name.strip() or name in self.profiles:
+            raise ValueError(f"there is already a profile called {name!r}" if name in self.profiles
+                             else "profile names can't be blank")
+        self.profiles[name] = self.profiles[copy_of].copy() if copy_of is not None else Profile()
+        self.active_profile = name
+        return self.profiles[name]
+
+    def remove_profile(self, name):
+        """Delete profile name; the last remaining profile can't be deleted."""
+        if len(self.profiles) == 1:
+            raise ValueError("the last profile can't be deleted")
+        del self.profiles[name]
+        if self.active_profile == name:
+            self.active_profile = next(iter(self.profiles))
@@ -0,0 +1,201 @@
+"""Near-duplicate image detection with perceptual hashes.
+
+Each image is decoded at reduced size (Pillow's draft mode lets JPEG skip straight to a
+1/2, 1/4 or 1/8 scale decode) and reduced to two 64-bit hashes: a dHash of brightness
+gradients on a 9x8 thumbnail and a pHash of the low frequencies of a 32x32 DCT. Resized
+and re-encoded copies of a picture land within a few bits of each other. Hashes are
+cached by path, mtime and size and computed in a process pool.
+
+Grouping avoids comparing every pair (multi-index hashing): when two hashes differ in at
+most k bits, one of their four 16-bit blocks differs in at most k // 4 bits. So for each
+block, a hash is only compared with the hashes whose block value is within that many
+bit flips of its own, found by binary search in the sorted block values, and the
+comparisons are XOR and popcount over whole numpy arrays. Groups are the connected
+components of the resulting "close enough" pairs.
+"""
+import os
+import sqlite3
+from itertools import combinations
+import numpy as np
+from .common import app_cache_dir, process_pool
+from .profiling import PROFILER
+
+HASH_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".tif", ".webp"}
+MAX_DISTANCE = 6  # differing pHash bits still counted as the same picture
+BLOCKS, BLOCK_BITS = 4, 16
+
+if hasattr(np, "bitwise_count"):
+    popcount = np.bitwise_count
+else:  # numpy < 2.0
+    _BITS = np.array([bin(i).count("1") for i in range(256)], np.uint8)
+
+    def popcount(values):
+        return _BITS[values.view(np.uint8)].reshape(-1, 8).sum(axis=1, dtype=np.uint8)
+
+def _to_int(bits):
+    # Stored as SQLite INTEGER, so keep the value within the signed 64-bit range
+    value = int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def image_hashes(path):
+    """(dhash, phash) of the image at path as signed 64-bit ints, or None if it can't be decoded."""
+    try:
+        import cv2
+        from PIL import Image
+        with Image.open(path) as im:
+            im.draft("L", (64, 64))
+            gray = np.asarray(im.convert("L"), np.float32)
+    except Exception:
+        return None
+    if gray.size == 0:
+        return None
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    dhash = _to_int(small[:, 1:] > small[:, :-1])
+    low = cv2.dct(cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA))[:8, :8]
+    # The DC term is the mean brightness, which says nothing about structure
+    phash = _to_int(low > np.median(low.ravel()[1:]))
+    return dhash, phash
+
+class HashCache:
+    """SQLite cache of perceptual hashes keyed by path, mtime and size."""
+    schema = "CREATE TABLE IF NOT EXISTS hashes (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, dhash INTEGER, phash INTEGER)"
+
+    def __init__(self, path=None, workers=None):
+        if path is None:
+            path = os.path.join(app_cache_dir(), "image_hashes.sqlite3")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.workers = workers
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(self.schema)
+
+    def close(self):
+        self.conn.close()
+
+    def hashes(self, files, batch_size=512, is_cancelled=None):
+        """Yield (start, [(dhash, phash) or None]) for successive batches of (path, size, mtime)."""
+        pool = None
+        try:
+            for start in range(0, len(files), batch_size):
+                if is_cancelled is not None and is_cancelled():
+                    return
+                batch = files[start:start + batch_size]
+                marks = ",".join("?" * len(batch))
+                cached = {path: (mtime, size, dhash, phash) for path, mtime, size, dhash, phash in self.conn.execute(
+                    f"SELECT path, mtime, size, dhash, phash FROM hashes WHERE path IN ({marks})", [f[0] for f in batch])}
+                result = [None] * len(batch)
+                missing = []
+                for i, (path, size, mtime) in enumerate(batch):
+                    row = cached.get(path)
+                    if row is not None and row[0] == mtime and row[1] == size:
+                        result[i] = row[2:] if row[2] is not None else None
+                    else:
+                        missing.append(i)
+                PROFILER.count("hash_cache.hits", len(batch) - len(missing))
+                PROFILER.count("hash_cache.misses", len(missing))
+                if missing:
+                    if pool is None:
+                        pool = process_pool(self.workers)
+                    paths = [batch[i][0] for i in missing]
+                    for i, hashes in zip(missing, pool.map(image_hashes, paths, chunksize=16)):
+                        result[i] = hashes
+                    # Undecodable files are cached too (as NULLs), so they aren't retried every run
+                    with self.conn:
+                        self.conn.executemany("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                                              [(batch[i][0], batch[i][2], batch[i][1], *(result[i] or (None, None)))
+                                               for i in missing])
+                yield start, result
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
+
+def as_unsigned(values):
+    """Hashes as stored (signed ints) to a uint64 array for bit operations."""
+    return np.array(values, np.int64).view(np.uint64)
+
+def _probes(width, radius):
+    """Every width-bit mask with at most radius bits set."""
+    return [sum(1 << bit for bit in bits) for r in range(radius + 1) for bits in combinations(range(width), r)]
+
+def close_pairs(hashes, max_distance=MAX_DISTANCE, max_candidates=1 << 22):
+    """(a, b) index arrays, a < b, of every pair of distinct hashes within max_distance bits.
+
+    At most max_candidates candidate pairs are held in memory at once.
+    """
+    hashes = np.asarray(hashes, np.uint64)
+    n = len(hashes)
+    radius = max_distance // BLOCKS
+    probes = _probes(BLOCK_BITS, radius)
+    found_a, found_b = [], []
+    ids = np.arange(n)
+    for block in range(BLOCKS):
+        keys = ((hashes >> np.uint64(block * BLOCK_BITS)) & np.uint64((1 << BLOCK_BITS) - 1)).astype(np.int64)
+        # Hashes ordered by this block's value, with where each value's bucket starts
+        order = np.argsort(keys, kind="stable")
+        sizes = np.bincount(keys, minlength=1 << BLOCK_BITS)
+        starts = np.cumsum(sizes) - sizes
+        for probe in probes:
+            # Every hash whose block value is this hash's with the probe's bits flipped
+            wanted = keys ^ probe
+            lo = starts[wanted]
+            counts = sizes[wanted]
+            ends = np.cumsum(counts)
+            total = int(ends[-1]) if n else 0
+            # Candidates are numbered 0..total across all hashes; a crowded bucket makes total
+            # grow as its size squared, so they are expanded and filtered a slice at a time
+            for first in range(0, total, max_candidates):
+                if total <= max_candidates:
+                    a = np.repeat(ids, counts)
+                    offsets = np.arange(total) - np.repeat(ends - counts, counts)
+                else:
+                    positions = np.arange(first, min(first + max_candidates, total))
+                    a = np.searchsorted(ends, positions, side="right")
+                    offsets = positions - (ends[a] - counts[a])
+                b = order[lo[a] + offsets]
+                keep = a < b
+                a, b = a[keep], b[keep]
+                close = popcount(hashes[a] ^ hashes[b]) <= max_distance
+                found_a.append(a[close])
+                found_b.append(b[close])
+    if not found_a:
+        return np.empty(0, np.int64), np.empty(0, np.int64)
+    return np.concatenate(found_a), np.concatenate(found_b)
+
+def components(n, a, b):
+    """Connected component label (its smallest member) of each of n nodes joined by edges a-b."""
+    labels = np.arange(n)
+    while len(a):
+        low = np.minimum(labels[a], labels[b])
+        before = labels.copy()
+        np.minimum.at(labels, a, low)
+        np.minimum.at(labels, b, low)
+        labels = labels[labels]
+        if np.array_equal(labels, before):
+            break
+    return labels
+
+def group_similar(hashes, max_distance=MAX_DISTANCE):
+    """Group id per hash (-1 when it has no near-duplicate), numbered largest group first.
+
+    Grouping is transitive: A and C end up together when both are close to B.
+    """
+    hashes = np.asarray(hashes, np.uint64)
+    if not len(hashes):
+        return np.empty(0, np.int64)
+    with PROFILER.span("group_similar", hashes=len(hashes)):
+        # Identical hashes are distance 0 apart; compare each distinct value once
+        unique, inverse = np.unique(hashes, return_inverse=True)
+        a, b = close_pairs(unique, max_distance)
+        labels = components(len(unique), a, b)[inverse.ravel()]
+        _, label_inverse, counts = np.unique(labels, return_inverse=True, return_counts=True)
+        label_inverse = label_inverse.ravel()
+        grouped = counts[label_inverse] > 1
+        ids = np.full(len(hashes), -1, np.int64)
+        if grouped.any():
+            # Renumber the groups so the biggest comes first
+            rank = np.empty(len(counts), np.int64)
+            rank[np.argsort(-counts, kind="stable")] = np.arange(len(counts))
+            ids[grouped] = rank[label_inverse[grouped]]
+            _, ids[grouped] = np.unique(ids[grouped], return_inverse=True)
+    return ids
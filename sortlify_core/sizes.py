@@ -0,0 +1,182 @@
+"""Byte and file totals per directory subtree and per category, kept current incrementally.
+
+A SizeTree has a node for every directory between the scanned root and the folders
+that hold files. Each node stores the totals of its whole subtree, so adding, moving
+or deleting a file only walks from its folder up to the root (O(depth)), and a scan
+feeds whole FileIndex batches in at the cost of one walk per folder in the batch.
+Totals live in numpy arrays, so "largest N subtrees" is one argpartition over nodes.
+"""
+import os
+import numpy as np
+
+class SizeTree:
+    """Subtree totals for the directories under root, plus totals per category."""
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.paths = [self.root]
+        self.categories = {}  # category -> [bytes, files]
+        self._ids = {self.root: 0}
+        self._children = [[]]
+        self._parent = np.full(64, -1, np.int32)
+        self._depth = np.zeros(64, np.int32)
+        self._bytes = np.zeros(64, np.int64)
+        self._files = np.zeros(64, np.int64)
+        self._count = 1
+
+    def __len__(self):
+        return self._count
+
+    def _grow(self):
+        capacity = len(self._parent) * 2
+        for name in ("_parent", "_depth", "_bytes", "_files"):
+            old = getattr(self, name)
+            grown = np.zeros(capacity, old.dtype)
+            grown[:len(old)] = old
+            setattr(self, name, grown)
+
+    def node(self, folder):
+        """Node id of folder, creating it and any missing ancestors; folders outside root count as root."""
+        node = self._ids.get(folder)
+        if node is not None:
+            return node
+        if not os.path.isabs(folder):
+            return self.node(os.path.abspath(folder))
+        prefix = self.root.rstrip(os.sep) + os.sep
+        if not folder.startswith(prefix):
+            return 0
+        missing = []
+        while node is None:
+            missing.append(folder)
+            folder = os.path.dirname(folder)
+            node = self._ids.get(folder)
+        for path in reversed(missing):
+            if self._count == len(self._parent):
+                self._grow()
+            child = self._count
+            self._parent[child] = node
+            self._depth[child] = self._depth[node] + 1
+            self._ids[path] = child
+            self.paths.append(path)
+            self._children.append([])
+            self._children[node].append(child)
+            self._count += 1
+            node = child
+        return node
+
+    def _add(self, node, size, files):
+        while node >= 0:
+            self._bytes[node] += size
+            self._files[node] += files
+            node = self._parent[node]
+
+    def _add_category(self, category, size, files):
+        totals = self.categories.setdefault(category, [0, 0])
+        totals[0] += size
+        totals[1] += files
+        if not totals[1]:
+            del self.categories[category]
+
+    def add_file(self, folder, size, category):
+        self._add(self.node(folder), size, 1)
+        self._add_category(category, size, 1)
+
+    def remove_file(self, folder, size, category):
+        self._add(self.node(folder), -size, -1)
+        self._add_category(category, -size, -1)
+
+    def move_file(self, src_folder, dst_folder, size, category):
+        self.remove_file(src_folder, size, category)
+        self.add_file(dst_folder, size, category)
+
+    def _apply(self, index, rows, sign, folders=True):
+        if rows is None:
+            rows = np.flatnonzero(index.alive)
+        else:
+            rows = np.asarray(rows, np.int64)
+            rows = rows[index.alive[rows]]
+        if not len(rows):
+            return
+        sizes = index.size[rows].astype(np.float64)
+        if folders:
+            folder_codes = index.folder[rows]
+            byte_totals = np.bincount(folder_codes, weights=sizes)
+            file_totals = np.bincount(folder_codes)
+            for code in np.flatnonzero(file_totals).tolist():
+                self._add(self.node(index.folders.values[code]), sign * int(byte_totals[code]), sign * int(file_totals[code]))
+        categories = index.category[rows]
+        byte_totals = np.bincount(categories, weights=sizes)
+        file_totals = np.bincount(categories)
+        for code in np.flatnonzero(file_totals).tolist():
+            self._add_category(index.categories.values[code], sign * int(byte_totals[code]), sign * int(file_totals[code]))
+
+    def add_index(self, index, rows=None):
+        """Add live rows of a FileIndex (all of them by default): one walk per distinct folder."""
+        self._apply(index, rows, 1)
+
+    def remove_index(self, index, rows):
+        """Subtract live rows of a FileIndex; call before the rows are removed from it."""
+        self._apply(index, rows, -1)
+
+    def remove_categories(self, index, rows):
+        """Subtract live rows from the per-category totals only, before the rows are reclassified."""
+        self._apply(index, rows, -1, folders=False)
+
+    def add_categories(self, index, rows):
+        """Add live rows back to the per-category totals once they have been reclassified."""
+        self._apply(index, rows, 1, folders=False)
+
+    def rebuild_categories(self, index):
+        """Recount the per-category totals after the index's rows were reclassified."""
+        self.categories = {}
+        rows = np.flatnonzero(index.alive)
+        sizes = index.size[rows].astype(np.float64)
+        categories = index.category[rows]
+        byte_totals = np.bincount(categories, weights=sizes)
+        file_totals = np.bincount(categories)
+        for code in np.flatnonzero(file_totals).tolist():
+            self.categories[index.categories.values[code]] = [int(byte_totals[code]), int(file_totals[code])]
+
+    def total(self, folder=None):
+        """(bytes, files) of the subtree at folder (the root by default)."""
+        node = self._ids.get(folder or self.root, -1)
+        if node < 0:
+            return 0, 0
+        return int(self._bytes[node]), int(self._files[node])
+
+    def children(self, folder=None):
+        """(path, bytes, files) for each subfolder of folder that holds files, largest first."""
+        node = self._ids.get(folder or self.root, -1)
+        if node < 0:
+            return []
+        children = [c for c in self._children[node] if self._files[c] > 0]
+        children.sort(key=lambda c: -self._bytes[c])
+        return [(self.paths[c], int(self._bytes[c]), int(self._files[c])) for c in children]
+
+    def _under(self, node):
+        """Mask of the nodes strictly below node, found by walking every node's ancestors in step."""
+        n = self._count
+        if node == 0:
+            mask = np.ones(n, np.bool_)
+            mask[0] = False
+            return mask
+        mask = np.zeros(n, np.bool_)
+        ancestor = self._parent[:n].copy()
+        below = self._depth[:n] > self._depth[node]
+        while below.any():
+            mask |= below & (ancestor == node)
+            ancestor = np.where(ancestor > 0, self._parent[np.maximum(ancestor, 0)], -1)
+            below &= ancestor >= 0
+        return mask
+
+    def top(self, n, folder=None):
+        """The n largest subtrees strictly below folder (the root by default), as (path, bytes, files)."""
+        node = self._ids.get(folder or self.root, -1)
+        if node < 0 or n <= 0:
+            return []
+        candidates = np.flatnonzero(self._under(node) & (self._files[:self._count] > 0))
+        sizes = self._bytes[candidates]
+        if len(candidates) > n:
+            keep = np.argpartition(-sizes, n - 1)[:n]
+            candidates, sizes = candidates[keep], sizes[keep]
+        order = np.argsort(-sizes, kind="stable")
+        return [(self.paths[c], int(self._bytes[c]), int(self._files[c])) for c in candidates[order].tolist()]
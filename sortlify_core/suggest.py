@@ -0,0 +1,205 @@
+"""Content-based category suggestions learned from past organize runs.
+
+File names and the first few KB of text from PDF, DOCX and plain-text files are turned
+into sparse features with HashingVectorizer, so there is no vocabulary to fit or keep in
+memory, and fed to an SGD classifier trained incrementally with partial_fit on the moves
+recorded in finished organize journals. Extracted text is cached by path, mtime and size
+and extraction runs in a process pool, since PDF parsing is slow and holds the GIL.
+"""
+import os
+import pickle
+import sqlite3
+from functools import partial
+from .classify import file_ext
+from .common import app_cache_dir, process_pool
+from .organize import Organizer
+from .profiling import PROFILER
+from .text import CONTENT_EXTS, extract_text
+
+HEAD_BYTES = 16 * 1024
+
+class TextCache:
+    """SQLite cache of extracted text keyed by path, mtime and size."""
+    schema = "CREATE TABLE IF NOT EXISTS texts (path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, text TEXT)"
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(app_cache_dir(), "text_cache.sqlite3")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(self.schema)
+
+    def close(self):
+        self.conn.close()
+
+    def texts(self, files, get_pool=None, is_cancelled=None):
+        """Return the text for each (path, size, mtime), extracting cache misses in get_pool()."""
+        result = [""] * len(files)
+        missing = []
+        lookup = self.conn.execute
+        for i, (path, size, mtime) in enumerate(files):
+            if file_ext(path) not in CONTENT_EXTS:
+                continue
+            row = lookup("SELECT mtime, size, text FROM texts WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[0] == mtime and row[1] == size:
+                PROFILER.count("text_cache.hits")
+                result[i] = row[2]
+            else:
+                missing.append(i)
+        PROFILER.count("text_cache.misses", len(missing))
+        if not missing:
+            return result
+        paths = [files[i][0] for i in missing]
+        extract = partial(extract_text, limit=HEAD_BYTES, max_pages=5)
+        texts = get_pool().map(extract, paths, chunksize=8) if get_pool is not None else map(extract, paths)
+        stored = []
+        for i, text in zip(missing, texts):
+            if is_cancelled is not None and is_cancelled():
+                break
+            path, size, mtime = files[i]
+            result[i] = text
+            stored.append((path, mtime, size, text))
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO texts VALUES (?, ?, ?, ?)", stored)
+        return result
+
+def _vectorizers():
+    from sklearn.feature_extraction.text import HashingVectorizer
+    # Character n-grams cope with names like "inv_2023-04_acme.pdf"; words suit content
+    names = HashingVectorizer(analyzer="char_wb", ngram_range=(2, 4), n_features=2 ** 18, alternate_sign=False)
+    content = HashingVectorizer(n_features=2 ** 20, alternate_sign=False)
+    return names, content
+
+class Suggester:
+    """Incrementally trained category model persisted in the user cache directory.
+
+    The set of categories an SGD classifier knows is fixed by its first partial_fit, so
+    when history introduces a category the model hasn't seen it is rebuilt from every
+    finished journal; otherwise only journals not yet learned from are read.
+    """
+    version = 1
+
+    def __init__(self, path=None, text_cache=None, workers=None, batch_size=512):
+        self.path = path or os.path.join(app_cache_dir(), "suggester.pickle")
+        self.text_cache = text_cache or TextCache()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.model = None
+        self.classes = []
+        self.learned = set()
+        self._vectorizers = None
+        self._pool = None
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            if state.get("version") == self.version:
+                self.model, self.classes, self.learned = state["model"], state["classes"], state["learned"]
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError, AttributeError, ImportError):
+            pass
+
+    @property
+    def trained(self):
+        return self.model is not None
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        self.text_cache.close()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": self.version, "model": self.model, "classes": self.classes,
+                         "learned": self.learned}, f)
+        os.replace(tmp, self.path)
+
+    def _executor(self):
+        # Started on the first cache miss; "spawn" because forking a process that runs Qt threads isn't safe
+        if self._pool is None:
+            self._pool = process_pool(self.workers)
+        return self._pool
+
+    def features(self, files, is_cancelled=None):
+        """Sparse feature matrix for a list of (path, size, mtime)."""
+        from scipy.sparse import hstack
+        if self._vectorizers is None:
+            self._vectorizers = _vectorizers()
+        names, content = self._vectorizers
+        texts = self.text_cache.texts(files, self._executor, is_cancelled)
+        file_names = [os.path.basename(path) for path, _, _ in files]
+        return hstack([names.transform(file_names), content.transform(texts)]).tocsr()
+
+    @staticmethod
+    def _label(root, dst):
+        """The category a move filed dst under: the first folder below the run's root, since a
+        templated destination such as Invoices/{year}/{client} nests further folders in it."""
+        if root is not None:
+            parts = os.path.relpath(os.path.dirname(dst), root).split(os.sep)
+            if parts[0] not in (os.curdir, os.pardir):
+                return parts[0]
+        return os.path.basename(os.path.dirname(dst))
+
+    def _history(self, journals):
+        """(path, size, mtime, category) of each file a finished run moved and that still exists."""
+        examples = []
+        for journal in journals:
+            organizer = Organizer.load(journal)
+            for i in organizer.done:
+                dst = organizer.moves[i][1]
+                try:
+                    stat = os.stat(dst)
+                except OSError:
+                    continue
+                examples.append((dst, stat.st_size, int(stat.st_mtime), self._label(organizer.root, dst)))
+        return examples
+
+    def learn(self, journal_dir=None, is_cancelled=None):
+        """partial_fit on organize journals finished since the last call; returns examples learned."""
+        from sklearn.linear_model import SGDClassifier
+        journal_dir = journal_dir or Organizer.journal_dir()
+        try:
+            # Only organize runs move files into category folders; rename and watch journals don't teach anything
+            finished = sorted(os.path.join(journal_dir, n) for n in os.listdir(journal_dir)
+                              if n.startswith(Organizer.journal_prefix + "-") and n.endswith(".done"))
+        except OSError:
+            return 0
+        fresh = [path for path in finished if os.path.basename(path) not in self.learned]
+        if not fresh:
+            return 0
+        examples = self._history(fresh)
+        if not examples:
+            self.learned.update(os.path.basename(path) for path in fresh)
+            self._save()
+            return 0
+        if self.model is None or not {e[3] for e in examples} <= set(self.classes):
+            fresh = finished
+            examples = self._history(finished)
+            classes = sorted({e[3] for e in examples})
+            if len(classes) < 2:
+                return 0  # nothing to tell apart yet
+            self.classes = classes
+            self.model = SGDClassifier(loss="log_loss", alpha=1e-5)
+        for start in range(0, len(examples), self.batch_size):
+            if is_cancelled is not None and is_cancelled():
+                return start
+            batch = examples[start:start + self.batch_size]
+            X = self.features([e[:3] for e in batch], is_cancelled)
+            self.model.partial_fit(X, [e[3] for e in batch], classes=self.classes)
+        self.learned.update(os.path.basename(path) for path in fresh)
+        self._save()
+        return len(examples)
+
+    def suggest(self, files, is_cancelled=None):
+        """Yield (start, [(category, confidence)]) for successive batches of (path, size, mtime)."""
+        if self.model is None:
+            return
+        for start in range(0, len(files), self.batch_size):
+            if is_cancelled is not None and is_cancelled():
+                return
+            probabilities = self.model.predict_proba(self.features(files[start:start + self.batch_size], is_cancelled))
+            best = probabilities.argmax(axis=1)
+            yield start, [(str(self.model.classes_[k]), float(p[k])) for k, p in zip(best, probabilities)]
@@ -0,0 +1,36 @@
+"""Plain-text extraction from documents for suggestions and search."""
+from .classify import file_ext
+
+TEXT_EXTS = {".txt", ".md", ".csv", ".log", ".json", ".xml", ".html", ".htm", ".rtf", ".ini", ".yaml", ".yml"}
+CONTENT_EXTS = TEXT_EXTS | {".pdf", ".docx"}
+
+def extract_text(path, limit=64 * 1024, max_pages=None):
+    """Return up to limit characters of text from the start of a PDF, DOCX or text file."""
+    ext = file_ext(path)
+    try:
+        if ext == ".pdf":
+            from PyPDF2 import PdfReader
+            parts, length = [], 0
+            for page in PdfReader(path).pages[:max_pages]:
+                text = page.extract_text() or ""
+                parts.append(text)
+                length += len(text)
+                if length >= limit:
+                    break
+            return "\n".join(parts)[:limit]
+        if ext == ".docx":
+            from docx import Document
+            parts, length = [], 0
+            for paragraph in Document(path).paragraphs:
+                parts.append(paragraph.text)
+                length += len(paragraph.text)
+                if length >= limit:
+                    break
+            return "\n".join(parts)[:limit]
+        if ext in TEXT_EXTS:
+            with open(path, "rb") as f:
+                return f.read(limit).decode("utf-8", "ignore")
+    except Exception:
+        # Corrupt or encrypted documents simply contribute no content
+        pass
+    return ""
@@ -0,0 +1,323 @@
+"""Keeping an index of a folder current from filesystem events."""
+import os
+import select
+import stat
+import struct
+import sys
+import time
+import numpy as np
+from .classify import classify_entries, file_ext
+from .index import FileIndex
+from .organize import Organizer, plan_moves
+from .scan import scan_tree
+from .sizes import SizeTree
+
+class InotifyWatcher:
+    """Recursive inotify watch on Linux, read through ctypes so no extra package is needed.
+
+    poll() returns normalized events: ("file", folder, name) for anything that may have
+    changed, ("dir_added", path), ("dir_removed", path), or ("overflow", root) when the
+    kernel queue overflowed and the tree has to be rescanned.
+    """
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_ISDIR = 0x40000000
+    MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+            | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+    _header = struct.Struct("iIII")
+
+    @staticmethod
+    def available():
+        return sys.platform.startswith("linux")
+
+    def __init__(self, root):
+        import ctypes
+        import ctypes.util
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.root = root
+        self._paths = {}  # watch descriptor -> directory
+        self._watch_tree(root)
+
+    def close(self):
+        os.close(self.fd)
+
+    def _watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.MASK)
+        if wd >= 0:
+            self._paths[wd] = path
+        return wd >= 0
+
+    def _watch_tree(self, root):
+        """Watch root and every directory below it, returning the directories found."""
+        added = []
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            if not self._watch(path):
+                continue
+            added.append(path)
+            try:
+                with os.scandir(path) as it:
+                    stack.extend(e.path for e in it if e.is_dir(follow_symlinks=False))
+            except OSError:
+                pass
+        return added
+
+    def poll(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 256 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self._header.unpack_from(data, offset)
+                offset += self._header.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                if mask & self.IN_Q_OVERFLOW:
+                    events.append(("overflow", self.root))
+                    continue
+                folder = self._paths.get(wd)
+                if folder is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    del self._paths[wd]
+                elif mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    if folder != self.root:
+                        events.append(("dir_removed", folder))
+                elif mask & self.IN_ISDIR:
+                    path = os.path.join(folder, name)
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        # Files can land in a new directory before its watch exists, so report them all
+                        for added in self._watch_tree(path):
+                            events.append(("dir_added", added))
+                    elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                        events.append(("dir_removed", path))
+                else:
+                    # Writes in progress keep re-reporting the file, so it only settles once they stop
+                    events.append(("file", folder, name))
+        return events
+
+class PollingWatcher:
+    """Fallback for platforms without inotify: re-lists only directories whose mtime changed.
+
+    Like ScanCache, it can't see files rewritten in place without their directory changing.
+    """
+    def __init__(self, root, interval=2.0):
+        self.root = root
+        self.interval = interval
+        self._dirs = {}  # path -> (mtime_ns, set of file names, list of subdirectories)
+        self._refresh(report=False)
+
+    def close(self):
+        pass
+
+    def _list(self, path):
+        names, subdirs = set(), []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        names.add(entry.name)
+                except OSError:
+                    continue
+        return names, subdirs
+
+    def _refresh(self, report=True):
+        events = []
+        seen = set()
+        stack = [self.root]
+        while stack:
+            path = stack.pop()
+            seen.add(path)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            known = self._dirs.get(path)
+            if known is not None and known[0] == mtime_ns:
+                stack.extend(known[2])
+                continue
+            try:
+                names, subdirs = self._list(path)
+            except OSError:
+                continue
+            if report:
+                if known is None:
+                    events.append(("dir_added", path))
+                else:
+                    events.extend(("file", path, n) for n in names ^ known[1])
+            self._dirs[path] = (mtime_ns, names, subdirs)
+            stack.extend(subdirs)
+        for path in list(self._dirs):
+            if path not in seen:
+                del self._dirs[path]
+                if report:
+                    events.append(("dir_removed", path))
+        return events
+
+    def poll(self, timeout):
+        time.sleep(min(timeout, self.interval))
+        return self._refresh()
+
+class WatchOrganizer(Organizer):
+    """Organizer for watch mode, journaled apart from organize runs so they aren't offered for resuming."""
+    journal_prefix = "watch"
+
+class FolderWatch:
+    """Keeps a FileIndex of a folder tree current from filesystem events, optionally organizing.
+
+    Events are coalesced per path and only acted on once the path has been quiet for
+    `settle` seconds, so a burst of writes to one file costs a single stat and a download
+    that is renamed into place is only classified under its final name. Only the affected
+    rows of the index are touched; the tree is rescanned only after a queue overflow.
+    `sizes` keeps the byte and file totals per folder and category in step with the index.
+    """
+    def __init__(self, root, classifier, organize=False, settle=0.5, on_change=None, watcher=None):
+        self.root = os.path.abspath(root)
+        self.classifier = classifier
+        self.organize = organize
+        self.settle = settle
+        self.on_change = on_change
+        self.index = FileIndex()
+        self.sizes = SizeTree(self.root)
+        self._pending = {}  # (folder, name) -> time of last event
+        if watcher is None:
+            watcher = InotifyWatcher(self.root) if InotifyWatcher.available() else PollingWatcher(self.root)
+        self.watcher = watcher
+        self.rescan()
+
+    def rescan(self):
+        self.index = FileIndex()
+        for entries in scan_tree(self.root):
+            self.index.append_batch(classify_entries(self.classifier, entries))
+        if self.classifier.program:
+            self.index.reclassify(self.classifier)
+        self.sizes = SizeTree(self.root)
+        self.sizes.add_index(self.index)
+        if self.organize:
+            self._organize(self.index.select())
+
+    def close(self):
+        self.watcher.close()
+
+    def handle(self, events, now=None):
+        now = time.monotonic() if now is None else now
+        for event in events:
+            kind = event[0]
+            if kind == "file":
+                self._pending[(event[1], event[2])] = now
+            elif kind == "dir_added":
+                try:
+                    with os.scandir(event[1]) as it:
+                        for entry in it:
+                            if entry.is_file(follow_symlinks=False):
+                                self._pending[(event[1], entry.name)] = now
+                except OSError:
+                    pass
+            elif kind == "dir_removed":
+                rows = self.index.rows_under(event[1])
+                if len(rows):
+                    self.sizes.remove_index(self.index, rows)
+                    self.index.remove(rows)
+                    self._compact()
+                    self._changed(removed=len(rows))
+            elif kind == "overflow":
+                self._pending.clear()
+                self.rescan()
+                self._changed()
+
+    def flush(self, now=None):
+        """Apply every pending path that has settled; returns how many were applied."""
+        now = time.monotonic() if now is None else now
+        ready = [key for key, t in self._pending.items() if now - t >= self.settle]
+        if not ready:
+            return 0
+        new_rows, removed, updated = [], [], []
+        for key in ready:
+            del self._pending[key]
+            folder, name = key
+            row = self.index.find(folder, name)
+            try:
+                st = os.lstat(os.path.join(folder, name))
+                is_file = stat.S_ISREG(st.st_mode)
+            except OSError:
+                is_file = False
+            if not is_file:
+                if row >= 0:
+                    removed.append(row)
+                continue
+            ext = file_ext(name)
+            category = self.classifier.classify(name, ext)
+            if row >= 0:
+                self.sizes.remove_file(folder, int(self.index.size[row]), self.index.category_name(row))
+                self.sizes.add_file(folder, st.st_size, category)
+                self.index.update(row, st.st_size, int(st.st_mtime), category)
+                updated.append(row)
+            else:
+                new_rows.append((folder, name, st.st_size, int(st.st_mtime), ext, category))
+        if removed:
+            self.sizes.remove_index(self.index, removed)
+            self.index.remove(removed)
+        start = len(self.index)
+        self.index.append_batch(new_rows)
+        self.sizes.add_index(self.index, np.arange(start, len(self.index)))
+        if self.classifier.program and (new_rows or updated):
+            # Only the rows that changed go through the rules, and only their category totals move
+            affected = np.r_[np.array(updated, np.int64), np.arange(start, len(self.index))]
+            self.sizes.remove_categories(self.index, affected)
+            self.index.apply_rules(self.classifier.program, affected)
+            self.sizes.add_categories(self.index, affected)
+        if self.organize and new_rows:
+            self._organize(np.arange(start, len(self.index)))
+        self._compact()
+        self._changed(added=len(new_rows), updated=len(updated), removed=len(removed))
+        return len(ready)
+
+    def _compact(self):
+        # Removed files only leave dead rows and every flush adds a name chunk, which in a
+        # long-running watch would grow without bound; totals in sizes don't refer to rows
+        if self.index.fragmented():
+            self.index = self.index.compacted()
+
+    def _organize(self, rows):
+        moves = plan_moves(self.index.iter_files(rows), self.root)
+        if not moves:
+            return
+        organizer = WatchOrganizer.create(self.root, moves)
+        moved, errors = organizer.run()
+        if organizer.journal_path.endswith(".done"):
+            os.remove(organizer.journal_path)
+        if self.on_change is not None:
+            self.on_change({"moved": moved, "errors": errors})
+        # The moves show up as new events, which update the index to the new locations
+
+    def _changed(self, **counts):
+        if self.on_change is not None:
+            self.on_change(counts)
+
+    def run(self, is_cancelled=None, poll_interval=0.2):
+        while is_cancelled is None or not is_cancelled():
+            self.handle(self.watcher.poll(poll_interval))
+            self.flush()